@@ -0,0 +1,125 @@
+"""
+Fake Telegram Bot API for benchmarking.
+
+Implements the methods the bot calls (sendMessage, editMessageText,
+answerCallbackQuery, deleteMessage, setWebhook, deleteWebhook,
+getWebhookInfo) with configurable latency and 429 injection.
+
+    python -m bench.fake_telegram --port 8081 --latency-ms 40 --jitter-ms 20 --rate-429 0.01
+
+then run the bot with TELEGRAM_API_URL=http://127.0.0.1:8081
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class FakeTelegramConfig:
+    latency_ms: float = 30.0
+    jitter_ms: float = 10.0
+    rate_429: float = 0.0
+    retry_after: int = 1
+
+
+config = FakeTelegramConfig()
+calls: Counter = Counter()
+webhook_info: Dict[str, Any] = {"url": "", "pending_update_count": 0}
+_message_id = 0
+
+app = FastAPI(title="fake telegram bot api")
+
+
+def _next_message_id() -> int:
+    global _message_id
+    _message_id += 1
+    return _message_id
+
+
+async def _payload(request: Request) -> Dict[str, Any]:
+    if request.headers.get("content-type", "").startswith("application/json"):
+        body = await request.body()
+        return await request.json() if body else {}
+    return dict(await request.form())
+
+
+def _message(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "message_id": payload.get("message_id") or _next_message_id(),
+        "date": int(time.time()),
+        "chat": {"id": payload.get("chat_id"), "type": "private"},
+        "text": payload.get("text", ""),
+    }
+
+
+METHODS = {
+    "sendMessage": _message,
+    "editMessageText": _message,
+    "answerCallbackQuery": lambda payload: True,
+    "deleteMessage": lambda payload: True,
+    "deleteWebhook": lambda payload: webhook_info.update(url="") or True,
+    "setWebhook": lambda payload: webhook_info.update(url=payload.get("url", ""))
+    or True,
+    "getWebhookInfo": lambda payload: dict(webhook_info),
+}
+
+
+@app.api_route("/bot{token}/{method}", methods=["GET", "POST"])
+async def bot_api(token: str, method: str, request: Request):
+    calls[method] += 1
+    delay = max(config.latency_ms + random.uniform(-1, 1) * config.jitter_ms, 0)
+    await asyncio.sleep(delay / 1000)
+
+    if config.rate_429 and random.random() < config.rate_429:
+        calls["429"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {config.retry_after}",
+                "parameters": {"retry_after": config.retry_after},
+            },
+        )
+
+    handler = METHODS.get(method)
+    if handler is None:
+        return JSONResponse(
+            status_code=404,
+            content={"ok": False, "error_code": 404, "description": "Not Found"},
+        )
+    return {"ok": True, "result": handler(await _payload(request))}
+
+
+@app.get("/stats")
+async def stats():
+    """Calls per method since start (429s counted separately)."""
+    return dict(calls)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument("--rate-429", type=float, default=config.rate_429)
+    parser.add_argument("--retry-after", type=int, default=config.retry_after)
+    args = parser.parse_args()
+
+    config.latency_ms = args.latency_ms
+    config.jitter_ms = args.jitter_ms
+    config.rate_429 = args.rate_429
+    config.retry_after = args.retry_after
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
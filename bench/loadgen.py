@@ -0,0 +1,290 @@
+"""
+Load generator for the Telegram webhook.
+
+Replays a weighted mix of synthetic updates (/start, menu callbacks, buy
+flows, phone and OTP input) against the webhook at a fixed rate and reports
+latency percentiles, or ramps the rate up to find the highest one that still
+meets the p99 SLO.
+
+    python -m bench.loadgen --url http://127.0.0.1:8000/telegram/telegram-webhook --rps 50 --duration 30
+    python -m bench.loadgen --ramp --start-rps 10 --step-rps 10 --slo-p99-ms 500
+
+Point the bot at bench.fake_telegram (TELEGRAM_API_URL) so replies are not
+sent to the real Bot API.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+DEFAULT_URL = "http://127.0.0.1:8000/telegram/telegram-webhook"
+# synthetic chat ids start here so they never collide with real users
+CHAT_ID_BASE = 9_000_000_000
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+_query_ids = itertools.count(1)
+
+
+def _chat(chat_id: int) -> Dict[str, Any]:
+    return {"id": chat_id, "type": "private", "first_name": "bench", "username": f"bench{chat_id}"}
+
+
+def message_update(chat_id: int, text: str) -> Dict[str, Any]:
+    return {
+        "update_id": next(_update_ids),
+        "message": {
+            "message_id": next(_message_ids),
+            "date": int(time.time()),
+            "chat": _chat(chat_id),
+            "from": {"id": chat_id, "is_bot": False, "first_name": "bench"},
+            "text": text,
+        },
+    }
+
+
+def callback_update(chat_id: int, data: str) -> Dict[str, Any]:
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_query_ids)),
+            "from": {"id": chat_id, "is_bot": False, "first_name": "bench"},
+            "message": {
+                "message_id": next(_message_ids),
+                "date": int(time.time()),
+                "chat": _chat(chat_id),
+            },
+            "data": data,
+        },
+    }
+
+
+# (weight, chat_id -> updates sent in order) -- a flow is one "request"
+Flow = Callable[[int], List[Dict[str, Any]]]
+
+MIX: List[Tuple[str, int, Flow]] = [
+    ("start", 20, lambda c: [message_update(c, "/start")]),
+    ("show_prices", 20, lambda c: [callback_update(c, "show_prices")]),
+    ("return_to_menu", 10, lambda c: [callback_update(c, "return_to_menu")]),
+    ("support", 5, lambda c: [callback_update(c, "support")]),
+    ("common_questions", 5, lambda c: [callback_update(c, "common_questions")]),
+    ("show_terms", 5, lambda c: [callback_update(c, "show_terms")]),
+    (
+        "buy_flow",
+        15,
+        lambda c: [
+            callback_update(c, f"buy_product:{random.randint(1, 3)}"),
+            callback_update(c, f"buy_product_version:{random.randint(1, 6)}"),
+        ],
+    ),
+    (
+        "phone_otp",
+        10,
+        lambda c: [
+            message_update(c, f"0912{random.randint(0, 9_999_999):07d}"),
+            callback_update(c, "send_validation_code"),
+            message_update(c, "1111"),
+        ],
+    ),
+    ("free_text", 10, lambda c: [message_update(c, "hello")]),
+]
+
+
+@dataclass
+class Result:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[str, int] = field(default_factory=dict)
+    flows: Dict[str, int] = field(default_factory=dict)
+    sent: int = 0
+    elapsed: float = 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        idx = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[idx]
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.sent if self.sent else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "sent": self.sent,
+            "achieved_rps": round(self.sent / self.elapsed, 1) if self.elapsed else 0.0,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate, 4),
+            "p50_ms": round(self.percentile(50) * 1000, 1),
+            "p95_ms": round(self.percentile(95) * 1000, 1),
+            "p99_ms": round(self.percentile(99) * 1000, 1),
+            "max_ms": round(max(self.latencies, default=0.0) * 1000, 1),
+            "statuses": self.statuses,
+            "flows": self.flows,
+        }
+
+
+def _failed_body(resp: httpx.Response) -> bool:
+    try:
+        body = resp.json()
+    except ValueError:
+        return False
+    return isinstance(body, dict) and body.get("ok") is False
+
+
+class LoadGenerator:
+    def __init__(
+        self, url: str, chats: int, secret_token: Optional[str], concurrency: int
+    ) -> None:
+        self.url = url
+        self.chat_ids = [CHAT_ID_BASE + i for i in range(chats)]
+        headers = {"X-Telegram-Bot-Api-Secret-Token": secret_token} if secret_token else {}
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=httpx.Timeout(30.0),
+            limits=httpx.Limits(max_connections=concurrency),
+        )
+        # one flow at a time per chat, like a real user
+        self.chat_locks = {c: asyncio.Lock() for c in self.chat_ids}
+        names, weights, flows = zip(*MIX)
+        self._names, self._weights, self._flows = names, weights, flows
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def _send(self, update: Dict[str, Any], result: Result) -> None:
+        started = time.perf_counter()
+        result.sent += 1
+        try:
+            resp = await self.client.post(self.url, json=update)
+            status = str(resp.status_code)
+            if resp.status_code >= 400:
+                result.errors += 1
+            elif _failed_body(resp):
+                # the webhook answers 200 {"ok": false} when the handler failed
+                status += " ok:false"
+                result.errors += 1
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+            result.errors += 1
+        result.latencies.append(time.perf_counter() - started)
+        result.statuses[status] = result.statuses.get(status, 0) + 1
+
+    async def warm_up(self) -> None:
+        """/start and accept the terms for every synthetic chat."""
+        scratch = Result()
+        sem = asyncio.Semaphore(32)
+
+        async def _one(chat_id: int) -> None:
+            async with sem:
+                await self._send(message_update(chat_id, "/start"), scratch)
+                await self._send(callback_update(chat_id, "accepted_terms"), scratch)
+
+        await asyncio.gather(*(_one(c) for c in self.chat_ids))
+        if scratch.errors:
+            print(f"warm-up: {scratch.errors}/{scratch.sent} updates failed {scratch.statuses}")
+
+    async def _flow(self, result: Result) -> None:
+        idx = random.choices(range(len(self._flows)), weights=self._weights)[0]
+        name = self._names[idx]
+        chat_id = random.choice(self.chat_ids)
+        result.flows[name] = result.flows.get(name, 0) + 1
+        async with self.chat_locks[chat_id]:
+            for update in self._flows[idx](chat_id):
+                await self._send(update, result)
+
+    async def run(self, rps: float, duration: float) -> Result:
+        """
+        Open loop: flows are started on schedule whether or not earlier ones
+        finished, so a slow server shows up as latency instead of a lower rate.
+        """
+        result = Result()
+        tasks = set()
+        interval = 1.0 / rps
+        started = time.perf_counter()
+        n = 0
+        while True:
+            due = started + n * interval
+            now = time.perf_counter()
+            if now - started >= duration:
+                break
+            if due > now:
+                await asyncio.sleep(due - now)
+            task = asyncio.create_task(self._flow(result))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            n += 1
+        if tasks:
+            await asyncio.gather(*tasks)
+        result.elapsed = time.perf_counter() - started
+        return result
+
+
+async def _main(args: argparse.Namespace) -> None:
+    gen = LoadGenerator(args.url, args.chats, args.secret_token, args.concurrency)
+    try:
+        if not args.skip_warm_up:
+            await gen.warm_up()
+
+        if not args.ramp:
+            result = await gen.run(args.rps, args.duration)
+            print(json.dumps({"rps": args.rps, **result.summary()}, indent=2))
+            return
+
+        best = None
+        rps = args.start_rps
+        while rps <= args.max_rps:
+            result = await gen.run(rps, args.duration)
+            summary = {"rps": rps, **result.summary()}
+            ok = (
+                summary["p99_ms"] <= args.slo_p99_ms
+                and result.error_rate <= args.max_error_rate
+            )
+            print(json.dumps({**summary, "within_slo": ok}))
+            if not ok:
+                break
+            best = summary
+            rps += args.step_rps
+        print(
+            json.dumps(
+                {
+                    "max_sustainable_rps": best and best["rps"],
+                    "slo_p99_ms": args.slo_p99_ms,
+                    "max_error_rate": args.max_error_rate,
+                    "at_max": best,
+                },
+                indent=2,
+            )
+        )
+    finally:
+        await gen.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--secret-token", default=None)
+    parser.add_argument("--chats", type=int, default=200, help="synthetic users")
+    parser.add_argument("--concurrency", type=int, default=200, help="max open connections")
+    parser.add_argument("--rps", type=float, default=20.0, help="flows started per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per run / step")
+    parser.add_argument("--skip-warm-up", action="store_true")
+    parser.add_argument("--ramp", action="store_true", help="step the rate up until the SLO breaks")
+    parser.add_argument("--start-rps", type=float, default=10.0)
+    parser.add_argument("--step-rps", type=float, default=10.0)
+    parser.add_argument("--max-rps", type=float, default=1000.0)
+    parser.add_argument("--slo-p99-ms", type=float, default=500.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
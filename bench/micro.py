@@ -0,0 +1,247 @@
+"""
+Microbenchmarks for the bot's hot paths.
+
+Times template rendering, keyboard mapping, price rendering, callback
+routing, version pricing and the core CRUD reads against a throwaway
+database, then compares the results with a stored baseline and exits
+non-zero when any benchmark got slower than the threshold.
+
+    python -m bench.micro --save-baseline          # record bench/baseline.json
+    python -m bench.micro --threshold 0.2          # fail on a >20% regression
+    BENCH_DB_URL=postgresql+psycopg://... python -m bench.micro
+
+Uses an in-memory SQLite database unless BENCH_DB_URL is set; a Postgres
+URL must point at an empty scratch database, the schema is created and
+dropped by the run. The usual .env is still needed to import src.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.models import Base, ProductVersion
+from src.models.user import ChatState
+from src.bot.chat_output import (
+    TelegrambotOutputs,
+    _map_buttons_in_order,
+    _render_chat_outputs,
+)
+from src.bot.processor import process_callback_query
+from src.bot import chat_flow
+from src.crud.chat_outpus import get_chat_output_by_name
+from src.crud.products import get_product_version_by_id, get_products
+from src.crud.user import create_chat, create_user, get_chat_by_chat_id
+from src.db.seed import seed_initial_chat_outputs, seed_initial_products
+from src.db.seed_data import SEED_TELEGRAM_OUTPUTS, SEED_TELEGRAM_OUTPUT_TRANSLATIONS
+from src.services.pricing import get_version_price
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+BENCH_CHAT_ID = 9_000_000_000
+TEMPLATE = "return_to_menu"
+
+
+# --- Harness ---
+
+
+def measure(func: Callable[[], Any], min_time: float, repeat: int) -> Dict[str, float]:
+    """
+    timeit style: find a loop count that runs for about `min_time`, then take
+    `repeat` samples of it. Reported numbers are seconds per call.
+    """
+    func()  # warm caches and lazy imports outside the timing
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / 10 or loops >= 1_000_000:
+            break
+        loops *= 10
+    loops = max(int(loops * (min_time / 10) / max(elapsed, 1e-9)), 1)
+
+    samples: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - started) / loops)
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "stdev": statistics.pstdev(samples),
+        "loops": loops,
+    }
+
+
+# --- Fixture ---
+
+
+def make_scratch_session(url: str) -> Tuple[Session, Callable[[], None]]:
+    """Schema on a scratch database; the returned teardown drops it again."""
+    kwargs: Dict[str, Any] = {}
+    if url.startswith("sqlite"):
+        kwargs = {"connect_args": {"check_same_thread": False}, "poolclass": StaticPool}
+    engine = create_engine(url, **kwargs)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)()
+
+    def teardown() -> None:
+        db.close()
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+    return db, teardown
+
+
+def seed_catalog(db: Session) -> None:
+    """Products and chat outputs, as on startup."""
+    seed_initial_products(db)
+    seed_initial_chat_outputs(
+        db,
+        seed_data=SEED_TELEGRAM_OUTPUTS,
+        translations=SEED_TELEGRAM_OUTPUT_TRANSLATIONS,
+    )
+
+
+def _seed(db: Session) -> None:
+    seed_catalog(db)
+    user = create_user(db)
+    create_chat(db, user_id=user.id, chat_id=BENCH_CHAT_ID, first_name="bench")
+    # a chat past the terms screen; accepted_terms again is a pure routing no-op
+    chat = get_chat_by_chat_id(db, BENCH_CHAT_ID)
+    chat.fsm_state = ChatState.MENU
+    chat.last_message_id = 1
+    db.commit()
+
+
+def _sample_placeholders(template) -> Dict[str, str]:
+    return {p.name: f"sample {p.name}" for p in (template.placeholders or [])}
+
+
+def build_benchmarks(db: Session) -> Dict[str, Callable[[], Any]]:
+    outputs = TelegrambotOutputs()
+    template = get_chat_output_by_name(db=db, name=TEMPLATE)
+    placeholders = _sample_placeholders(template)
+    prices = chat_flow.get_prices(db)
+    version = db.query(ProductVersion).order_by(ProductVersion.id).first()
+    outputs.get_prices(db=db, chat_id=BENCH_CHAT_ID, prices=prices)  # fill the cache
+
+    return {
+        "render.render_chat_outputs": lambda: _render_chat_outputs(
+            template=template, chat_id=BENCH_CHAT_ID, **placeholders
+        ),
+        "render.map_buttons_in_order": lambda: _map_buttons_in_order(
+            chat_output=template, **placeholders
+        ),
+        "render.get_prices": lambda: outputs.get_prices(
+            db=db, chat_id=BENCH_CHAT_ID, prices=prices
+        ),
+        "routing.process_callback_query": lambda: process_callback_query(
+            query_id="1",
+            chat_id=BENCH_CHAT_ID,
+            query_data="accepted_terms",
+            message_id=1,
+            db=db,
+            outputs=outputs,
+        ),
+        "pricing.get_version_price": lambda: get_version_price(version, db),
+        "crud.get_chat_by_chat_id": lambda: get_chat_by_chat_id(db, BENCH_CHAT_ID),
+        "crud.get_products": lambda: get_products(db=db),
+        "crud.get_product_version_by_id": lambda: get_product_version_by_id(
+            db=db, id=version.id
+        ),
+        "crud.get_chat_output_by_name": lambda: get_chat_output_by_name(
+            db=db, name=TEMPLATE
+        ),
+    }
+
+
+# --- Baseline ---
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float
+) -> List[str]:
+    """Names of benchmarks whose median is more than `threshold` above the baseline."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"  {name:<36} {result['median'] * 1e6:>10.1f}us  (new)")
+            continue
+        change = result["median"] / base["median"] - 1
+        flag = "REGRESSION" if change > threshold else ""
+        print(
+            f"  {name:<36} {result['median'] * 1e6:>10.1f}us  "
+            f"baseline {base['median'] * 1e6:>10.1f}us  {change:+7.1%} {flag}"
+        )
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db-url", default=os.getenv("BENCH_DB_URL", "sqlite://"))
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", help="also write this run's results here")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds per sample")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("-k", dest="select", default="", help="only names containing this")
+    args = parser.parse_args()
+
+    db, teardown = make_scratch_session(args.db_url)
+    try:
+        _seed(db)
+        benchmarks = build_benchmarks(db)
+        results = {}
+        for name, func in benchmarks.items():
+            if args.select in name:
+                results[name] = measure(func, args.min_time, args.repeat)
+    finally:
+        teardown()
+
+    document = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "db": args.db_url.split(":", 1)[0],
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+
+    if not os.path.exists(args.baseline):
+        print("no baseline yet, run with --save-baseline first")
+        compare(results, {}, args.threshold)
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"against {args.baseline} ({baseline['meta']}):")
+    regressions = compare(results, baseline["results"], args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
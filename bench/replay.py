@@ -0,0 +1,113 @@
+"""
+Replay a webhook update capture (UPDATE_CAPTURE_FILE) against a fresh database.
+
+Updates go straight through serialize_message / serialize_callback_query, the
+same as the webhook router after parsing, at the captured pace scaled by
+--speed (0 = as fast as possible). Each update is committed on its own like
+the webhook does; a failed one is rolled back alone. Replies are built but
+not sent.
+
+    python -m bench.replay updates.tgcap --speed 1
+    python -m bench.replay updates.tgcap --speed 10 --limit 50000
+    BENCH_DB_URL=postgresql+psycopg://... python -m bench.replay updates.tgcap --speed 0
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from bench.micro import make_scratch_session, seed_catalog
+from src.bot.chat_output import TelegrambotOutputs
+from src.bot.processor import serialize_callback_query, serialize_message
+from src.core.capture import read_capture
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def replay(path: str, db, speed: float, limit: int) -> Dict[str, Any]:
+    outputs = TelegrambotOutputs()
+    latencies: List[float] = []
+    kinds: Counter = Counter()
+    errors: Counter = Counter()
+    max_behind = 0.0
+    first_ms = None
+    started = time.perf_counter()
+
+    for n, (captured_ms, update) in enumerate(read_capture(path)):
+        if limit and n >= limit:
+            break
+        if first_ms is None:
+            first_ms = captured_ms
+        if speed > 0:
+            due = started + (captured_ms - first_ms) / 1000 / speed
+            now = time.perf_counter()
+            if due > now:
+                time.sleep(due - now)
+            else:
+                max_behind = max(max_behind, now - due)
+
+        message = (
+            update.get("message")
+            or update.get("edited_message")
+            or update.get("channel_post")
+        )
+        callback_query = update.get("callback_query")
+        t0 = time.perf_counter()
+        try:
+            if message is not None:
+                kinds["message"] += 1
+                serialize_message(payload=message, db=db, outputs=outputs)
+            elif callback_query is not None:
+                kinds["callback_query"] += 1
+                serialize_callback_query(payload=callback_query, db=db, outputs=outputs)
+            else:
+                kinds["ignored"] += 1
+                continue
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            errors[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - t0)
+
+    elapsed = time.perf_counter() - started
+    ordered = sorted(latencies)
+    return {
+        "updates": len(latencies),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(_percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(_percentile(ordered, 99) * 1000, 2),
+        "max_ms": round(max(ordered, default=0.0) * 1000, 2),
+        "max_behind_schedule_ms": round(max_behind * 1000, 1),
+        "kinds": dict(kinds),
+        "errors": dict(errors),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("capture")
+    parser.add_argument("--db-url", default=os.getenv("BENCH_DB_URL", "sqlite://"))
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = captured pace, 0 = flat out")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many updates")
+    args = parser.parse_args()
+
+    db, teardown = make_scratch_session(args.db_url)
+    try:
+        seed_catalog(db)
+        result = replay(args.capture, db, args.speed, args.limit)
+    finally:
+        teardown()
+    print(json.dumps({"capture": args.capture, "speed": args.speed, **result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,110 +1,233 @@
+import asyncio
 import uvicorn
-import httpx
 
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from urllib.parse import urljoin
 from sqlalchemy.orm import Session
-from typing import Optional
-from argon2 import PasswordHasher
+from typing import Any, Dict, Optional
 
-from src.routers import auth, health, payment, telegram, bot
+from src.routers import auth, health, metrics, payment, telegram, bot, reports
 from src.config import settings, logger
 from src.tunnel import start_ngrok_tunnel, stop_ngrok_tunnel, get_current_ngrok_url
 from src.bot.webhook import set_webhook, delete_webhook
+from src.clients.telegram import TelegramClient
 from src.bot.chat_output import TelegrambotOutputs
 from src.db.seed import seed_initial_products, seed_initial_chat_outputs
-from src.db.seed_data import SEED_TELEGRAM_OUTPUTS
+from src.db.seed_data import SEED_TELEGRAM_OUTPUTS, SEED_TELEGRAM_OUTPUT_TRANSLATIONS
 from src.db import SessionLocal
+from src.startup import StartupStep, run_startup
+from src.core.metrics import monitor_event_loop_lag
+from src.bot.outbox import OutboxDispatcher
+from src.bot.notifications import register_payment_handlers
+from src.core.events import EventBus
+from src.services.cart import carts
+from src.services.order_expiry import order_expirer
+from src.services.search import inline_search
+from src.workers import UpdateForwarder, WorkerPool, worker_index, worker_ports
+
+
+def _seed_db() -> None:
+    db: Session = SessionLocal()
+    try:
+        seed_initial_products(db)
+        seed_initial_chat_outputs(
+            db,
+            seed_data=SEED_TELEGRAM_OUTPUTS,
+            translations=SEED_TELEGRAM_OUTPUT_TRANSLATIONS,
+        )
+    finally:
+        db.close()
+
+
+def _acquire_public_url() -> tuple[Optional[str], bool]:
+    """Returns (public_url, using_ngrok)."""
+    if settings.webhook:
+        return str(settings.webhook), False
+
+    public_url = start_ngrok_tunnel()
+    if not public_url:
+        # try to read the running ngrok url if the tunnel is already up
+        public_url = get_current_ngrok_url()
+    return public_url, True
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
-    Startup:
-      - create shared httpx AsyncClient
+    Startup (a dependency graph, independent steps run concurrently):
+      - create the shared Telegram API client
       - discover or start public URL (webhook or ngrok)
-      - set Telegram webhook
+      - set Telegram webhook                      (after the public URL)
       - seed the db with the default chat outputs
       - initilize the chat output state machine
-      - initilize the password hasher
+      - start the event loop lag probe (metrics)
+      - start the outbox dispatcher               (OUTBOX_ENABLED, after the client)
+      - wire the event bus (payment confirmations are pushed to the buyer)
+      - start the cart flusher                    (carts are written lazily)
+      - build the inline search index             (after seeding, kept fresh in the background)
+      - start the order expirer                   (unpaid orders past ORDER_PENDING_TTL)
+      - start the worker processes                (WORKERS > 1, after seeding)
+      the password hasher is built lazily by the auth endpoints
+      a worker process skips the public URL and webhook, the dispatcher owns them
     Shutdown:
       - delete Telegram webhook
       - stop ngrok if we started it
-      - close AsyncClient
+      - flush the carts
+      - stop the inline index refresher
+      - stop the order expirer
+      - stop the worker processes
+      - close the Telegram API client
       TODO make a gracefull shutdown for all the other startup items as well
     """
-    # 1) shared HTTP client
-    app.state.http = httpx.AsyncClient()
-
-    # 2) get public URL
-    public_url: Optional[str] = None
     using_ngrok = False
+    is_worker = worker_index() is not None
+    pool: Optional[WorkerPool] = None
 
-    if settings.webhook:
-        public_url = str(settings.webhook)
-    else:
-        using_ngrok = True
-        public_url = start_ngrok_tunnel()
-        if not public_url:
-            # try to read the running ngrok url if the tunnel is already up
-            public_url = get_current_ngrok_url()
+    async def telegram_client(results: Dict[str, Any]) -> TelegramClient:
+        app.state.telegram = TelegramClient()
+        return app.state.telegram
 
-    if not public_url:
-        # can't serve webhooks at all
-        await app.state.http.aclose()
-        raise RuntimeError("Failed to acquire a public HTTPS URL (webhook or ngrok).")
+    async def public_url(results: Dict[str, Any]) -> str:
+        nonlocal using_ngrok
+        url, using_ngrok = await asyncio.to_thread(_acquire_public_url)
+        if not url:
+            # can't serve webhooks at all
+            raise RuntimeError(
+                "Failed to acquire a public HTTPS URL (webhook or ngrok)."
+            )
+        logger.info("Local http://%s:%s  →  %s", settings.host, settings.port.value, url)
+        return url
 
-    logger.info(
-        "Local http://%s:%s  →  %s", settings.host, settings.port.value, public_url
-    )
-
-    # 3) set telegram webhook
-    target_url = urljoin(public_url.rstrip("/") + "/", settings.endpoint.lstrip("/"))
-    try:
-        await set_webhook(target_url)
+    async def webhook(results: Dict[str, Any]) -> None:
+        url = results["public_url"]
+        target_url = urljoin(url.rstrip("/") + "/", settings.endpoint.lstrip("/"))
+        try:
+            await set_webhook(results["telegram_client"], target_url)
+        except Exception as e:
+            raise RuntimeError(f"Failed to set Telegram webhook: {e}") from e
         logger.info("Webhook registered at: %s", target_url)
-    except Exception as e:
-        await app.state.http.aclose()
-        if using_ngrok:
-            stop_ngrok_tunnel()
-        raise RuntimeError(f"Failed to set Telegram webhook: {e}") from e
 
-    try:
-        db: Session = SessionLocal()
-        seed_initial_products(db)
-        seed_initial_chat_outputs(db, seed_data=SEED_TELEGRAM_OUTPUTS)
-        db.close()
-    except Exception as e:
-        logger.error(f"Database seeding failed: {e}")
-        raise
-    # ---- hand control to the app ----
+    async def seed_db(results: Dict[str, Any]) -> None:
+        try:
+            await asyncio.to_thread(_seed_db)
+        except Exception as e:
+            logger.error(f"Database seeding failed: {e}")
+            raise
 
-    # ----- init of the telegram chat outputs----#
-    try:
+    async def outputs(results: Dict[str, Any]) -> None:
         app.state.outputs = TelegrambotOutputs()
-    except Exception as e:
-        logger.error(f"failed to initilize the bot outputs at the lifecycle: {e}")
 
-    # ----- init of the password hasher----#
-    try:
-        app.state.ph = PasswordHasher(
-            time_cost=3,  # iterations
-            memory_cost=65536,  # 64 MB
-            parallelism=2,
+    async def loop_lag_monitor(results: Dict[str, Any]) -> None:
+        app.state.loop_lag_task = asyncio.create_task(monitor_event_loop_lag())
+
+    async def outbox_dispatcher(results: Dict[str, Any]) -> None:
+        app.state.outbox = OutboxDispatcher(results["telegram_client"])
+        app.state.outbox.start()
+
+    async def events(results: Dict[str, Any]) -> None:
+        app.state.events = EventBus()
+        register_payment_handlers(app, app.state.events)
+
+    async def cart_flusher(results: Dict[str, Any]) -> None:
+        carts.start()
+        app.state.carts = carts
+
+    async def inline_index(results: Dict[str, Any]) -> None:
+        await inline_search.start()
+        app.state.inline_search = inline_search
+
+    async def order_expiry(results: Dict[str, Any]) -> None:
+        order_expirer.start()
+        app.state.order_expirer = order_expirer
+
+    async def workers(results: Dict[str, Any]) -> None:
+        nonlocal pool
+        ports = worker_ports()
+        pool = WorkerPool(ports)
+        await pool.start()
+        app.state.forwarder = UpdateForwarder(ports)
+        logger.info("Dispatching updates to %s workers by chat", len(ports))
+
+    steps = [
+        StartupStep("telegram_client", telegram_client),
+        StartupStep("seed_db", seed_db),
+        StartupStep("outputs", outputs, required=False),
+        StartupStep("loop_lag_monitor", loop_lag_monitor, required=False),
+        StartupStep("events", events, after=("telegram_client",), required=False),
+    ]
+    # whoever handles the updates sends their replies and holds the carts
+    handles_updates = is_worker or settings.workers == 1
+    if settings.outbox_enabled and handles_updates:
+        steps.append(
+            StartupStep("outbox", outbox_dispatcher, after=("telegram_client",))
         )
-    except Exception as e:
-        logger.error(f"failed to intilize the password hasher: {e}")
+    if handles_updates:
+        steps.append(StartupStep("carts", cart_flusher, required=False))
+        steps.append(
+            StartupStep("inline_index", inline_index, after=("seed_db",), required=False)
+        )
+    if not is_worker:
+        # one sweeper per deployment, not one per worker
+        steps.append(
+            StartupStep("order_expiry", order_expiry, after=("seed_db",), required=False)
+        )
+        # the webhook goes live only once there is something to take updates
+        webhook_after = ("telegram_client", "public_url")
+        if settings.workers > 1:
+            steps.append(StartupStep("workers", workers, after=("seed_db",)))
+            webhook_after += ("workers",)
+        steps += [
+            StartupStep("public_url", public_url),
+            StartupStep("webhook", webhook, after=webhook_after),
+        ]
 
+    try:
+        await run_startup(steps)
+    except BaseException:
+        if hasattr(app.state, "outbox"):
+            await app.state.outbox.stop()
+        if hasattr(app.state, "telegram"):
+            await app.state.telegram.aclose()
+        if using_ngrok:
+            stop_ngrok_tunnel()
+        if pool is not None:
+            await pool.stop()
+        raise
+
+    # ---- hand control to the app ----
     try:
         yield
     finally:
         # ---- graceful shutdown ----
-        try:
-            await delete_webhook(drop_pending=True)
-            logger.info("Webhook deleted.")
-        except Exception as e:
-            logger.warning("Failed to delete webhook: %s", e)
+        if hasattr(app.state, "loop_lag_task"):
+            app.state.loop_lag_task.cancel()
+
+        if hasattr(app.state, "events"):
+            await app.state.events.drain()
+
+        if hasattr(app.state, "outbox"):
+            # unsent messages stay in the table for the next start
+            await app.state.outbox.stop()
+
+        if hasattr(app.state, "carts"):
+            try:
+                await app.state.carts.stop()
+            except Exception as e:
+                logger.warning("Failed to flush the carts: %s", e)
+
+        if hasattr(app.state, "inline_search"):
+            await app.state.inline_search.stop()
+
+        if hasattr(app.state, "order_expirer"):
+            await app.state.order_expirer.stop()
+
+        if not is_worker:
+            try:
+                await delete_webhook(app.state.telegram, drop_pending=True)
+                logger.info("Webhook deleted.")
+            except Exception as e:
+                logger.warning("Failed to delete webhook: %s", e)
 
         if using_ngrok:
             try:
@@ -112,8 +235,12 @@ async def lifespan(app: FastAPI):
             except Exception as e:
                 logger.warning("Failed to stop ngrok: %s", e)
 
+        if pool is not None:
+            await app.state.forwarder.aclose()
+            await pool.stop()
+
         try:
-            await app.state.http.aclose()
+            await app.state.telegram.aclose()
         except Exception:
             pass
 
@@ -128,10 +255,12 @@ app = FastAPI(
 )
 
 app.include_router(health.router, prefix="/health", tags=["Health"])
+app.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(telegram.router, prefix="/telegram", tags=["Telegram"])
 app.include_router(payment.router, prefix="/payment", tags=["Payment"])
 app.include_router(bot.router, prefix="/bot", tags=["Bot"])
+app.include_router(reports.router, prefix="/reports", tags=["Reports"])
 
 if __name__ == "__main__":
     uvicorn.run(app=app, host=settings.host, port=settings.port.value)
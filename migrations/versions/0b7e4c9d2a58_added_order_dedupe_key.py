@@ -0,0 +1,44 @@
+"""added orders.dedupe_key, unique among the orders waiting for payment
+
+Revision ID: 0b7e4c9d2a58
+Revises: e5b8a3d61f09
+Create Date: 2026-10-19 21:20:52.640117
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0b7e4c9d2a58"
+down_revision: Union[str, Sequence[str], None] = "e5b8a3d61f09"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # existing orders keep a NULL key, NULLs never conflict
+    op.add_column("orders", sa.Column("dedupe_key", sa.String(length=128), nullable=True))
+    op.create_index(
+        "ux_orders_dedupe_key_waiting_for_payment",
+        "orders",
+        ["dedupe_key"],
+        unique=True,
+        postgresql_where=sa.text("status = 'WAITING_FOR_PAYMENT'"),
+        sqlite_where=sa.text("status = 'WAITING_FOR_PAYMENT'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ux_orders_dedupe_key_waiting_for_payment",
+        table_name="orders",
+        postgresql_where=sa.text("status = 'WAITING_FOR_PAYMENT'"),
+        sqlite_where=sa.text("status = 'WAITING_FOR_PAYMENT'"),
+    )
+    op.drop_column("orders", "dedupe_key")
@@ -0,0 +1,65 @@
+"""chat outputs and buttons get a locale, chats a preferred one
+
+Revision ID: 2c6f8e1a9d37
+Revises: 5a9c0e2f7b14
+Create Date: 2026-10-19 22:41:17.508213
+
+Names are unique per locale now. The existing rows are the English (base)
+variants.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "2c6f8e1a9d37"
+down_revision: Union[str, Sequence[str], None] = "5a9c0e2f7b14"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        # left over from unique=True on the name column, unnamed in the model
+        op.execute(
+            "ALTER TABLE chat_outputs DROP CONSTRAINT IF EXISTS chat_outputs_name_key"
+        )
+    with op.batch_alter_table("chat_outputs") as batch_op:
+        batch_op.add_column(
+            sa.Column("locale", sa.String(length=16), server_default="en", nullable=False)
+        )
+        batch_op.drop_constraint("uq_chat_output_name", type_="unique")
+        batch_op.create_unique_constraint(
+            "uq_chat_output_name_locale", ["name", "locale"]
+        )
+    with op.batch_alter_table("buttons") as batch_op:
+        batch_op.add_column(
+            sa.Column("locale", sa.String(length=16), server_default="en", nullable=False)
+        )
+        batch_op.drop_constraint("uq_button_name", type_="unique")
+        batch_op.create_unique_constraint("uq_button_name_locale", ["name", "locale"])
+    op.add_column("chats", sa.Column("locale", sa.String(length=16), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("chats", "locale")
+    # only the base variants fit the old unique names
+    op.execute("DELETE FROM chat_outputs WHERE locale <> 'en'")
+    op.execute(
+        "DELETE FROM button_indexes WHERE button_id IN "
+        "(SELECT id FROM buttons WHERE locale <> 'en')"
+    )
+    op.execute("DELETE FROM buttons WHERE locale <> 'en'")
+    with op.batch_alter_table("buttons") as batch_op:
+        batch_op.drop_constraint("uq_button_name_locale", type_="unique")
+        batch_op.create_unique_constraint("uq_button_name", ["name"])
+        batch_op.drop_column("locale")
+    with op.batch_alter_table("chat_outputs") as batch_op:
+        batch_op.drop_constraint("uq_chat_output_name_locale", type_="unique")
+        batch_op.create_unique_constraint("uq_chat_output_name", ["name"])
+        batch_op.drop_column("locale")
@@ -0,0 +1,59 @@
+"""added outbox_messages table for replies sent after the transaction commits
+
+Revision ID: 3e8a1f0c7b52
+Revises: b0c3e391da0c
+Create Date: 2026-10-19 18:02:44.530918
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3e8a1f0c7b52"
+down_revision: Union[str, Sequence[str], None] = "b0c3e391da0c"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+outbox_status = sa.Enum("PENDING", "SENDING", "SENT", "FAILED", name="outboxstatus")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "outbox_messages",
+        sa.Column(
+            "id",
+            sa.BigInteger().with_variant(sa.Integer(), "sqlite"),
+            nullable=False,
+        ),
+        sa.Column("chat_id", sa.BigInteger(), nullable=True),
+        sa.Column("method", sa.String(length=64), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("status", outbox_status, nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("available_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("claimed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_outbox_messages_unsent",
+        "outbox_messages",
+        ["status", "available_at"],
+        unique=False,
+        postgresql_where=sa.text("status IN ('PENDING', 'SENDING')"),
+        sqlite_where=sa.text("status IN ('PENDING', 'SENDING')"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_outbox_messages_unsent", table_name="outbox_messages")
+    op.drop_table("outbox_messages")
+    outbox_status.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,57 @@
+"""added an index on the unsent outbox messages per chat
+
+Revision ID: 4f1a7c3e9b20
+Revises: 8e3b5d0f2c61
+Create Date: 2026-10-20 10:21:36.417052
+
+claim_messages only takes a chat's oldest unsent message, so every due
+row asks whether its chat has an earlier unsent one. Built CONCURRENTLY
+on postgres like the other indexes on live tables.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4f1a7c3e9b20"
+down_revision: Union[str, Sequence[str], None] = "8e3b5d0f2c61"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UNSENT_CHAT_INDEX = "ix_outbox_messages_unsent_chat_id"
+UNSENT_WHERE = sa.text("status IN ('PENDING', 'SENDING')")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    index_kwargs = {"postgresql_concurrently": True} if concurrently else {}
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            UNSENT_CHAT_INDEX,
+            "outbox_messages",
+            ["chat_id", "id"],
+            unique=False,
+            if_not_exists=True,
+            postgresql_where=UNSENT_WHERE,
+            sqlite_where=UNSENT_WHERE,
+            **index_kwargs,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    index_kwargs = {"postgresql_concurrently": True} if concurrently else {}
+
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            UNSENT_CHAT_INDEX,
+            table_name="outbox_messages",
+            if_exists=True,
+            **index_kwargs,
+        )
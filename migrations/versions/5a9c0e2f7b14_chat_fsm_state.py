@@ -0,0 +1,88 @@
+"""chat conversation state as fsm_state + packed fsm_counters
+
+Revision ID: 5a9c0e2f7b14
+Revises: 0b7e4c9d2a58
+Create Date: 2026-10-19 21:58:40.371265
+
+Replaces accepted_terms, pending_action, phone_input_attempt and
+otp_input_attempt (see src/bot/fsm.py for the numbering and bit layout).
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5a9c0e2f7b14"
+down_revision: Union[str, Sequence[str], None] = "0b7e4c9d2a58"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _capped(column: str) -> str:
+    # counters get 4 bits
+    return f"(CASE WHEN COALESCE({column}, 0) > 15 THEN 15 ELSE COALESCE({column}, 0) END)"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "chats",
+        sa.Column("fsm_state", sa.SmallInteger(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "chats",
+        sa.Column("fsm_counters", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.execute(
+        f"""
+        UPDATE chats SET
+            fsm_state = CASE
+                WHEN pending_action = 'waiting_for_phone_number' THEN 2
+                WHEN pending_action = 'waiting_for_otp' THEN 3
+                WHEN accepted_terms THEN 1
+                ELSE 0
+            END,
+            fsm_counters = {_capped("phone_input_attempt")}
+                + 16 * {_capped("otp_input_attempt")}
+        """
+    )
+    with op.batch_alter_table("chats") as batch_op:
+        batch_op.drop_column("otp_input_attempt")
+        batch_op.drop_column("phone_input_attempt")
+        batch_op.drop_column("pending_action")
+        batch_op.drop_column("accepted_terms")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("chats") as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "accepted_terms", sa.Boolean(), server_default="false", nullable=False
+            )
+        )
+        batch_op.add_column(sa.Column("pending_action", sa.String(), nullable=True))
+        batch_op.add_column(
+            sa.Column("phone_input_attempt", sa.Integer(), server_default="0", nullable=True)
+        )
+        batch_op.add_column(
+            sa.Column("otp_input_attempt", sa.Integer(), server_default="0", nullable=True)
+        )
+    op.execute(
+        """
+        UPDATE chats SET
+            accepted_terms = (fsm_state <> 0),
+            pending_action = CASE fsm_state
+                WHEN 2 THEN 'waiting_for_phone_number'
+                WHEN 3 THEN 'waiting_for_otp'
+            END,
+            phone_input_attempt = fsm_counters % 16,
+            otp_input_attempt = (fsm_counters / 16) % 16
+        """
+    )
+    with op.batch_alter_table("chats") as batch_op:
+        batch_op.drop_column("fsm_counters")
+        batch_op.drop_column("fsm_state")
@@ -0,0 +1,47 @@
+"""order status transitions: cancelled status, version and idempotency key
+
+Revision ID: 6c41d2b9e0a7
+Revises: 3e8a1f0c7b52
+Create Date: 2026-10-19 19:26:11.204387
+
+Cancelled orders are kept (status CANCELLED) instead of deleted. version
+and last_transition_key back the conditional UPDATE in
+crud.order.transition_order.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6c41d2b9e0a7"
+down_revision: Union[str, Sequence[str], None] = "3e8a1f0c7b52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        # a new enum value can't be added inside a transaction block
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE orderstatus ADD VALUE IF NOT EXISTS 'CANCELLED'")
+
+    # server default fills existing rows without rewriting the table (pg 11+)
+    op.add_column(
+        "orders",
+        sa.Column("version", sa.Integer(), server_default=sa.text("0"), nullable=False),
+    )
+    op.add_column(
+        "orders",
+        sa.Column("last_transition_key", sa.String(length=128), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("orders", "last_transition_key")
+    op.drop_column("orders", "version")
+    # postgres can't drop a single enum value; CANCELLED stays in the type
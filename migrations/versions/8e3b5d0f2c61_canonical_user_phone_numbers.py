@@ -0,0 +1,109 @@
+"""users.phone_number in canonical E.164 form, deduplicated, hash indexed
+
+Revision ID: 8e3b5d0f2c61
+Revises: 2c6f8e1a9d37
+Create Date: 2026-10-19 23:12:44.893502
+
+Numbers stored as typed (09…, +989…) become +989…. When several users end
+up with the same number, the one that verified it (else the oldest) keeps
+it; the others lose the number and their chats are asked for one again.
+Numbers that aren't Iranian mobile numbers are cleared the same way.
+"""
+
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8e3b5d0f2c61"
+down_revision: Union[str, Sequence[str], None] = "2c6f8e1a9d37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# a frozen copy of src/core/phone.py, the migration must not change with it
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+_SEPARATORS = re.compile(r"[\s\-().\u200c\u200e\u200f]")
+_IRAN_MOBILE = re.compile(r"^(?:\+98|0098|98|0)(9\d{9})$")
+
+users = sa.table(
+    "users",
+    sa.column("id", sa.Integer),
+    sa.column("phone_number", sa.String),
+    sa.column("phone_number_validated", sa.Boolean),
+)
+chats = sa.table(
+    "chats",
+    sa.column("user_id", sa.Integer),
+    sa.column("chat_verified", sa.Boolean),
+)
+
+
+def _normalize(raw: str) -> Optional[str]:
+    match = _IRAN_MOBILE.fullmatch(_SEPARATORS.sub("", raw.translate(_DIGITS)))
+    return f"+98{match.group(1)}" if match else None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(users.c.id, users.c.phone_number, users.c.phone_number_validated)
+        .where(users.c.phone_number.is_not(None))
+        .order_by(users.c.id)
+    ).all()
+
+    by_phone: Dict[str, List] = defaultdict(list)
+    cleared: List[int] = []
+    for row in rows:
+        canonical = _normalize(row.phone_number)
+        if canonical is None:
+            cleared.append(row.id)
+        else:
+            by_phone[canonical].append(row)
+
+    renamed: List[Dict] = []
+    for canonical, owners in by_phone.items():
+        # verified first, then the oldest
+        keeper = min(owners, key=lambda r: (not r.phone_number_validated, r.id))
+        cleared += [r.id for r in owners if r is not keeper]
+        if keeper.phone_number != canonical:
+            renamed.append({"user_id": keeper.id, "canonical": canonical})
+
+    # the cleared numbers go first, a renamed one may take one of them
+    if cleared:
+        bind.execute(
+            users.update()
+            .where(users.c.id.in_(cleared))
+            .values(phone_number=None, phone_number_validated=False)
+        )
+        bind.execute(
+            chats.update()
+            .where(chats.c.user_id.in_(cleared))
+            .values(chat_verified=False)
+        )
+    if renamed:
+        bind.execute(
+            users.update()
+            .where(users.c.id == sa.bindparam("user_id"))
+            .values(phone_number=sa.bindparam("canonical")),
+            renamed,
+        )
+
+    op.create_index(
+        "ix_users_phone_number_hash",
+        "users",
+        ["phone_number"],
+        postgresql_using="hash",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # the numbers stay canonical, the old code accepts +989… as well
+    op.drop_index(
+        "ix_users_phone_number_hash", table_name="users", postgresql_using="hash"
+    )
@@ -0,0 +1,87 @@
+"""added sales_daily_rollups table and the (user_id, id) index for order history
+
+Revision ID: 9d2f7c4a1e63
+Revises: 6c41d2b9e0a7
+Create Date: 2026-10-19 20:11:37.582014
+
+ix_orders_user_id_id replaces ix_orders_user_id, whose lookups it serves
+as well. On postgres both are built / dropped CONCURRENTLY so the
+migration never blocks writes on orders.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9d2f7c4a1e63"
+down_revision: Union[str, Sequence[str], None] = "6c41d2b9e0a7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "sales_daily_rollups",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("product_version_id", sa.Integer(), nullable=False),
+        sa.Column("orders_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("items_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column(
+            "revenue", sa.Numeric(precision=18, scale=8), server_default="0", nullable=False
+        ),
+        sa.ForeignKeyConstraint(["product_version_id"], ["product_versions.id"]),
+        sa.PrimaryKeyConstraint("day", "product_version_id"),
+    )
+    # backfill from the orders paid so far; from here on the PAID
+    # transition keeps the table current
+    bind = op.get_bind()
+    day = "date(o.paid_at)" if bind.dialect.name == "sqlite" else "CAST(o.paid_at AS DATE)"
+    op.execute(
+        f"""
+        INSERT INTO sales_daily_rollups
+            (day, product_version_id, orders_count, items_count, revenue)
+        SELECT {day}, i.product_version_id, COUNT(DISTINCT o.id),
+               SUM(i.quantity), SUM(i.unit_price * i.quantity)
+        FROM orders o JOIN order_items i ON i.order_id = o.id
+        WHERE o.status = 'PAID' AND o.paid_at IS NOT NULL
+        GROUP BY {day}, i.product_version_id
+        """
+    )
+
+    concurrently = bind.dialect.name == "postgresql"
+    index_kwargs = {"postgresql_concurrently": True} if concurrently else {}
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_orders_user_id_id",
+            "orders",
+            ["user_id", "id"],
+            unique=False,
+            if_not_exists=True,
+            **index_kwargs,
+        )
+        op.drop_index(
+            "ix_orders_user_id", table_name="orders", if_exists=True, **index_kwargs
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    index_kwargs = {"postgresql_concurrently": True} if concurrently else {}
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_orders_user_id",
+            "orders",
+            ["user_id"],
+            unique=False,
+            if_not_exists=True,
+            **index_kwargs,
+        )
+        op.drop_index(
+            "ix_orders_user_id_id", table_name="orders", if_exists=True, **index_kwargs
+        )
+    op.drop_table("sales_daily_rollups")
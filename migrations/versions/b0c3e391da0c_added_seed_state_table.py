@@ -0,0 +1,35 @@
+"""added seed_state table so unchanged seeds are skipped at startup
+
+Revision ID: b0c3e391da0c
+Revises: da82e4748e39
+Create Date: 2026-10-19 15:41:05.117342
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b0c3e391da0c"
+down_revision: Union[str, Sequence[str], None] = "da82e4748e39"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "seed_state",
+        sa.Column("name", sa.String(length=64), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("seed_state")
@@ -0,0 +1,70 @@
+"""added indexes for the hot lookup columns
+
+Revision ID: da82e4748e39
+Revises: fc874e738167
+Create Date: 2026-10-19 15:09:47.902514
+
+Foreign keys are not indexed automatically on postgres, so every
+chat -> user join, order -> items load and product -> versions load
+was a sequential scan. On postgres the indexes are built CONCURRENTLY
+so the migration never blocks writes on a live table.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "da82e4748e39"
+down_revision: Union[str, Sequence[str], None] = "fc874e738167"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns)
+FK_INDEXES = [
+    ("ix_chats_user_id", "chats", ["user_id"]),
+    ("ix_orders_user_id", "orders", ["user_id"]),
+    ("ix_order_items_order_id", "order_items", ["order_id"]),
+    ("ix_order_items_product_version_id", "order_items", ["product_version_id"]),
+    ("ix_product_versions_product_id", "product_versions", ["product_id"]),
+]
+
+PENDING_ORDERS_INDEX = "ix_orders_user_id_waiting_for_payment"
+PENDING_ORDERS_WHERE = sa.text("status = 'WAITING_FOR_PAYMENT'")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    index_kwargs = {"postgresql_concurrently": True} if concurrently else {}
+
+    with op.get_context().autocommit_block():
+        for name, table, columns in FK_INDEXES:
+            op.create_index(
+                name, table, columns, unique=False, if_not_exists=True, **index_kwargs
+            )
+        op.create_index(
+            PENDING_ORDERS_INDEX,
+            "orders",
+            ["user_id", "created_at"],
+            unique=False,
+            if_not_exists=True,
+            postgresql_where=PENDING_ORDERS_WHERE,
+            sqlite_where=PENDING_ORDERS_WHERE,
+            **index_kwargs,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    index_kwargs = {"postgresql_concurrently": True} if concurrently else {}
+
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            PENDING_ORDERS_INDEX, table_name="orders", if_exists=True, **index_kwargs
+        )
+        for name, table, _ in reversed(FK_INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, **index_kwargs)
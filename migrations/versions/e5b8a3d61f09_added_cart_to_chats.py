@@ -0,0 +1,29 @@
+"""added cart to chats, the lazily stored copy of the in-memory cart
+
+Revision ID: e5b8a3d61f09
+Revises: 9d2f7c4a1e63
+Create Date: 2026-10-19 20:48:05.116930
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5b8a3d61f09"
+down_revision: Union[str, Sequence[str], None] = "9d2f7c4a1e63"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("chats", sa.Column("cart", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("chats", "cart")
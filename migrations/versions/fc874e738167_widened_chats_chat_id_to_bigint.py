@@ -0,0 +1,107 @@
+"""widened chats.chat_id to bigint (telegram ids exceed 32 bits)
+
+Revision ID: fc874e738167
+Revises: 4d6fb82b34ea
+Create Date: 2026-10-19 15:02:11.418230
+
+On postgres a plain ALTER COLUMN TYPE rewrites the table under an
+ACCESS EXCLUSIVE lock, so the column is widened online instead:
+  1) add a shadow bigint column kept in sync by a trigger
+  2) backfill it in small autocommitted batches
+  3) build its unique index concurrently and validate a NOT NULL check
+  4) swap the columns inside one short transaction
+Other dialects (sqlite for local runs) just use batch mode.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "fc874e738167"
+down_revision: Union[str, Sequence[str], None] = "4d6fb82b34ea"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        with op.batch_alter_table("chats", schema=None) as batch_op:
+            batch_op.alter_column(
+                "chat_id",
+                existing_type=sa.Integer(),
+                type_=sa.BigInteger(),
+                existing_nullable=False,
+            )
+        return
+
+    # 1) shadow column + sync trigger so writes during the backfill are kept
+    op.add_column("chats", sa.Column("chat_id_big", sa.BigInteger(), nullable=True))
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION chats_sync_chat_id_big() RETURNS trigger AS $$
+        BEGIN
+            NEW.chat_id_big := NEW.chat_id;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER trg_chats_sync_chat_id_big "
+        "BEFORE INSERT OR UPDATE ON chats "
+        "FOR EACH ROW EXECUTE FUNCTION chats_sync_chat_id_big()"
+    )
+
+    with op.get_context().autocommit_block():
+        # 2) batched backfill, every batch commits on its own
+        backfill = sa.text(
+            "UPDATE chats SET chat_id_big = chat_id "
+            "WHERE id IN (SELECT id FROM chats WHERE chat_id_big IS NULL LIMIT :n)"
+        )
+        while bind.execute(backfill, {"n": BACKFILL_BATCH_SIZE}).rowcount:
+            pass
+
+        # 3) build everything the swap needs without blocking writers
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_chats_chat_id_big "
+            "ON chats (chat_id_big)"
+        )
+        op.execute(
+            "ALTER TABLE chats ADD CONSTRAINT ck_chats_chat_id_big_not_null "
+            "CHECK (chat_id_big IS NOT NULL) NOT VALID"
+        )
+        op.execute(
+            "ALTER TABLE chats VALIDATE CONSTRAINT ck_chats_chat_id_big_not_null"
+        )
+
+    # 4) swap (metadata only, SET NOT NULL reuses the validated check)
+    op.execute("LOCK TABLE chats IN ACCESS EXCLUSIVE MODE")
+    op.execute("DROP TRIGGER trg_chats_sync_chat_id_big ON chats")
+    op.execute("DROP FUNCTION chats_sync_chat_id_big()")
+    op.execute("ALTER TABLE chats ALTER COLUMN chat_id_big SET NOT NULL")
+    op.execute("ALTER TABLE chats DROP CONSTRAINT ck_chats_chat_id_big_not_null")
+    op.drop_column("chats", "chat_id")
+    op.alter_column("chats", "chat_id_big", new_column_name="chat_id")
+    op.execute(
+        "ALTER TABLE chats ADD CONSTRAINT chats_chat_id_key "
+        "UNIQUE USING INDEX uq_chats_chat_id_big"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # narrowing fails loudly if any stored chat id no longer fits in 32 bits
+    with op.batch_alter_table("chats", schema=None) as batch_op:
+        batch_op.alter_column(
+            "chat_id",
+            existing_type=sa.BigInteger(),
+            type_=sa.Integer(),
+            existing_nullable=False,
+        )
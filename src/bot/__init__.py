@@ -14,6 +14,14 @@ class ChatNotCreated(SystemError):
     pass
 
 
+class InvalidTransition(ValueError):
+    pass
+
+
+class StaleChatState(RuntimeError):
+    pass
+
+
 class TgChat(BaseModel):
     model_config = ConfigDict(extra="allow", populate_by_name=True)
     id: int
@@ -0,0 +1,212 @@
+import base64
+import binascii
+import secrets
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+
+from src.config import settings
+from src.core.cache import get_cache
+
+Arg = Union[int, str]
+
+# route -> (id, kinds of its args, trailing ones optional). The id byte is
+# what sent buttons carry: never renumber or reuse one, only append.
+ROUTES: Dict[str, Tuple[int, Tuple[type, ...]]] = {
+    "show_terms_for_acceptance": (1, ()),
+    "read_the_terms": (2, ()),
+    "accepted_terms": (3, ()),
+    "show_prices": (4, ()),
+    "return_to_menu": (5, ()),
+    "show_terms": (6, ()),
+    "support": (7, ()),
+    "contact_support": (8, ()),
+    "return_to_support": (9, ()),
+    "common_questions": (10, ()),
+    "edit_phone_number": (11, ()),
+    "send_validation_code": (12, ()),
+    "buy_product": (13, (int,)),
+    "buy_product_version": (14, (int,)),
+    "login_to_acount": (15, (str,)),
+    "payment_gateway": (16, (int,)),
+    "crypto_payment": (17, (int,)),
+    "cancel_order": (18, (int,)),
+    "confirm_payment": (19, (int,)),
+    "my_orders": (20, (int,)),
+    "cart": (21, ()),
+    "cart_add": (22, (int,)),
+    "cart_remove": (23, (int,)),
+    "cart_clear": (24, ()),
+    "cart_checkout": (25, ()),
+    "choose_language": (26, ()),
+    "set_locale": (27, (str,)),
+}
+
+_BY_ID: List[Optional[Tuple[str, Tuple[type, ...]]]] = [None] * 256
+for _name, (_id, _kinds) in ROUTES.items():
+    if _BY_ID[_id] is not None:
+        raise ValueError(f"callback route id {_id} used twice")
+    _BY_ID[_id] = (_name, _kinds)
+
+# compact data starts with this, it is not in the base64url alphabet and
+# no route name starts with it, so old "route:arg" buttons still decode
+MARK = "~"
+MAX_CALLBACK_DATA = 64  # bytes, Telegram's limit
+_TOKEN_BYTES = 6
+
+# string args too long to ride along, looked up by token on click
+_payloads = get_cache("callback_payloads", ttl=settings.callback_payload_ttl)
+
+
+class ExpiredCallback(ValueError):
+    """The button's server side payload is gone (TTL, restart)."""
+
+
+@dataclass(frozen=True)
+class Callback:
+    route: str
+    args: Tuple[Arg, ...] = ()
+
+    def arg(self, index: int = 0, default: Optional[Arg] = None) -> Optional[Arg]:
+        return self.args[index] if index < len(self.args) else default
+
+
+# --- varints ---
+
+
+def _put_varint(out: bytearray, value: int) -> None:
+    if value < 0:
+        raise ValueError("callback int args must not be negative")
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(raw: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        if pos >= len(raw):
+            raise ValueError("truncated callback data")
+        byte = raw[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+# --- encoding ---
+
+
+def encode_callback(route: str, *args: Arg) -> str:
+    """
+    Route id byte, then per arg a varint (ints) or a length-prefixed UTF-8
+    string; strings over CALLBACK_INLINE_MAX_BYTES are stored server side
+    and the button carries a short token instead.
+    """
+    route_id, kinds = ROUTES[route]
+    if len(args) > len(kinds):
+        raise ValueError(f"{route} takes at most {len(kinds)} args")
+    out = bytearray((route_id,))
+    for kind, value in zip(kinds, args):
+        if kind is int:
+            _put_varint(out, int(value))
+            continue
+        data = str(value).encode("utf-8")
+        if len(data) > settings.callback_inline_max_bytes:
+            token = secrets.token_bytes(_TOKEN_BYTES)
+            _payloads.set(token.hex(), str(value))
+            _put_varint(out, (len(token) << 1) | 1)
+            out += token
+        else:
+            _put_varint(out, len(data) << 1)
+            out += data
+    encoded = MARK + base64.urlsafe_b64encode(bytes(out)).rstrip(b"=").decode("ascii")
+    if len(encoded) > MAX_CALLBACK_DATA:
+        raise ValueError(f"callback data for {route} is over {MAX_CALLBACK_DATA} bytes")
+    return encoded
+
+
+def encode_legacy(data: str) -> str:
+    """
+    "route:arg" (template buttons after their placeholders are filled) in
+    the compact form; data that isn't a known route is kept as it is (noop).
+    """
+    route, sep, rest = data.partition(":")
+    spec = ROUTES.get(route)
+    if spec is None:
+        return data
+    kinds = spec[1]
+    if not sep:
+        return encode_callback(route)
+    return encode_callback(route, *_parse_legacy_args(kinds, rest))
+
+
+def _parse_legacy_args(kinds: Tuple[type, ...], rest: str) -> List[Arg]:
+    # the last arg takes the remainder, a string may contain ':'
+    parts = rest.split(":", len(kinds) - 1) if kinds else []
+    return [int(part) if kind is int else part for kind, part in zip(kinds, parts)]
+
+
+# --- decoding ---
+
+
+def _raw(data: str) -> bytes:
+    body = data[len(MARK):]
+    try:
+        return base64.urlsafe_b64decode(body + "=" * (-len(body) % 4))
+    except (binascii.Error, ValueError):
+        raise ValueError(f"malformed callback data: {data!r}")
+
+
+def decode_callback(data: Optional[str]) -> Callback:
+    """Compact or legacy "route:arg" data -> Callback; ValueError when unknown."""
+    data = data or ""
+    if not data.startswith(MARK):
+        route, sep, rest = data.partition(":")
+        spec = ROUTES.get(route)
+        if spec is None:
+            raise ValueError(f"unknown callback data: {data!r}")
+        return Callback(route, tuple(_parse_legacy_args(spec[1], rest)) if sep else ())
+
+    raw = _raw(data)
+    spec = _BY_ID[raw[0]] if raw else None
+    if spec is None:
+        raise ValueError(f"unknown callback data: {data!r}")
+    route, kinds = spec
+    args: List[Arg] = []
+    pos = 1
+    for kind in kinds:
+        if pos >= len(raw):
+            break  # optional trailing args left out
+        value, pos = _get_varint(raw, pos)
+        if kind is int:
+            args.append(value)
+            continue
+        size, is_token = value >> 1, value & 1
+        chunk = raw[pos : pos + size]
+        pos += size
+        if len(chunk) != size:
+            raise ValueError("truncated callback data")
+        if is_token:
+            payload = _payloads.get(chunk.hex())
+            if payload is None:
+                raise ExpiredCallback(f"{route} button expired")
+            args.append(payload)
+        else:
+            args.append(chunk.decode("utf-8"))
+    return Callback(route, tuple(args))
+
+
+def callback_route(data: Optional[str]) -> str:
+    """Route name only (metric labels): no arg decoding, no payload lookups."""
+    data = data or ""
+    if data.startswith(MARK):
+        try:
+            raw = _raw(data)
+        except ValueError:
+            return "unknown"
+        spec = _BY_ID[raw[0]] if raw else None
+        return spec[0] if spec is not None else "unknown"
+    route = data.split(":", 1)[0]
+    return route if route in ROUTES else "unknown"
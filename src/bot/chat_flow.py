@@ -3,21 +3,31 @@ from urllib.parse import urlencode
 from decimal import Decimal
 
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import select
-from src.models import Chat, Product
+from sqlalchemy import event, select
+from src.models import Chat, OrderItem, Product, ProductVersion
 
 from src.bot import TgChat
 from src.bot.chat_output import TelegrambotOutputs
+from src.bot.fsm import CHAT_FSM, ChatEvent
+from src.bot.i18n import use_locale
 
-from src.crud.products import get_product_version_by_id, get_product_by_id
+from src.crud.products import get_product_version_by_id, get_product_by_id, get_products
 from src.crud import order
 from src.crud import user
 
 from src.config import logger
 from src.config import settings
+from src.db.routing import read_replica
 
-from src.core.validators import is_valid_iranian_phone
-from src.services.pricing import get_version_price
+from src.core.phone import normalize_phone
+from src.services.pricing import get_version_price, get_version_prices
+from src.services.cart import CartFull, carts
+from src.services.order_status import get_order_status, remember_order_status
+from src.models.order import OrderStatus
+from src.core.cache import get_cache
+
+# the price list shown by the bot, rebuilt at most every CACHE_PRICE_LIST_TTL seconds
+_price_list = get_cache("price_list", ttl=settings.cache_price_list_ttl)
 
 
 def chat_first_level_authentication(
@@ -39,9 +49,11 @@ def chat_first_level_authentication(
                 username=data.username,
             )
 
-            return outputs.terms_and_conditions(data.id, append=True)
+            return outputs.terms_and_conditions(db=db, chat_id=data.id, append=True)
         if not chat.accepted_terms:
-            return outputs.terms_and_conditions(chat.chat_id, append=True)
+            return outputs.terms_and_conditions(
+                db=db, chat_id=chat.chat_id, append=True
+            )
         return True
     except Exception as e:
         logger.error(f"chat_first_level_authentication failed: {e}")
@@ -55,14 +67,13 @@ def chat_second_lvl_authentication(
         if chat.chat_verified is not True:
             user = chat.user
             if not user.phone_number:
-                user.update_chat(db, chat.id, pending_action="waiting_for_phone_number")
-                return outputs.phone_number_input(chat.chat_id)
+                return CHAT_FSM.fire(outputs, db, chat, ChatEvent.ASK_PHONE_NUMBER)
             if not user.phone_number_validated:
-                return outputs.phone_number_verfication_needed(
-                    chat.chat_id, phone_number=user.phone_number
+                return outputs.phone_number_verification_needed(
+                    db=db, chat_id=chat.chat_id, phone_number=user.phone_number
                 )
             return outputs.chat_verification_needed(
-                chat_id=chat.chat_id, phone_number=user.phone_number
+                db=db, chat_id=chat.chat_id, phone_number=user.phone_number
             )
 
         return True
@@ -79,6 +90,7 @@ def buy_product(
         product = get_product_by_id(db=db, id=product_id)
         versions_prices = get_product_prices(db=db, product=product)
         return outputs.buy_product(
+            db=db,
             chat_id=chat.chat_id,
             product=product,
             versions_prices=versions_prices,
@@ -91,13 +103,7 @@ def buy_product(
 def edit_phone_number(outputs: TelegrambotOutputs, db: Session, chat: Chat):
     try:
 
-        user.update_chat(
-            db=db,
-            chat_id_pk=chat.id,
-            chat_verified=False,
-            pending_action="waiting_for_phone_number",
-        )
-        return outputs.phone_number_input(chat_id=chat.chat_id)
+        return CHAT_FSM.fire(outputs, db, chat, ChatEvent.ASK_PHONE_NUMBER)
     except Exception as e:
         logger.error(f"edit_phone_number at chat flow failed:{e}")
         raise
@@ -107,21 +113,24 @@ def buy_product_version(
     outputs: TelegrambotOutputs, db: Session, chat: Chat, product_version_id: int
 ) -> Dict | None:
     try:
-        auth = chat_second_lvl_authentication(db=db, chat=chat)
+        auth = chat_second_lvl_authentication(outputs=outputs, db=db, chat=chat)
         if auth is not True:
             return auth
         product_version = get_product_version_by_id(db=db, id=product_version_id)
-        product_version_price = get_version_price(version=product_version, db=db)
-        order_data = order.create_order_with_items(
+        # a repeated press (or double click) gets the same open order back
+        order_data, _ = order.get_or_create_pending_order(
             db=db,
             user_id=chat.user_id,
             items=[order.CreateOrderItemIn(product_version_id=int(product_version_id))],
-            commit=True,
+            # committed by the webhook together with the reply (outbox)
+            commit=False,
         )
         return outputs.buy_product_version(
+            db=db,
             chat_id=chat.chat_id,
             product_version=product_version,
-            price=product_version_price,
+            # the price the order was created at, a reused one keeps its price
+            price=order_data.total_amount,
             order_id=order_data.id,
         )
     except Exception as e:
@@ -133,30 +142,31 @@ def phone_number_input(
     outputs: TelegrambotOutputs, db: Session, phone_number: str, chat_data: Chat
 ):
     try:
-        valid_phone_number = is_valid_iranian_phone(phone_number)
-        if not valid_phone_number:
-            attempts = chat_data.phone_input_attempt
-            if attempts >= 2:
-                user.update_chat(
-                    db, chat_data.id, phone_input_attempt=0, pending_action=None
-                )
-                return outputs.max_attempt_reached(chat_data.chat_id)
-            user.update_chat(db, chat_data.id, phone_input_attempt=attempts + 1)
-            return outputs.invalid_phone_number(chat_data.chat_id)
+        # from here on only the canonical form is used
+        phone_number = normalize_phone(phone_number)
+        if phone_number is None:
+            # invalid_phone_number, or max_attempt_reached on the last attempt
+            return CHAT_FSM.fire(
+                outputs, db, chat_data, ChatEvent.PHONE_NUMBER_REJECTED
+            )
         user_with_the_same_phone = user.get_user_by_phone(db, phone_number=phone_number)
         if (
             user_with_the_same_phone
             and chat_data.user_id != user_with_the_same_phone.id
         ):
-            user.update_chat(db=db, chat_id_pk=chat_data.id, pending_action=None)
-            return outputs.login_to_acount(
-                chat_id=chat_data.chat_id, phone_number=phone_number
+            return CHAT_FSM.fire(
+                outputs,
+                db,
+                chat_data,
+                ChatEvent.PHONE_NUMBER_TAKEN,
+                phone_number=phone_number,
             )
-        updated_chat = user.update_chat(
-            db=db, chat_id_pk=chat_data.id, pending_action=None
+        # the number first: a failed write must not move the chat on
+        user.update_user(
+            db=db, user_id=chat_data.user_id, phone_number=phone_number, commit=False
         )
-        user.update_user(db=db, user_id=chat_data.user_id, phone_number=phone_number)
-        return chat_second_lvl_authentication(db=db, chat=updated_chat)
+        CHAT_FSM.fire(outputs, db, chat_data, ChatEvent.PHONE_NUMBER_ACCEPTED)
+        return chat_second_lvl_authentication(outputs=outputs, db=db, chat=chat_data)
 
     except Exception as e:
         logger.error(f"phone_number_input failed at chat flow:{e}")
@@ -166,16 +176,19 @@ def phone_number_input(
 def login(outputs: TelegrambotOutputs, db: Session, chat: Chat, phone_number: str):
     try:
 
+        phone_number = normalize_phone(phone_number)
+        if phone_number is None:
+            raise ValueError("login button carries an invalid phone number")
         user_to_login_to = user.get_user_by_phone(db=db, phone_number=phone_number)
         if chat.user.id == user_to_login_to.id:
             return outputs.already_logged_in(
-                chat_id=chat.chat_id, phone_number=phone_number
+                db=db, chat_id=chat.chat_id, phone_number=phone_number
             )
 
         updated_chat = user.update_chat(
             db=db, chat_id_pk=chat.id, user_id=user_to_login_to.id, chat_verified=False
         )
-        return chat_second_lvl_authentication(db=db, chat=updated_chat)
+        return chat_second_lvl_authentication(outputs=outputs, db=db, chat=updated_chat)
     except Exception as e:
         logger.error(f"login at chat_flow failed:{e}")
         raise
@@ -185,8 +198,7 @@ def send_otp(outputs: TelegrambotOutputs, db: Session, chat: Chat):
     try:
 
         #! this is a placeholder for when we actually send the otp
-        user.update_chat(db=db, chat_id_pk=chat.id, pending_action="waiting_for_otp")
-        return outputs.phone_numebr_verification(chat_id=chat.chat_id)
+        return CHAT_FSM.fire(outputs, db, chat, ChatEvent.ASK_OTP)
     except Exception as e:
         logger.error(f"send_otp at chat flow failed:{e}")
         raise
@@ -196,23 +208,13 @@ def otp_verify(outputs: TelegrambotOutputs, db: Session, text: str, chat: Chat):
     try:
 
         if not text == "1111":  #!This is very much a place holder for later
-            attemps = chat.otp_input_attempt
-            if attemps >= 2:
-                user.update_chat(
-                    db=db, chat_id_pk=chat.id, otp_input_attempt=0, pending_action=None
-                )
-                return outputs.max_attempt_reached(chat_id=chat.chat_id)
-            user.update_chat(db=db, chat_id_pk=chat.id, otp_input_attempt=attemps + 1)
-            return outputs.invalid_otp(chat.chat_id)
-        user.update_chat(
-            db=db,
-            chat_id_pk=chat.id,
-            pending_action=None,
-            otp_input_attempt=0,
-            chat_verified=True,
+            # invalid_otp, or max_attempt_reached on the last attempt
+            return CHAT_FSM.fire(outputs, db, chat, ChatEvent.OTP_REJECTED)
+        verified = CHAT_FSM.fire(outputs, db, chat, ChatEvent.OTP_ACCEPTED)
+        user.update_user(
+            db=db, user_id=chat.user_id, phone_number_validated=True, commit=False
         )
-        user.update_user(db=db, user_id=chat.user_id, phone_number_validated=True)
-        return outputs.phone_number_verified(chat.chat_id)
+        return verified
     except Exception as e:
         logger.error(f"otp_verify at chat flow failed: {e}")
         raise
@@ -259,19 +261,23 @@ def get_prices(
             .options(joinedload(Product.versions))
         )
 
-        products = db.execute(stmt).unique().scalars().all()
-        result: Dict[str, Dict[str, Decimal]] = {}
+        def _load() -> Dict[str, Dict[str, Decimal]]:
+            result: Dict[str, Dict[str, Decimal]] = {}
+            with read_replica(db):
+                products = db.execute(stmt).unique().scalars().all()
+
+                for product in products:
+                    product_key = f"{product.name}"
 
-        for product in products:
-            product_key = f"{product.name}"
+                    version_map: Dict[str, Decimal | str] = {}
+                    for version in product.versions:
+                        price = get_version_price(version, db)
+                        version_map[version.version_name] = price
 
-            version_map: Dict[str, Decimal | str] = {}
-            for version in product.versions:
-                price = get_version_price(version, db)
-                version_map[version.version_name] = price
+                    result[product_key] = version_map
+            return result
 
-            result[product_key] = version_map
-        return result
+        return _price_list.get_or_load("bot", _load)
     except Exception as e:
         logger.error(f"chat_flow/get_prices failed:{e}")
         raise
@@ -282,17 +288,18 @@ def payment_gateway(
 ):
     try:
         order_data = order.get_order(db=db, order_id=order_id)
-        order_item = order.items[0]
+        order_item = order_data.items[0]
         product_version_id = order_item.product_version_id
         unit_price = order_item.unit_price
         product_version = get_product_version_by_id(db=db, id=product_version_id)
         product_name = product_version.product.name
         return outputs.payment_gateway(
+            db=db,
             chat_id=chat.chat_id,
             order_id=order_data.id,
             product_name=product_name,
             amount=unit_price,
-            pay_url=f"{settings.base_url}/pay?{urlencode({"order_id":order_id})}",
+            pay_url=f"{settings.base_url}/pay?{urlencode({'order_id': order_id})}",
         )
     except Exception as e:
         logger.error(f"payment_gateway at chat_flow failed:{e}")
@@ -302,17 +309,260 @@ def payment_gateway(
 def cancel_order(
     outputs: TelegrambotOutputs, db: Session, chat: Chat, order_id: Union[int, str]
 ):
-    order.delete_order(db=db, order_id=order_id)
-    return outputs.return_to_menu(chat_id=chat.chat_id)
+    try:
+        # kept as CANCELLED: a payment racing with the cancel either wins
+        # (and the cancel is a no-op) or is refused, never both
+        result = order.transition_order(
+            db=db,
+            order_id=order_id,
+            to_status=OrderStatus.CANCELLED,
+            idempotency_key=f"cancel:{order_id}",
+        )
+        if result is not None:
+            remember_order_status(order_id, result.status)
+        return outputs.return_to_menu(
+            db=db, chat_id=chat.chat_id, products=get_products(db=db)
+        )
+    except Exception as e:
+        logger.error(f"cancel_order at chat flow failed:{e}")
+        raise
 
 
 def confirm_payment(
     outputs: TelegrambotOutputs, db: Session, chat: Chat, order_id: Union[int, str]
 ):
-    order_data = order.get_order(db=db, order_id=order_id)
-    if order_data.status != "paid":
-        return outputs.payment_confirmed(chat_id=chat.chat_id, order_id=order_id)
-    return outputs.payment_not_confirmed(chat_id=chat.chat_id, order_id=order_id)
+    try:
+        # repeated presses are answered from the status cache, which the
+        # payment event has usually updated already
+        status = get_order_status(db=db, order_id=order_id)
+        if status == OrderStatus.PAID:
+            return outputs.payment_confirmed(
+                db=db, chat_id=chat.chat_id, order_id=order_id
+            )
+        return outputs.payment_not_confirmed(
+            db=db, chat_id=chat.chat_id, order_id=order_id
+        )
+    except Exception as e:
+        logger.error(f"confirm_payment at chat flow failed:{e}")
+        raise
+
+
+def _cart_lines(db: Session, cart: Dict[int, int]):
+    """(version, quantity, unit price) per line and the total, priced in one batch."""
+    if not cart:
+        return [], Decimal("0")
+    with read_replica(db):
+        versions = db.execute(
+            select(ProductVersion)
+            .where(ProductVersion.id.in_(list(cart)))
+            .options(joinedload(ProductVersion.product))
+        ).scalars().all()
+        prices = get_version_prices(versions, db)
+    by_id = {v.id: v for v in versions}
+    lines = [
+        (by_id[pv_id], quantity, prices[pv_id])
+        for pv_id, quantity in cart.items()
+        if pv_id in by_id
+    ]
+    total = sum((price * quantity for _, quantity, price in lines), Decimal("0"))
+    return lines, total
+
+
+def _drop_unknown_lines(db: Session, chat: Chat, cart: Dict[int, int]) -> Dict[int, int]:
+    """The cart without the lines whose product version no longer exists."""
+    if not cart:
+        return cart
+    with read_replica(db):
+        known = set(
+            db.scalars(select(ProductVersion.id).where(ProductVersion.id.in_(list(cart))))
+        )
+    unknown = [pv_id for pv_id in cart if pv_id not in known]
+    if not unknown:
+        return cart
+    logger.info(f"cart of chat {chat.chat_id}: dropped unknown versions {unknown}")
+    return carts.discard(chat, unknown)
+
+
+def show_cart(
+    outputs: TelegrambotOutputs,
+    db: Session,
+    chat: Chat,
+    message_id: Optional[Union[str, int]] = None,
+    append: bool = True,
+):
+    try:
+        lines, total = _cart_lines(db, carts.get(chat))
+        return outputs.cart(
+            db=db,
+            chat_id=chat.chat_id,
+            lines=lines,
+            total=total,
+            message_id=message_id,
+            append=append,
+        )
+    except Exception as e:
+        logger.error(f"show_cart at chat flow failed:{e}")
+        raise
+
+
+def add_to_cart(
+    outputs: TelegrambotOutputs,
+    db: Session,
+    chat: Chat,
+    product_version_id: int,
+    message_id: Optional[Union[str, int]] = None,
+    append: bool = True,
+):
+    try:
+        if get_product_version_by_id(db=db, id=product_version_id) is None:
+            # an old button of a version that is gone; the cart stays as it is
+            logger.info(
+                f"add_to_cart for chat {chat.chat_id}: no product version {product_version_id}"
+            )
+        else:
+            try:
+                carts.add(chat, product_version_id)
+            except CartFull as e:
+                logger.info(f"add_to_cart for chat {chat.chat_id}: {e}")
+        return show_cart(
+            outputs=outputs, db=db, chat=chat, message_id=message_id, append=append
+        )
+    except Exception as e:
+        logger.error(f"add_to_cart at chat flow failed:{e}")
+        raise
+
+
+def remove_from_cart(
+    outputs: TelegrambotOutputs,
+    db: Session,
+    chat: Chat,
+    product_version_id: int,
+    message_id: Optional[Union[str, int]] = None,
+    append: bool = True,
+):
+    try:
+        carts.remove(chat, product_version_id)
+        return show_cart(
+            outputs=outputs, db=db, chat=chat, message_id=message_id, append=append
+        )
+    except Exception as e:
+        logger.error(f"remove_from_cart at chat flow failed:{e}")
+        raise
+
+
+def clear_cart(
+    outputs: TelegrambotOutputs,
+    db: Session,
+    chat: Chat,
+    message_id: Optional[Union[str, int]] = None,
+    append: bool = True,
+):
+    try:
+        carts.clear(chat)
+        return show_cart(
+            outputs=outputs, db=db, chat=chat, message_id=message_id, append=append
+        )
+    except Exception as e:
+        logger.error(f"clear_cart at chat flow failed:{e}")
+        raise
+
+
+def checkout_cart(outputs: TelegrambotOutputs, db: Session, chat: Chat):
+    try:
+        auth = chat_second_lvl_authentication(outputs=outputs, db=db, chat=chat)
+        if auth is not True:
+            return auth
+        cart = _drop_unknown_lines(db, chat, carts.get(chat))
+        if not cart:
+            return show_cart(outputs=outputs, db=db, chat=chat)
+        # one order, one price batch, committed by the webhook with the reply
+        order_data, _ = order.get_or_create_pending_order(
+            db=db,
+            user_id=chat.user_id,
+            items=[
+                order.CreateOrderItemIn(product_version_id=pv_id, quantity=quantity)
+                for pv_id, quantity in cart.items()
+            ],
+            commit=False,
+        )
+        # the lines as ordered and priced, a reused order keeps its prices
+        items = db.scalars(
+            select(OrderItem)
+            .where(OrderItem.order_id == order_data.id)
+            .options(joinedload(OrderItem.product_version).joinedload(ProductVersion.product))
+            .order_by(OrderItem.id)
+        ).all()
+        lines = [(item.product_version, item.quantity, item.unit_price) for item in items]
+        # the stored cart goes with the same commit, the in-memory one once it
+        # is done: a failed commit leaves the cart to check out again
+        chat.cart = None
+        event.listen(db, "after_commit", lambda _: carts.clear(chat), once=True)
+        return outputs.cart_checkout(
+            db=db,
+            chat_id=chat.chat_id,
+            lines=lines,
+            total=order_data.total_amount,
+            order_id=order_data.id,
+        )
+    except Exception as e:
+        logger.error(f"checkout_cart at chat flow failed:{e}")
+        raise
+
+
+def my_orders(
+    outputs: TelegrambotOutputs,
+    db: Session,
+    chat: Chat,
+    before_id: Optional[int] = None,
+    message_id: Optional[Union[str, int]] = None,
+    append: bool = True,
+):
+    try:
+        orders, next_before = order.list_user_orders(
+            db=db,
+            user_id=chat.user_id,
+            before_id=before_id,
+            limit=settings.order_history_page_size,
+        )
+        return outputs.my_orders(
+            db=db,
+            chat_id=chat.chat_id,
+            orders=orders,
+            next_before=next_before,
+            paged=before_id is not None,
+            message_id=message_id,
+            append=append,
+        )
+    except Exception as e:
+        logger.error(f"my_orders at chat flow failed:{e}")
+        raise
+
+
+def set_locale(
+    outputs: TelegrambotOutputs,
+    db: Session,
+    chat: Chat,
+    locale: str,
+    message_id: Optional[Union[str, int]] = None,
+    append: bool = True,
+):
+    try:
+        if locale not in settings.locales:
+            raise ValueError(f"unsupported locale: {locale}")
+        # committed with the reply by the webhook
+        chat.locale = locale
+        with use_locale(locale):
+            products = get_products(db=db)
+            return outputs.return_to_menu(
+                db=db,
+                chat_id=chat.chat_id,
+                products=products,
+                message_id=message_id,
+                append=append,
+            )
+    except Exception as e:
+        logger.error(f"set_locale at chat flow failed:{e}")
+        raise
 
 
 def crypto_payment(
@@ -1,14 +1,24 @@
 import re
 
-from typing import Union, Dict, List
+from dataclasses import dataclass
+from typing import Union, Dict, List, Tuple
 from src.models import Product, ProductVersion, ChatOutput
+from src.models.order import OrderStatus
+from src.crud.order import OrderSummary
 from textwrap import dedent
 from typing import Optional
 from decimal import Decimal
 from typing import Any
 from sqlalchemy.orm import Session
-from src.crud.chat_outpus import get_chat_output_by_name, update_chat_output_by_name
-from src.config import logger
+from src.bot.callbacks import encode_callback, encode_legacy
+from src.bot.i18n import LOCALE_FALLBACKS, LOCALE_NAMES, current_locale
+from src.crud.chat_outpus import get_chat_output_variants, update_chat_output_by_name
+from src.models.chat_outputs import BASE_LOCALE
+from src.db.routing import read_replica
+from src.core.cache import get_cache
+from src.core.metrics import RENDER_SECONDS, TEMPLATE_CACHE
+from src.core.tracing import traced
+from src.config import logger, settings
 
 
 def _t(s: str) -> str:
@@ -58,8 +68,9 @@ def _map_buttons_in_order(
             if map_url and btn.name in map_url:
                 item["url"] = map_url[btn.name]
             else:
-                item["callback_data"] = _fill_placeholders(
-                    btn.callback_data, **placeholders
+                # "route:{arg}" in the template, sent in the compact form
+                item["callback_data"] = encode_legacy(
+                    _fill_placeholders(btn.callback_data, **placeholders)
                 )
 
             rendered.append(item)
@@ -70,6 +81,7 @@ def _map_buttons_in_order(
         raise
 
 
+@traced()
 def _render_chat_outputs(
     template: ChatOutput,
     chat_id: Union[str, int],
@@ -129,25 +141,98 @@ def _assert_placeholders_allowed(template: ChatOutput, text: str):
 
 
 EMOJI_PAIRINGS = {"Premium Stars Pack": "🌟", "Telegram Premium Upgrade": "💎"}
+ORDER_STATUS_LABELS = {
+    OrderStatus.PAID: "✅ paid",
+    OrderStatus.WAITING_FOR_PAYMENT: "⏳ waiting for payment",
+    OrderStatus.EXPIRED: "⌛ expired",
+    OrderStatus.CANCELLED: "❌ cancelled",
+}
+
+
+# --- Template snapshots ---
+# plain copies of a ChatOutput with the attributes rendering reads; they
+# pickle (so workers can share them through the L2 cache) and never lazy load
+
+
+@dataclass(frozen=True)
+class ButtonSnapshot:
+    name: str
+    text: str
+    callback_data: str
+
+
+@dataclass(frozen=True)
+class ButtonIndexSnapshot:
+    number: int
+    button: ButtonSnapshot
+
+
+@dataclass(frozen=True)
+class PlaceholderSnapshot:
+    name: str
+
+
+@dataclass(frozen=True)
+class TemplateSnapshot:
+    name: str
+    text: str
+    placeholders: Tuple[PlaceholderSnapshot, ...]
+    button_indexes: Tuple[ButtonIndexSnapshot, ...]
+
+    @classmethod
+    def from_model(cls, template: ChatOutput) -> "TemplateSnapshot":
+        return cls(
+            name=template.name,
+            text=template.text,
+            placeholders=tuple(
+                PlaceholderSnapshot(name=p.name) for p in template.placeholders or []
+            ),
+            button_indexes=tuple(
+                ButtonIndexSnapshot(
+                    number=bi.number,
+                    button=ButtonSnapshot(
+                        name=bi.button.name,
+                        text=bi.button.text,
+                        callback_data=bi.button.callback_data,
+                    ),
+                )
+                for bi in sorted(template.button_indexes, key=lambda bi: bi.number)
+            ),
+        )
 
 
 class TelegrambotOutputs:
     def __init__(self):
         try:
-            # outputs chche data
-            self._chat_output_cache: Dict[str, ChatOutput] = {}
+            # outputs chche data, shared with the other workers (see src/core/cache);
+            # one per locale, holding whichever variant its fallback chain picked
+            self._chat_output_caches = {
+                locale: get_cache(f"chat_outputs_{locale}", schema="1")
+                for locale in LOCALE_FALLBACKS
+            }
         except Exception as e:
             logger.error(
                 f"[TelegrambotOutputs.__init__] at bot/chat_output failed: {e}"
             )
             raise
 
-    def _get_template(self, db: Session, name: str) -> ChatOutput:
+    def _get_template(self, db: Session, name: str) -> TemplateSnapshot:
         try:
-            template = self._chat_output_cache.get(name)
+            locale = current_locale()
+            cache = self._chat_output_caches[locale]
+            template = cache.get(name)
+            TEMPLATE_CACHE.inc("miss" if template is None else "hit")
             if template is None:
-                template = get_chat_output_by_name(db=db, name=name)
-                self._chat_output_cache[name] = template
+                with read_replica(db):
+                    variants = get_chat_output_variants(db=db, name=name)
+                    chosen = next(
+                        (variants[l] for l in LOCALE_FALLBACKS[locale] if l in variants),
+                        None,
+                    )
+                    if chosen is None:
+                        raise ValueError(f"no chat output named {name}")
+                    template = TemplateSnapshot.from_model(chosen)
+                cache.set(name, template)
             return template
         except Exception as e:
             logger.error(f"[_get_template] at bot/chat_output failed: {e}")
@@ -165,14 +250,15 @@ class TelegrambotOutputs:
     ):
         try:
             template = self._get_template(db, name=name)
-            return _render_chat_outputs(
-                template=template,
-                chat_id=chat_id,
-                method=method,
-                message_id=message_id,
-                map_url=map_url,
-                **placeholders,
-            )
+            with RENDER_SECONDS.time(name):
+                return _render_chat_outputs(
+                    template=template,
+                    chat_id=chat_id,
+                    method=method,
+                    message_id=message_id,
+                    map_url=map_url,
+                    **placeholders,
+                )
         except Exception as e:
             logger.error(f"[_render] at bot/chat_output failed: {e}")
             raise
@@ -198,21 +284,22 @@ class TelegrambotOutputs:
 
             template = self._get_template(db=db, name=name)
 
-            # Render text + other params using normal flow
-            payload = _render_chat_outputs(
-                template=template,
-                chat_id=chat_id,
-                row_size=row_size,
-                method=method,
-                message_id=message_id,
-                map_url=map_url,
-                **placeholders,
-            )
+            with RENDER_SECONDS.time(name):
+                # Render text + other params using normal flow
+                payload = _render_chat_outputs(
+                    template=template,
+                    chat_id=chat_id,
+                    row_size=row_size,
+                    method=method,
+                    message_id=message_id,
+                    map_url=map_url,
+                    **placeholders,
+                )
 
-            # Render template keyboard (from DB) with placeholders
-            template_keyboard = _map_buttons_in_order(
-                chat_output=template, row_size=row_size, **placeholders
-            )
+                # Render template keyboard (from DB) with placeholders
+                template_keyboard = _map_buttons_in_order(
+                    chat_output=template, row_size=row_size, **placeholders
+                )
 
             # Merge: dynamic first, template buttons appended
             final_keyboard = (dynamic_keyboard or []) + (template_keyboard or [])
@@ -246,12 +333,15 @@ class TelegrambotOutputs:
             logger.error(f"[_custom] at bot/chat_output failed: {e}")
             raise
 
-    def update_template(self, db: Session, name: str, **fields):
+    def update_template(
+        self, db: Session, name: str, locale: str = BASE_LOCALE, **fields
+    ):
         try:
-            updated_template = update_chat_output_by_name(
-                db=db, name=name, fields=fields
-            )
-            self._chat_output_cache[name] = updated_template
+            update_chat_output_by_name(db=db, name=name, locale=locale, fields=fields)
+            # every worker drops its copies, the next render reloads them; any
+            # locale may have fallen back to the one edited
+            for cache in self._chat_output_caches.values():
+                cache.invalidate(name)
         except Exception as e:
             logger.error(f"[update_template] at bot/chat_output failed: {e}")
             raise
@@ -450,13 +540,17 @@ class TelegrambotOutputs:
                 lines.append("")
             prices_block = _t("\n".join(lines))
 
-            # dynamic keyboard: one per version
+            # dynamic keyboard: buy now / add to the cart, one row per version
             dynamic_rows = [
                 [
                     {
                         "text": f"🛒 {v.version_name}",
-                        "callback_data": f"buy_product_version:{v.id}",
-                    }
+                        "callback_data": encode_callback("buy_product_version", v.id),
+                    },
+                    {
+                        "text": "➕ cart",
+                        "callback_data": encode_callback("cart_add", v.id),
+                    },
                 ]
                 for v in (product.versions or [])
             ]
@@ -514,6 +608,90 @@ class TelegrambotOutputs:
             logger.error(f"[buy_product_version] at bot/chat_output failed: {e}")
             raise
 
+    @staticmethod
+    def _cart_block(lines: List[Tuple[ProductVersion, int, Decimal]]) -> str:
+        if not lines:
+            return "• *(Your cart is empty.)*"
+        rows: list[str] = []
+        for version, quantity, price in lines:
+            emoji = EMOJI_PAIRINGS.get(version.product.name, "📦")
+            rows.append(f"{emoji} {version.product.name} — **{version.version_name}**")
+            rows.append(f"    {quantity} × {price}")
+        return _t("\n".join(rows))
+
+    def cart(
+        self,
+        db: Session,
+        chat_id: Union[str, int],
+        lines: List[Tuple[ProductVersion, int, Decimal]],
+        total: Decimal,
+        message_id: str | int | None = None,
+        append: bool = True,
+    ) -> dict:
+        try:
+            # dynamic keyboard: ➖ / ➕ per line
+            dynamic_rows = [
+                [
+                    {
+                        "text": f"➖ {version.version_name}",
+                        "callback_data": encode_callback("cart_remove", version.id),
+                    },
+                    {
+                        "text": f"➕ {version.version_name}",
+                        "callback_data": encode_callback("cart_add", version.id),
+                    },
+                ]
+                for version, _, _ in lines
+            ]
+
+            if append:
+                return self._render_with_keyboard_append_template(
+                    db=db,
+                    name="cart",
+                    chat_id=chat_id,
+                    dynamic_keyboard=dynamic_rows,
+                    cart_block=self._cart_block(lines),
+                    total=total,
+                )
+
+            if message_id is None:
+                raise ValueError("message_id can't be None when append is False")
+
+            return self._render_with_keyboard_append_template(
+                db=db,
+                name="cart",
+                chat_id=chat_id,
+                dynamic_keyboard=dynamic_rows,
+                method="editMessageText",
+                message_id=message_id,
+                cart_block=self._cart_block(lines),
+                total=total,
+            )
+        except Exception as e:
+            logger.error(f"[cart] at bot/chat_output failed: {e}")
+            raise
+
+    def cart_checkout(
+        self,
+        db: Session,
+        chat_id: Union[str, int],
+        lines: List[Tuple[ProductVersion, int, Decimal]],
+        total: Decimal,
+        order_id: int,
+    ):
+        try:
+            return self._render(
+                db=db,
+                name="cart_checkout",
+                chat_id=chat_id,
+                cart_block=self._cart_block(lines),
+                total=total,
+                order_id=order_id,
+            )
+        except Exception as e:
+            logger.error(f"[cart_checkout] at bot/chat_output failed: {e}")
+            raise
+
     def payment_gateway(
         self,
         db: Session,
@@ -651,7 +829,12 @@ class TelegrambotOutputs:
 
             # dynamic keyboard: one button per product
             dynamic_rows = [
-                [{"text": f"🛒 Buy {p.name}", "callback_data": f"buy_product:{p.id}"}]
+                [
+                    {
+                        "text": f"🛒 Buy {p.name}",
+                        "callback_data": encode_callback("buy_product", p.id),
+                    }
+                ]
                 for p in (products or [])
             ]
 
@@ -680,6 +863,115 @@ class TelegrambotOutputs:
             logger.error(f"[return_to_menu] at bot/chat_output failed: {e}")
             raise
 
+    def my_orders(
+        self,
+        db: Session,
+        chat_id: Union[str, int],
+        orders: List[OrderSummary],
+        next_before: int | None = None,
+        paged: bool = False,
+        message_id: str | int | None = None,
+        append: bool = True,
+    ) -> dict:
+        try:
+            if orders:
+                lines: list[str] = []
+                for o in orders:
+                    total = (
+                        f"{o.total_amount.quantize(Decimal('1')):,} T"
+                        if o.total_amount is not None
+                        else "-"
+                    )
+                    lines.append(f"🆔 `{o.id}` — {ORDER_STATUS_LABELS[o.status]}")
+                    lines.append(f"    📦 {o.items or '-'}")
+                    lines.append(f"    💰 {total} · {o.created_at:%Y-%m-%d}")
+                    lines.append("")
+                orders_block = _t("\n".join(lines))
+            else:
+                orders_block = "• *(You have no orders yet.)*"
+
+            # dynamic keyboard: paging, the cursor is the last order id shown
+            paging = []
+            if paged:
+                paging.append(
+                    {"text": "⏮ newest", "callback_data": encode_callback("my_orders")}
+                )
+            if next_before is not None:
+                paging.append(
+                    {
+                        "text": "older ➡️",
+                        "callback_data": encode_callback("my_orders", next_before),
+                    }
+                )
+            dynamic_rows = [paging] if paging else []
+
+            if append:
+                return self._render_with_keyboard_append_template(
+                    db=db,
+                    name="my_orders",
+                    chat_id=chat_id,
+                    dynamic_keyboard=dynamic_rows,
+                    orders_block=orders_block,
+                )
+
+            if message_id is None:
+                raise ValueError("message_id can't be None when append is False")
+
+            return self._render_with_keyboard_append_template(
+                db=db,
+                name="my_orders",
+                chat_id=chat_id,
+                dynamic_keyboard=dynamic_rows,
+                method="editMessageText",
+                message_id=message_id,
+                orders_block=orders_block,
+            )
+        except Exception as e:
+            logger.error(f"[my_orders] at bot/chat_output failed: {e}")
+            raise
+
+    def choose_language(
+        self,
+        db: Session,
+        chat_id: Union[str, int],
+        message_id: str | int | None = None,
+        append: bool = True,
+    ) -> dict:
+        try:
+            # dynamic keyboard: one button per offered locale
+            dynamic_rows = [
+                [
+                    {
+                        "text": LOCALE_NAMES.get(locale, locale),
+                        "callback_data": encode_callback("set_locale", locale),
+                    }
+                ]
+                for locale in settings.locales
+            ]
+
+            if append:
+                return self._render_with_keyboard_append_template(
+                    db=db,
+                    name="choose_language",
+                    chat_id=chat_id,
+                    dynamic_keyboard=dynamic_rows,
+                )
+
+            if message_id is None:
+                raise ValueError("message_id can't be None when append is False")
+
+            return self._render_with_keyboard_append_template(
+                db=db,
+                name="choose_language",
+                chat_id=chat_id,
+                dynamic_keyboard=dynamic_rows,
+                method="editMessageText",
+                message_id=message_id,
+            )
+        except Exception as e:
+            logger.error(f"[choose_language] at bot/chat_output failed: {e}")
+            raise
+
     def support(
         self,
         db: Session,
@@ -0,0 +1,227 @@
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.bot import InvalidTransition, StaleChatState
+from src.bot.chat_output import TelegrambotOutputs
+from src.config import logger
+from src.crud.user import transition_chat_state
+from src.models import Chat
+from src.models.user import ChatState
+
+# --- Packed counters ---
+
+# name -> bit offset in Chat.fsm_counters, 4 bits (0..15) each
+COUNTERS: Dict[str, int] = {"phone_attempts": 0, "otp_attempts": 4}
+_COUNTER_MASK = 0xF
+MAX_INPUT_ATTEMPTS = 3
+
+
+def counter(packed: int, name: str) -> int:
+    return (packed >> COUNTERS[name]) & _COUNTER_MASK
+
+
+def with_counter(packed: int, name: str, value: int) -> int:
+    shift = COUNTERS[name]
+    value = max(0, min(value, _COUNTER_MASK))
+    return (packed & ~(_COUNTER_MASK << shift)) | (value << shift)
+
+
+# --- Table ---
+
+
+class ChatEvent(str, Enum):
+    ACCEPT_TERMS = "accept_terms"
+    ASK_PHONE_NUMBER = "ask_phone_number"
+    PHONE_NUMBER_ACCEPTED = "phone_number_accepted"
+    PHONE_NUMBER_REJECTED = "phone_number_rejected"
+    PHONE_NUMBER_TAKEN = "phone_number_taken"
+    ASK_OTP = "ask_otp"
+    OTP_ACCEPTED = "otp_accepted"
+    OTP_REJECTED = "otp_rejected"
+
+
+INC, RESET = "inc", "reset"
+Guard = Callable[[Chat], bool]
+
+
+@dataclass(frozen=True)
+class Transition:
+    source: ChatState
+    event: ChatEvent
+    target: ChatState
+    # tried in table order, the first one whose guard passes is taken
+    guard: Optional[Guard] = None
+    counters: Mapping[str, str] = field(default_factory=dict)  # name -> INC / RESET
+    # other chat columns written by the same UPDATE
+    sets: Mapping[str, Any] = field(default_factory=dict)
+    # TelegrambotOutputs method rendered after the move, None: the caller replies
+    output: Optional[str] = None
+
+    def apply(self, packed: int) -> int:
+        for name, op in self.counters.items():
+            value = counter(packed, name) + 1 if op == INC else 0
+            packed = with_counter(packed, name, value)
+        return packed
+
+
+def attempts_used_up(name: str) -> Guard:
+    """The attempt about to fail is the last one allowed."""
+    return lambda chat: counter(chat.fsm_counters, name) >= MAX_INPUT_ATTEMPTS - 1
+
+
+S, E = ChatState, ChatEvent
+
+CHAT_TRANSITIONS: Tuple[Transition, ...] = (
+    Transition(S.NEW, E.ACCEPT_TERMS, S.MENU),
+    # --- phone number ---
+    Transition(
+        S.MENU,
+        E.ASK_PHONE_NUMBER,
+        S.WAITING_FOR_PHONE_NUMBER,
+        counters={"phone_attempts": RESET},
+        sets={"chat_verified": False},
+        output="phone_number_input",
+    ),
+    Transition(
+        S.WAITING_FOR_PHONE_NUMBER,
+        E.PHONE_NUMBER_REJECTED,
+        S.MENU,
+        guard=attempts_used_up("phone_attempts"),
+        counters={"phone_attempts": RESET},
+        output="max_attempt_reached",
+    ),
+    Transition(
+        S.WAITING_FOR_PHONE_NUMBER,
+        E.PHONE_NUMBER_REJECTED,
+        S.WAITING_FOR_PHONE_NUMBER,
+        counters={"phone_attempts": INC},
+        output="invalid_phone_number",
+    ),
+    Transition(
+        S.WAITING_FOR_PHONE_NUMBER,
+        E.PHONE_NUMBER_TAKEN,
+        S.MENU,
+        counters={"phone_attempts": RESET},
+        output="login_to_acount",
+    ),
+    Transition(
+        S.WAITING_FOR_PHONE_NUMBER,
+        E.PHONE_NUMBER_ACCEPTED,
+        S.MENU,
+        counters={"phone_attempts": RESET},
+    ),
+    # --- one time password ---
+    Transition(
+        S.MENU,
+        E.ASK_OTP,
+        S.WAITING_FOR_OTP,
+        counters={"otp_attempts": RESET},
+        output="phone_numebr_verification",
+    ),
+    Transition(
+        S.WAITING_FOR_OTP,
+        E.OTP_REJECTED,
+        S.MENU,
+        guard=attempts_used_up("otp_attempts"),
+        counters={"otp_attempts": RESET},
+        output="max_attempt_reached",
+    ),
+    Transition(
+        S.WAITING_FOR_OTP,
+        E.OTP_REJECTED,
+        S.WAITING_FOR_OTP,
+        counters={"otp_attempts": INC},
+        output="invalid_otp",
+    ),
+    Transition(
+        S.WAITING_FOR_OTP,
+        E.OTP_ACCEPTED,
+        S.MENU,
+        counters={"otp_attempts": RESET},
+        sets={"chat_verified": True},
+        output="phone_number_verified",
+    ),
+)
+
+# states that take the next text message as input, callbacks are ignored there
+INPUT_STATES = frozenset({S.WAITING_FOR_PHONE_NUMBER, S.WAITING_FOR_OTP})
+
+
+# --- Engine ---
+
+
+class StateMachine:
+    """
+    The transition table compiled to {(state, event): candidates}: finding
+    the move is one dict lookup plus at most a guard or two. Checked once at
+    compile time: outputs exist and no candidate follows an unguarded one.
+    """
+
+    def __init__(self, transitions: Iterable[Transition]) -> None:
+        table: Dict[Tuple[ChatState, ChatEvent], list] = {}
+        for t in transitions:
+            if t.output is not None and not callable(
+                getattr(TelegrambotOutputs, t.output, None)
+            ):
+                raise ValueError(f"{t.source.name} --{t.event.value}-> unknown output {t.output}")
+            for name in t.counters:
+                if name not in COUNTERS:
+                    raise ValueError(f"unknown counter {name}")
+            candidates = table.setdefault((t.source, t.event), [])
+            if candidates and candidates[-1].guard is None:
+                raise ValueError(
+                    f"{t.source.name} --{t.event.value}-> {t.target.name} is unreachable"
+                )
+            candidates.append(t)
+        self._table = {key: tuple(value) for key, value in table.items()}
+
+    def resolve(self, chat: Chat, event: ChatEvent) -> Transition:
+        state = ChatState(chat.fsm_state)
+        for t in self._table.get((state, event), ()):
+            if t.guard is None or t.guard(chat):
+                return t
+        raise InvalidTransition(f"no transition for {event.value} in {state.name}")
+
+    def fire(
+        self,
+        outputs: TelegrambotOutputs,
+        db: Session,
+        chat: Chat,
+        event: ChatEvent,
+        **params: Any,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Take the transition, persist it with one conditional UPDATE and
+        render its output (`params` go to the output). Not committed: the
+        webhook commits it together with the rest of the update.
+        """
+        try:
+            t = self.resolve(chat, event)
+            moved = transition_chat_state(
+                db,
+                chat,
+                state=int(t.target),
+                counters=t.apply(chat.fsm_counters),
+                commit=False,
+                **t.sets,
+            )
+            if not moved:
+                raise StaleChatState(
+                    f"chat {chat.id} changed while handling {event.value}"
+                )
+            if t.output is None:
+                return None
+            return getattr(outputs, t.output)(db=db, chat_id=chat.chat_id, **params)
+        except Exception as e:
+            logger.error(f"fsm {event.value} for chat {chat.chat_id} failed:{e}")
+            raise
+
+    @staticmethod
+    def awaits_input(chat: Chat) -> bool:
+        return chat.fsm_state in INPUT_STATES
+
+
+CHAT_FSM = StateMachine(CHAT_TRANSITIONS)
@@ -0,0 +1,60 @@
+import contextvars
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterator, Optional, Tuple
+
+from src.config import settings
+from src.models.chat_outputs import BASE_LOCALE
+
+# shown on the language buttons
+LOCALE_NAMES: Dict[str, str] = {"fa": "🇮🇷 فارسی", "en": "🇬🇧 English"}
+
+
+def _chain(locale: str) -> Tuple[str, ...]:
+    return tuple(dict.fromkeys((locale, settings.default_locale, BASE_LOCALE)))
+
+
+# locale -> the locales whose variant it renders, best first; worked out once
+# here so a template lookup never has to
+LOCALE_FALLBACKS: Dict[str, Tuple[str, ...]] = {
+    locale: _chain(locale)
+    for locale in dict.fromkeys((*settings.locales, settings.default_locale))
+}
+
+_current_locale: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "current_locale", default=None
+)
+
+
+@lru_cache(maxsize=256)
+def _match(code: str) -> Optional[str]:
+    # "fa", "fa-IR", "pt_BR" -> a supported locale, by full tag then language
+    code = code.replace("_", "-").lower()
+    if code in LOCALE_FALLBACKS:
+        return code
+    language = code.split("-", 1)[0]
+    return language if language in LOCALE_FALLBACKS else None
+
+
+def resolve_locale(preferred: Optional[str], language_code: Optional[str]) -> str:
+    """The chat's own pick, else Telegram's language_code, else DEFAULT_LOCALE."""
+    for code in (preferred, language_code):
+        if code:
+            locale = _match(code)
+            if locale is not None:
+                return locale
+    return settings.default_locale
+
+
+def current_locale() -> str:
+    return _current_locale.get() or settings.default_locale
+
+
+@contextmanager
+def use_locale(locale: str) -> Iterator[str]:
+    """Outputs rendered in this block use `locale`'s templates."""
+    token = _current_locale.set(locale)
+    try:
+        yield locale
+    finally:
+        _current_locale.reset(token)
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any, Dict, List
+
+from fastapi import FastAPI
+from sqlalchemy import select
+
+from src.bot.i18n import resolve_locale, use_locale
+from src.bot.outbox import enqueue_reply
+from src.config import logger
+from src.core.events import EventBus, PaymentConfirmed
+from src.db import SessionLocal
+from src.models import Chat
+from src.models.order import OrderStatus
+from src.services.order_status import remember_order_status
+
+
+def _payment_confirmed_replies(
+    app: FastAPI, event: PaymentConfirmed, use_outbox: bool
+) -> List[Dict[str, Any]]:
+    """Render the message for every chat of the buyer; queued right here with the outbox."""
+    db = SessionLocal()
+    try:
+        chats = db.execute(
+            select(Chat.chat_id, Chat.locale).where(Chat.user_id == event.user_id)
+        ).all()
+        replies = []
+        for chat_id, locale in chats:
+            # no update to take a language_code from, the chat's pick or the default
+            with use_locale(resolve_locale(locale, None)):
+                replies.append(
+                    app.state.outputs.payment_confirmed(
+                        db=db, chat_id=chat_id, order_id=event.order_id
+                    )
+                )
+        if use_outbox:
+            for reply in replies:
+                enqueue_reply(db, reply)
+            db.commit()
+        return replies
+    finally:
+        db.close()
+
+
+def register_payment_handlers(app: FastAPI, bus: EventBus) -> None:
+    async def remember_paid(event: PaymentConfirmed) -> None:
+        remember_order_status(event.order_id, OrderStatus.PAID)
+
+    async def notify_buyer(event: PaymentConfirmed) -> None:
+        outbox = getattr(app.state, "outbox", None)
+        replies = await asyncio.to_thread(
+            _payment_confirmed_replies, app, event, outbox is not None
+        )
+        if outbox is not None:
+            outbox.wake()
+        else:
+            for reply in replies:
+                resp = await app.state.telegram.post("sendMessage", json=reply)
+                resp.raise_for_status()
+        logger.info("order %s: payment confirmation pushed", event.order_id)
+
+    bus.subscribe(PaymentConfirmed, remember_paid)
+    bus.subscribe(PaymentConfirmed, notify_buyer)
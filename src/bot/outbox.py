@@ -0,0 +1,225 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy.orm import Session
+
+from src.clients.telegram import TelegramClient
+from src.config import logger, settings
+from src.crud import outbox
+from src.db import SessionLocal
+
+# dispatch_response payload shape -> Bot API method
+_REPLY_METHODS = {
+    None: "sendMessage",
+    "answerCallback": "answerCallbackQuery",
+    "editMessageText": "editMessageText",
+}
+
+
+def reply_call(payload: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    (method, params) of a handler reply, None for replies that need work at
+    send time (custom) and so can't be stored.
+    """
+    method = payload.get("method")
+    if method not in _REPLY_METHODS:
+        return None
+    params = payload if method is None else payload.get("params") or {}
+    return _REPLY_METHODS[method], params
+
+
+def enqueue_reply(db: Session, payload: Dict[str, Any]) -> bool:
+    """Add the reply to the caller's transaction; False if it must be sent directly."""
+    call = reply_call(payload)
+    if call is None:
+        return False
+    method, params = call
+    outbox.enqueue_message(
+        db, method=method, payload=params, chat_id=params.get("chat_id")
+    )
+    return True
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    async def take(self) -> None:
+        while True:
+            now = time.monotonic()
+            refill = (now - self.updated) * self.rate
+            self.tokens = min(self.capacity, self.tokens + refill)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class OutboxDispatcher:
+    """
+    Drains the outbox in batches: claims due rows, sends them through the
+    shared Telegram client under a global rate limit and records the outcome.
+    A chat's messages go out in order: only its oldest unsent one is claimed,
+    the next once that one is sent. Sent rows are deleted after
+    OUTBOX_SENT_RETENTION seconds.
+    """
+
+    def __init__(self, client: TelegramClient) -> None:
+        self.client = client
+        self.bucket = _TokenBucket(
+            settings.outbox_rate_per_second, settings.outbox_burst
+        )
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._next_prune = time.monotonic() + settings.outbox_prune_interval
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="outbox-dispatcher")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def wake(self) -> None:
+        """Called after a commit that added messages, skips the poll wait."""
+        self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                sent = await self.flush()
+            except Exception as e:
+                logger.error(f"outbox flush failed:{e}")
+                sent = 0
+            if time.monotonic() >= self._next_prune:
+                self._next_prune = time.monotonic() + settings.outbox_prune_interval
+                try:
+                    await asyncio.to_thread(self.prune)
+                except Exception as e:
+                    logger.error(f"outbox prune failed:{e}")
+            if sent:
+                continue  # more are waiting, or a chat's next message is due now
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.outbox_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def flush(self) -> int:
+        batch = await asyncio.to_thread(
+            self._db_call,
+            outbox.claim_messages,
+            limit=settings.outbox_batch_size,
+            lease_seconds=settings.outbox_lease_seconds,
+        )
+        if not batch:
+            return 0
+        by_chat: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+        for message in batch:
+            by_chat[message["chat_id"] or f"id:{message['id']}"].append(message)
+        results = await asyncio.gather(
+            *(self._send_chat(messages) for messages in by_chat.values())
+        )
+        sent_ids = [i for ids in results for i in ids]
+        await asyncio.to_thread(self._db_call, outbox.mark_sent, sent_ids)
+        return len(batch)
+
+    def prune(self) -> int:
+        """Delete the sent rows past the retention, in batches; returns how many."""
+        cutoff = datetime.now(timezone.utc) - timedelta(
+            seconds=settings.outbox_sent_retention
+        )
+        pruned = 0
+        while True:
+            deleted = self._db_call(
+                outbox.prune_sent,
+                sent_before=cutoff,
+                limit=settings.outbox_prune_batch_size,
+            )
+            pruned += deleted
+            if deleted < settings.outbox_prune_batch_size:
+                return pruned
+
+    async def _send_chat(self, messages: List[Dict[str, Any]]) -> List[int]:
+        sent: List[int] = []
+        for n, message in enumerate(messages):
+            await self.bucket.take()
+            delay, error, throttled = await self._send(message)
+            if error is None:
+                sent.append(message["id"])
+                continue
+            if delay is None or (
+                not throttled and message["attempts"] >= settings.outbox_max_attempts
+            ):
+                logger.error("outbox message %s dropped: %s", message["id"], error)
+                await asyncio.to_thread(
+                    self._db_call, outbox.mark_failed, message["id"], error=error
+                )
+                continue
+            # keep the chat's order: everything after it waits as long
+            for later in messages[n:]:
+                await asyncio.to_thread(
+                    self._db_call,
+                    outbox.reschedule_message,
+                    later["id"],
+                    delay=delay,
+                    error=error,
+                    # only the failed one used up an attempt, and not when throttled
+                    refund_attempt=throttled or later is not message,
+                )
+            break
+        return sent
+
+    async def _send(
+        self, message: Dict[str, Any]
+    ) -> Tuple[Optional[float], Optional[str], bool]:
+        """
+        (retry delay, error, throttled): no error when sent, no delay when
+        sending it again won't help.
+        """
+        try:
+            resp = await self.client.post(message["method"], json=message["payload"])
+        except httpx.HTTPError as e:
+            return self._backoff(message), f"{type(e).__name__}: {e}", False
+        if resp.is_success:
+            return None, None, False
+        body = _json(resp)
+        description = body.get("description") or resp.text[:200]
+        if resp.status_code == 429:
+            retry_after = (body.get("parameters") or {}).get("retry_after", 1)
+            return float(retry_after), f"429 {description}", True
+        if resp.status_code >= 500:
+            return self._backoff(message), f"{resp.status_code} {description}", False
+        if "message is not modified" in description:
+            return None, None, False
+        # 400 / 403 (bot blocked) / 404
+        return None, f"{resp.status_code} {description}", False
+
+    @staticmethod
+    def _backoff(message: Dict[str, Any]) -> float:
+        return float(min(2 ** message["attempts"], settings.outbox_max_backoff))
+
+    @staticmethod
+    def _db_call(func, *args, **kwargs):
+        db = SessionLocal()
+        try:
+            return func(db, *args, **kwargs)
+        finally:
+            db.close()
+
+
+def _json(resp: httpx.Response) -> Dict[str, Any]:
+    try:
+        body = resp.json()
+        return body if isinstance(body, dict) else {}
+    except ValueError:
+        return {}
@@ -1,16 +1,21 @@
-from typing import Dict, Any
+from dataclasses import dataclass
+from typing import Any, Callable, Dict
 from sqlalchemy.orm import Session
 from src.config import logger
+from src.core.tracing import traced
 from src.bot.chat_output import TelegrambotOutputs
 from src.bot import TgChat, NotPrivateChat, UnsuportedTextInput
 from src.crud.products import get_products
 from src.bot import chat_flow
-from src.crud.user import (
-    get_chat_by_chat_id,
-    update_chat_by_chat_id,
-)
+from src.bot.callbacks import ROUTES, Callback, ExpiredCallback, decode_callback
+from src.bot.fsm import CHAT_FSM, ChatEvent
+from src.bot.i18n import resolve_locale, use_locale
+from src.models import Chat
+from src.models.user import ChatState
+from src.crud.user import get_chat_by_chat_id
 
 
+@traced()
 def serialize_message(
     payload: Dict[str, Any], outputs: TelegrambotOutputs, db: Session
 ) -> Dict[str, Any]:
@@ -24,13 +29,20 @@ def serialize_message(
             raise NotPrivateChat("chat.id and from.id must match for private messages.")
         chat = TgChat(**chat_data)
         data = payload.get("text")
-        return process_text(chat=chat, text=data, db=db, outputs=outputs)
+        return process_text(
+            chat=chat,
+            text=data,
+            db=db,
+            outputs=outputs,
+            language_code=from_data.get("language_code"),
+        )
 
     except Exception as e:
         logger.error(f"serialize_message failed:{e}")
         raise
 
 
+@traced()
 def serialize_callback_query(
     payload: Dict[str, Any], outputs: TelegrambotOutputs, db: Session
 ) -> Dict[str, Any]:
@@ -48,179 +60,353 @@ def serialize_callback_query(
             message_id=message_id,
             db=db,
             outputs=outputs,
+            language_code=from_data.get("language_code"),
         )
     except Exception as e:
         logger.error(f"serialize_callback_query failed:{e}")
         raise
 
 
-def process_callback_query(
-    query_id: str,
-    chat_id: str,
-    query_data: str,
-    message_id: str,
-    db: Session,
-    outputs: TelegrambotOutputs,
-):
-    try:
-        chat = get_chat_by_chat_id(db, chat_id)
-        last_message = chat_flow.is_last_message(
-            message_id=message_id, db=db, chat=chat
+@dataclass
+class CallbackContext:
+    query_id: str
+    chat_id: str
+    message_id: str
+    chat: Chat
+    last_message: bool
+    callback: Callback
+    db: Session
+    outputs: TelegrambotOutputs
+
+
+# --- Callback handlers (one per route, see CALLBACK_HANDLERS) ---
+
+
+def _show_terms_for_acceptance(c: CallbackContext):
+    return c.outputs.show_terms_condititons(
+        db=c.db, chat_id=c.chat_id, message_id=c.message_id
+    )
+
+
+def _read_the_terms(c: CallbackContext):
+    return c.outputs.terms_and_conditions(
+        db=c.db, chat_id=c.chat_id, message_id=c.message_id
+    )
+
+
+def _accepted_terms(c: CallbackContext):
+    if not c.chat.accepted_terms:
+        CHAT_FSM.fire(c.outputs, c.db, c.chat, ChatEvent.ACCEPT_TERMS)
+        products = get_products(db=c.db)
+        return c.outputs.return_to_menu(
+            db=c.db, chat_id=c.chat_id, products=products, append=True
         )
+    return c.outputs.empty_answer_callback(c.query_id)
 
-        if chat.pending_action is not None:
-            return outputs.empty_answer_callback(query_id)
 
-        if query_data == "show_terms_for_acceptance":
-            return outputs.show_terms_condititons(chat_id, message_id)
+def _show_prices(c: CallbackContext):
+    return c.outputs.loading_prices(db=c.db, chat_id=c.chat_id)
 
-        if query_data == "read_the_terms":
-            return outputs.terms_and_conditions(chat_id, message_id)
 
-        if query_data == "accepted_terms":
-            if not chat.accepted_terms:
-                update_chat_by_chat_id(db, chat_id, accepted_terms=True)
-                products = get_products(db=db)
-                return outputs.return_to_menu(
-                    products=products, chat_id=chat_id, append=True
-                )
-            return outputs.empty_answer_callback(query_id)
+def _return_to_menu(c: CallbackContext):
+    # always a new message, the menu is where a conversation goes back to
+    return c.outputs.return_to_menu(
+        db=c.db,
+        chat_id=c.chat_id,
+        products=get_products(db=c.db),
+        message_id=c.message_id,
+        append=True,
+    )
 
-        if query_data == "show_prices":
-            return outputs.loading_prices(chat_id)
 
-        if query_data == "return_to_menu":
-            products = get_products(db=db)
-            return (
-                outputs.return_to_menu(
-                    products=products, chat_id=chat_id, message_id=message_id
-                )
-                if last_message is True
-                else outputs.return_to_menu(
-                    products=products,
-                    chat_id=chat_id,
-                    message_id=message_id,
-                    append=True,
-                )
-            )
-        if query_data == "show_terms":
-            return (
-                outputs.show_terms_condititons(chat_id, message_id)
-                if last_message is True
-                else outputs.show_terms_condititons(chat_id, message_id, append=True)
-            )
+def _show_terms(c: CallbackContext):
+    return c.outputs.show_terms_condititons(
+        db=c.db, chat_id=c.chat_id, message_id=c.message_id, append=True
+    )
 
-        if query_data == "support":
-            return (
-                outputs.support(chat_id, message_id)
-                if last_message is True
-                else outputs.support(chat_id, message_id, append=True)
-            )
 
-        if query_data == "contact_support":
-            return (
-                outputs.contact_support_info(chat_id, message_id)
-                if last_message is True
-                else outputs.contact_support_info(chat_id, message_id, append=True)
-            )
-        if query_data == "return_to_support":
-            return (
-                outputs.support(chat_id, message_id)
-                if last_message is True
-                else outputs.support(chat_id, message_id, True)
-            )
-        if query_data == "common_questions":
-            return (
-                outputs.common_questions(chat_id, message_id)
-                if last_message is True
-                else outputs.common_questions(chat_id, message_id, True)
-            )
+def _support(c: CallbackContext):
+    return c.outputs.support(
+        db=c.db,
+        chat_id=c.chat_id,
+        message_id=c.message_id,
+        append=c.last_message is not True,
+    )
 
-        if query_data == "edit_phone_number":
-            return chat_flow.edit_phone_number(db=db, chat=chat, outputs=outputs)
 
-        if query_data == "send_validation_code":
-            return chat_flow.send_otp(outputs=outputs, db=db, chat=chat)
+def _contact_support(c: CallbackContext):
+    return c.outputs.contact_support_info(
+        db=c.db,
+        chat_id=c.chat_id,
+        message_id=c.message_id,
+        append=c.last_message is not True,
+    )
 
-        if query_data.startswith("buy_product:"):
-            _, product_id = query_data.split(":", 1)
-            return chat_flow.buy_product(
-                outputs=outputs, db=db, chat=chat, product_id=int(product_id)
-            )
 
-        if query_data.startswith("buy_product_version:"):
-            _, prodcut_version_id = query_data.split(":", 1)
-            return chat_flow.buy_product_version(
-                outputs=outputs,
-                db=db,
-                chat=chat,
-                product_version_id=int(prodcut_version_id),
-            )
-        if query_data.startswith("login_to_acount:"):
-            _, phone_number = query_data.split(":", 1)
-            return chat_flow.login(
-                outputs=outputs, db=db, chat=chat, phone_number=phone_number
-            )
+def _return_to_support(c: CallbackContext):
+    return c.outputs.support(
+        db=c.db,
+        chat_id=c.chat_id,
+        message_id=c.message_id,
+        append=c.last_message is not True,
+    )
 
-        if query_data.startswith("payment_gateway:"):
-            _, order_id = query_data.split(":", 1)
-            return chat_flow.payment_gateway(
-                outputs=outputs, db=db, chat=chat, order_id=order_id
-            )
 
-        if query_data.startswith("crypto_payment:"):
-            _, order_id = query_data.split(":", 1)
-            return chat_flow.crypto_payment(
-                outputs=outputs, db=db, chat=chat, order_id=order_id
-            )
+def _common_questions(c: CallbackContext):
+    return c.outputs.common_questions(
+        db=c.db,
+        chat_id=c.chat_id,
+        message_id=c.message_id,
+        append=c.last_message is not True,
+    )
 
-        if query_data.startswith("cancel_order:"):
-            _, order_id = query_data.split(":", 1)
-            return chat_flow.cancel_order(
-                outputs=outputs, db=db, chat=chat, order_id=order_id
-            )
 
-        if query_data.startswith("confirm_payment:"):
-            _, order_id = query_data.split(":", 1)
-            return chat_flow.confirm_payment(
-                outputs=outputs, db=db, chat=chat, order_id=order_id
+def _edit_phone_number(c: CallbackContext):
+    return chat_flow.edit_phone_number(db=c.db, chat=c.chat, outputs=c.outputs)
+
+
+def _send_validation_code(c: CallbackContext):
+    return chat_flow.send_otp(outputs=c.outputs, db=c.db, chat=c.chat)
+
+
+def _buy_product(c: CallbackContext):
+    return chat_flow.buy_product(
+        outputs=c.outputs, db=c.db, chat=c.chat, product_id=c.callback.arg()
+    )
+
+
+def _buy_product_version(c: CallbackContext):
+    return chat_flow.buy_product_version(
+        outputs=c.outputs,
+        db=c.db,
+        chat=c.chat,
+        product_version_id=c.callback.arg(),
+    )
+
+
+def _login_to_acount(c: CallbackContext):
+    return chat_flow.login(
+        outputs=c.outputs, db=c.db, chat=c.chat, phone_number=c.callback.arg()
+    )
+
+
+def _payment_gateway(c: CallbackContext):
+    return chat_flow.payment_gateway(
+        outputs=c.outputs, db=c.db, chat=c.chat, order_id=c.callback.arg()
+    )
+
+
+def _crypto_payment(c: CallbackContext):
+    return chat_flow.crypto_payment(
+        outputs=c.outputs, db=c.db, chat=c.chat, order_id=c.callback.arg()
+    )
+
+
+def _cancel_order(c: CallbackContext):
+    return chat_flow.cancel_order(
+        outputs=c.outputs, db=c.db, chat=c.chat, order_id=c.callback.arg()
+    )
+
+
+def _confirm_payment(c: CallbackContext):
+    return chat_flow.confirm_payment(
+        outputs=c.outputs, db=c.db, chat=c.chat, order_id=c.callback.arg()
+    )
+
+
+def _my_orders(c: CallbackContext):
+    return chat_flow.my_orders(
+        outputs=c.outputs,
+        db=c.db,
+        chat=c.chat,
+        before_id=c.callback.arg(),
+        message_id=c.message_id,
+        append=c.last_message is not True,
+    )
+
+
+def _cart(c: CallbackContext):
+    return chat_flow.show_cart(
+        outputs=c.outputs,
+        db=c.db,
+        chat=c.chat,
+        message_id=c.message_id,
+        append=c.last_message is not True,
+    )
+
+
+def _cart_add(c: CallbackContext):
+    return chat_flow.add_to_cart(
+        outputs=c.outputs,
+        db=c.db,
+        chat=c.chat,
+        product_version_id=c.callback.arg(),
+        message_id=c.message_id,
+        append=c.last_message is not True,
+    )
+
+
+def _cart_remove(c: CallbackContext):
+    return chat_flow.remove_from_cart(
+        outputs=c.outputs,
+        db=c.db,
+        chat=c.chat,
+        product_version_id=c.callback.arg(),
+        message_id=c.message_id,
+        append=c.last_message is not True,
+    )
+
+
+def _cart_clear(c: CallbackContext):
+    return chat_flow.clear_cart(
+        outputs=c.outputs,
+        db=c.db,
+        chat=c.chat,
+        message_id=c.message_id,
+        append=c.last_message is not True,
+    )
+
+
+def _cart_checkout(c: CallbackContext):
+    return chat_flow.checkout_cart(outputs=c.outputs, db=c.db, chat=c.chat)
+
+
+def _choose_language(c: CallbackContext):
+    return c.outputs.choose_language(
+        db=c.db,
+        chat_id=c.chat_id,
+        message_id=c.message_id,
+        append=c.last_message is not True,
+    )
+
+
+def _set_locale(c: CallbackContext):
+    return chat_flow.set_locale(
+        outputs=c.outputs,
+        db=c.db,
+        chat=c.chat,
+        locale=c.callback.arg(),
+        message_id=c.message_id,
+        append=c.last_message is not True,
+    )
+
+
+CALLBACK_HANDLERS: Dict[str, Callable[[CallbackContext], Any]] = {
+    "show_terms_for_acceptance": _show_terms_for_acceptance,
+    "read_the_terms": _read_the_terms,
+    "accepted_terms": _accepted_terms,
+    "show_prices": _show_prices,
+    "return_to_menu": _return_to_menu,
+    "show_terms": _show_terms,
+    "support": _support,
+    "contact_support": _contact_support,
+    "return_to_support": _return_to_support,
+    "common_questions": _common_questions,
+    "edit_phone_number": _edit_phone_number,
+    "send_validation_code": _send_validation_code,
+    "buy_product": _buy_product,
+    "buy_product_version": _buy_product_version,
+    "login_to_acount": _login_to_acount,
+    "payment_gateway": _payment_gateway,
+    "crypto_payment": _crypto_payment,
+    "cancel_order": _cancel_order,
+    "confirm_payment": _confirm_payment,
+    "my_orders": _my_orders,
+    "cart": _cart,
+    "cart_add": _cart_add,
+    "cart_remove": _cart_remove,
+    "cart_clear": _cart_clear,
+    "cart_checkout": _cart_checkout,
+    "choose_language": _choose_language,
+    "set_locale": _set_locale,
+}
+if set(CALLBACK_HANDLERS) != set(ROUTES):
+    raise RuntimeError(
+        f"callback routes without a handler or vice versa: {set(CALLBACK_HANDLERS) ^ set(ROUTES)}"
+    )
+
+
+def process_callback_query(
+    query_id: str,
+    chat_id: str,
+    query_data: str,
+    message_id: str,
+    db: Session,
+    outputs: TelegrambotOutputs,
+    language_code: str | None = None,
+):
+    try:
+        chat = get_chat_by_chat_id(db, chat_id)
+        # every output below renders in the chat's language
+        with use_locale(resolve_locale(chat.locale, language_code)):
+            last_message = chat_flow.is_last_message(
+                message_id=message_id, db=db, chat=chat
             )
 
-        else:
-            logger.error(
-                f"process_callback_query failed: the the query data is unknown: {query_data}"
+            # the next text message is an answer (phone number, code), not a command
+            if CHAT_FSM.awaits_input(chat):
+                return outputs.empty_answer_callback(query_id)
+
+            try:
+                callback = decode_callback(query_data)
+            except ExpiredCallback as e:
+                logger.info(f"process_callback_query: {e}")
+                return outputs.empty_answer_callback(query_id)
+            except ValueError:
+                logger.error(
+                    f"process_callback_query failed: the the query data is unknown: {query_data}"
+                )
+                raise ValueError("unknown command")
+
+            # one dict lookup instead of a chain of startswith checks
+            return CALLBACK_HANDLERS[callback.route](
+                CallbackContext(
+                    query_id=query_id,
+                    chat_id=chat_id,
+                    message_id=message_id,
+                    chat=chat,
+                    last_message=last_message,
+                    callback=callback,
+                    db=db,
+                    outputs=outputs,
+                )
             )
-            raise ValueError("unknown command")
     except Exception as e:
         logger.error(f"proccess_callback_query failed:{e}")
         raise
 
 
 def process_text(
-    outputs: TelegrambotOutputs, chat: TgChat, text: str, db: Session
+    outputs: TelegrambotOutputs,
+    chat: TgChat,
+    text: str,
+    db: Session,
+    language_code: str | None = None,
 ) -> Dict[str, Any]:
     try:
         chat_data = get_chat_by_chat_id(db, chat.id)
-        auth = chat_flow.chat_first_level_authentication(
-            db=db, data=chat, chat_db=chat_data, outputs=outputs
-        )
-        if auth is not True:
-            return auth
-        if text == "/start":
-            products = get_products(db=db)
-            return outputs.return_to_menu(
-                products=products, chat_id=chat.id, append=True
-            )
-        if chat_data.pending_action == "waiting_for_phone_number":
-            return chat_flow.phone_number_input(
-                outputs=outputs, db=db, phone_number=text, chat_data=chat_data
+        preferred = chat_data.locale if chat_data is not None else None
+        with use_locale(resolve_locale(preferred, language_code)):
+            auth = chat_flow.chat_first_level_authentication(
+                db=db, data=chat, chat_db=chat_data, outputs=outputs
             )
-        if chat_data.pending_action == "waiting_for_otp":
-            return chat_flow.otp_verify(
-                outputs=outputs, db=db, text=text, chat=chat_data
-            )
-        else:
-            raise UnsuportedTextInput("unsupported command or text input")
+            if auth is not True:
+                return auth
+            if text == "/start":
+                products = get_products(db=db)
+                return outputs.return_to_menu(
+                    db=db, chat_id=chat.id, products=products, append=True
+                )
+            if chat_data.fsm_state == ChatState.WAITING_FOR_PHONE_NUMBER:
+                return chat_flow.phone_number_input(
+                    outputs=outputs, db=db, phone_number=text, chat_data=chat_data
+                )
+            if chat_data.fsm_state == ChatState.WAITING_FOR_OTP:
+                return chat_flow.otp_verify(
+                    outputs=outputs, db=db, text=text, chat=chat_data
+                )
+            else:
+                raise UnsuportedTextInput("unsupported command or text input")
     except Exception as e:
         logger.error(f"procces_text failed:{e}")
         raise
@@ -7,13 +7,7 @@ import httpx
 from pydantic import HttpUrl
 
 from src.config import settings, logger
-
-
-BASE_URL = f"https://api.telegram.org/bot{settings.bot_token}"
-
-
-def _api(method: str) -> str:
-    return f"{BASE_URL}/{method}"
+from src.clients.telegram import TelegramClient
 
 
 def _allowed_updates() -> List[str]:
@@ -21,55 +15,50 @@ def _allowed_updates() -> List[str]:
     return [str(u.value) for u in settings.allowed_updates]
 
 
-async def get_webhook() -> Dict[str, Any]:
+async def get_webhook(client: TelegramClient) -> Dict[str, Any]:
     """
     https://core.telegram.org/bots/api#getwebhookinfo
     """
-    url = _api("getWebhookInfo")
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url)
-        try:
-            resp.raise_for_status()
-        except httpx.HTTPStatusError as e:
-            logger.error("getWebhookInfo failed: %s", e.response.text)
-            raise
-        data = resp.json()
-        logger.info(data)
-        return data
-
-
-async def delete_webhook(drop_pending: Optional[bool] = None) -> Dict[str, Any]:
+    resp = await client.get("getWebhookInfo")
+    try:
+        resp.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        logger.error("getWebhookInfo failed: %s", e.response.text)
+        raise
+    data = resp.json()
+    logger.info(data)
+    return data
+
+
+async def delete_webhook(
+    client: TelegramClient, drop_pending: Optional[bool] = None
+) -> Dict[str, Any]:
     """
     https://core.telegram.org/bots/api#deletewebhook
     """
-    url = _api("deleteWebhook")
     payload: Dict[str, Any] = {}
     if drop_pending is not None:
         payload["drop_pending_updates"] = bool(drop_pending)
 
-    timeout = httpx.Timeout(20.0, connect=5.0)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        # Telegram supports JSON body for this endpoint
-        resp = await client.post(url, json=payload or None)
-        try:
-            resp.raise_for_status()
-        except httpx.HTTPStatusError as e:
-            logger.error("deleteWebhook failed: %s", e.response.text)
-            raise
-        data = resp.json()
-        logger.info("Webhook removed: %s", data)
-        return data
-
-
-async def set_webhook(webhook: HttpUrl) -> Dict[str, Any]:
+    # Telegram supports JSON body for this endpoint
+    resp = await client.post("deleteWebhook", json=payload or None)
+    try:
+        resp.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        logger.error("deleteWebhook failed: %s", e.response.text)
+        raise
+    data = resp.json()
+    logger.info("Webhook removed: %s", data)
+    return data
+
+
+async def set_webhook(client: TelegramClient, webhook: HttpUrl) -> Dict[str, Any]:
     """
     https://core.telegram.org/bots/api#setwebhook
 
     Sends JSON when no certificate is provided.
     Falls back to multipart/form-data only when uploading a certificate file.
     """
-    url = _api("setWebhook")
-
     # Common fields
     base_payload: Dict[str, Any] = {
         "url": str(webhook),
@@ -87,30 +76,29 @@ async def set_webhook(webhook: HttpUrl) -> Dict[str, Any]:
     # With pure JSON body, we can send a plain list.
     updates_list = _allowed_updates()
 
-    async with httpx.AsyncClient() as client:
-        if settings.certificate:
-            # Multipart/form-data path: add fields as form-data and attach the file.
-            payload_form = dict(base_payload)
-            payload_form["allowed_updates"] = json.dumps(updates_list)
-
-            cert_path = settings.certificate
-            filename = cert_path.name  # stem + suffix
-            # Open/close the file properly while doing the request
-            with cert_path.open("rb") as f:
-                files = {"certificate": (filename, f, "application/octet-stream")}
-                resp = await client.post(url, data=payload_form, files=files)
-        else:
-            # Pure JSON path (preferred when no cert file is used)
-            payload_json = dict(base_payload)
-            payload_json["allowed_updates"] = updates_list
-            resp = await client.post(url, json=payload_json)
-
-        try:
-            resp.raise_for_status()
-        except httpx.HTTPStatusError as e:
-            logger.error("setWebhook failed: %s", e.response.text)
-            raise
-
-        data = resp.json()
-        logger.info("Webhook set to: %s | response: %s", webhook, data)
-        return data
+    if settings.certificate:
+        # Multipart/form-data path: add fields as form-data and attach the file.
+        payload_form = dict(base_payload)
+        payload_form["allowed_updates"] = json.dumps(updates_list)
+
+        cert_path = settings.certificate
+        filename = cert_path.name  # stem + suffix
+        # Open/close the file properly while doing the request
+        with cert_path.open("rb") as f:
+            files = {"certificate": (filename, f, "application/octet-stream")}
+            resp = await client.post("setWebhook", data=payload_form, files=files)
+    else:
+        # Pure JSON path (preferred when no cert file is used)
+        payload_json = dict(base_payload)
+        payload_json["allowed_updates"] = updates_list
+        resp = await client.post("setWebhook", json=payload_json)
+
+    try:
+        resp.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        logger.error("setWebhook failed: %s", e.response.text)
+        raise
+
+    data = resp.json()
+    logger.info("Webhook set to: %s | response: %s", webhook, data)
+    return data
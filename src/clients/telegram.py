@@ -1,17 +1,95 @@
+import time
 from typing import Dict, Any
 from fastapi.requests import Request
 import httpx
 from src.config import logger, settings
+from src.core.metrics import TELEGRAM_API_SECONDS
+from src.core.tracing import start_span
+
+API_BASE_URL = f"{settings.telegram_api_url.rstrip('/')}/bot{settings.bot_token}"
+
+TELEGRAM_METHODS = (
+    "sendMessage",
+    "editMessageText",
+    "answerCallbackQuery",
+    "deleteMessage",
+    "getWebhookInfo",
+    "setWebhook",
+    "deleteWebhook",
+)
+
+
+class TelegramClient:
+    """
+    The one HTTP client for the Bot API. Created once at startup and shared
+    (app.state.telegram) so every call reuses pooled keep-alive connections
+    instead of paying for DNS + TLS on a fresh client.
+    """
+
+    def __init__(self) -> None:
+        self.urls: Dict[str, str] = {
+            method: f"{API_BASE_URL}/{method}" for method in TELEGRAM_METHODS
+        }
+        self.http = httpx.AsyncClient(
+            http2=self._http2_available(),
+            limits=httpx.Limits(
+                max_connections=settings.telegram_max_connections,
+                max_keepalive_connections=settings.telegram_max_keepalive,
+                keepalive_expiry=settings.telegram_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                settings.telegram_timeout,
+                connect=settings.telegram_connect_timeout,
+                pool=settings.telegram_pool_timeout,
+            ),
+        )
+
+    @staticmethod
+    def _http2_available() -> bool:
+        if not settings.telegram_http2:
+            return False
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("TELEGRAM_HTTP2 is set but the h2 package is missing")
+            return False
+        return True
+
+    def url(self, method: str) -> str:
+        url = self.urls.get(method)
+        if url is None:
+            url = self.urls[method] = f"{API_BASE_URL}/{method}"
+        return url
+
+    async def _request(self, verb: str, method: str, **kwargs: Any) -> httpx.Response:
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            resp = await self.http.request(verb, self.url(method), **kwargs)
+            outcome = "ok" if resp.is_success else str(resp.status_code)
+            return resp
+        finally:
+            TELEGRAM_API_SECONDS.observe(time.perf_counter() - started, method, outcome)
+
+    async def get(self, method: str, **kwargs: Any) -> httpx.Response:
+        return await self._request("GET", method, **kwargs)
+
+    async def post(self, method: str, **kwargs: Any) -> httpx.Response:
+        return await self._request("POST", method, **kwargs)
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
 
 
 async def _post_to_telegram(
     request: Request, method: str, payload: Dict[str, Any]
 ) -> Dict[str, Any]:
-    url = f"https://api.telegram.org/bot{settings.bot_token}/{method}"
+    client: TelegramClient = request.app.state.telegram
 
     try:
-        resp: httpx.Response = await request.app.state.http.post(url, json=payload)
-        resp.raise_for_status()
+        with start_span(f"telegram.{method}", method=method):
+            resp: httpx.Response = await client.post(method, json=payload)
+            resp.raise_for_status()
     except httpx.HTTPError as e:
         logger.error(
             "%s failed: %s | body=%s | payload=%s",
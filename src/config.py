@@ -4,7 +4,7 @@ import socket
 import warnings
 from enum import IntEnum, StrEnum
 from ipaddress import IPv4Address
-from typing import List
+from typing import List, Literal
 
 from pydantic import BaseModel, HttpUrl, FilePath, Field, PositiveInt
 from pydantic_settings import BaseSettings
@@ -34,6 +34,7 @@ class AllowedUpdates(StrEnum):
     channel_post: str = "channel_post"
     edited_channel_post: str = "edited_channel_post"
     callback_query: str = "callback_query"
+    inline_query: str = "inline_query"  # needs inline mode on (BotFather /setinline)
 
 
 class Settings(BaseSettings):
@@ -47,6 +48,24 @@ class Settings(BaseSettings):
 
     db_url: str
 
+    # Connection pool specifics
+    # per worker: size the total (workers * (pool_size + max_overflow))
+    # below postgres max_connections
+    db_pool_size: PositiveInt = 5
+    db_max_overflow: int = Field(10, ge=0)
+    db_pool_recycle: int = 1800  # seconds, -1 disables
+    db_pool_timeout: PositiveInt = 10  # seconds to wait for a free connection
+    # pre-ping on every checkout costs a round trip; by default only ping
+    # connections that sat idle for longer than the interval (0 disables)
+    db_pool_pre_ping: bool = False
+    db_pool_pre_ping_interval: int = Field(30, ge=0)
+
+    # Read replica specifics
+    # reads marked with read_replica() go to these when they are caught up
+    db_replica_urls: List[str] = []
+    db_replica_max_lag_seconds: float = 2.0
+    db_replica_lag_check_interval: float = 1.0
+
     jwt_secret: str
     jwt_token_expirty_per_seconds: int = 480
 
@@ -65,8 +84,88 @@ class Settings(BaseSettings):
         AllowedUpdates.message,
         AllowedUpdates.edited_message,
         AllowedUpdates.callback_query,
+        AllowedUpdates.inline_query,
     ]
 
+    # Telegram Bot API client specifics (one shared pooled client)
+    telegram_api_url: str = "https://api.telegram.org"  # bench/fake_telegram.py for load tests
+    telegram_max_connections: PositiveInt = 100
+    telegram_max_keepalive: PositiveInt = 20
+    telegram_keepalive_expiry: float = 60.0  # seconds an idle connection is kept
+    telegram_connect_timeout: float = 5.0
+    telegram_timeout: float = 10.0
+    telegram_pool_timeout: float = 5.0  # waiting for a free pooled connection
+    telegram_http2: bool = False  # needs the optional h2 package
+
+    # Query inspector specifics (also switchable at runtime, see /health)
+    query_inspector_enabled: bool = False
+    query_inspector_max_queries: PositiveInt = 20  # per update
+    query_inspector_max_repeats: PositiveInt = 3  # same statement shape per update
+    query_inspector_slow_ms: float = 100.0
+
+    # Tracing specifics
+    tracing_exporter: Literal["none", "file", "otlp"] = "none"
+    tracing_file: str = "traces.jsonl"
+    tracing_otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    tracing_sample_ratio: float = Field(1.0, ge=0, le=1)
+
+    # Worker specifics (WORKERS > 1 runs a dispatcher plus one process per worker)
+    workers: PositiveInt = 1
+    worker_base_port: int = 0  # workers listen on 127.0.0.1, from port + 1 if 0
+
+    # Cache specifics (L1 per process, optional L2 shared by the workers)
+    cache_ttl: float = 300.0  # default seconds an entry lives
+    cache_l1_max_items: PositiveInt = 10000
+    cache_l1_max_bytes: PositiveInt = 64 * 1024 * 1024
+    cache_l2_backend: Literal["none", "memory", "shm"] = "none"
+    cache_shm_dir: str = "/dev/shm/telegram-star-bot"
+    cache_market_price_ttl: float = 5.0
+    cache_price_list_ttl: float = 10.0
+    cache_order_status_ttl: float = 5.0  # unpaid orders; paid ones use CACHE_TTL
+
+    # Outbox specifics (replies stored with the transaction, sent in the background)
+    outbox_enabled: bool = False
+    outbox_batch_size: PositiveInt = 100
+    outbox_poll_interval: float = 1.0  # seconds, commits wake the dispatcher earlier
+    outbox_rate_per_second: float = 25.0  # Bot API allows about 30 messages/s
+    outbox_burst: float = 25.0
+    outbox_max_attempts: PositiveInt = 8
+    outbox_max_backoff: float = 300.0
+    outbox_lease_seconds: float = 60.0  # SENDING rows older than this are retried
+    outbox_sent_retention: float = 86400.0  # sent rows are deleted this long after
+    outbox_prune_interval: float = 300.0
+    outbox_prune_batch_size: PositiveInt = 5000
+
+    # Update capture specifics (bench/replay.py plays a capture back)
+    update_capture_file: str = ""  # empty = not recording; with WORKERS > 1 one file per worker (.N)
+    update_capture_salt: str = ""  # keys the chat id hashing, random per process if empty
+
+    # Order specifics
+    order_history_page_size: PositiveInt = 5
+    # unpaid orders older than this are expired; until then a buy press reuses them
+    order_pending_ttl: float = 3600.0
+    order_expiry_interval: float = 60.0  # seconds between the expiry sweeps
+
+    # Callback data specifics (compact buttons, see src/bot/callbacks.py)
+    callback_inline_max_bytes: PositiveInt = 24  # longer string args are stored server side
+    callback_payload_ttl: float = 86400.0  # a button with a stored arg works this long
+
+    # Cart specifics (kept in memory, written to chats.cart lazily)
+    cart_flush_interval: float = 30.0  # seconds; edits since the last flush die with the process
+    cart_max_lines: PositiveInt = 10
+    cart_max_quantity: PositiveInt = 10
+    cart_max_cached: PositiveInt = 10000  # stored carts beyond this are dropped from memory
+
+    # Locale specifics (chat output variants, see src/bot/i18n.py)
+    locales: List[str] = ["fa", "en"]  # offered to users; missing templates fall back
+    default_locale: str = "fa"  # when neither the chat nor its language_code picks one
+
+    # Inline mode specifics (answered from an in-memory index, see src/services/search.py)
+    inline_cache_time: int = Field(300, ge=0)  # seconds Telegram may cache an answer
+    inline_index_refresh: float = 30.0  # seconds between catalog / price checks
+    inline_cache_max_queries: PositiveInt = 10000  # answers kept per process
+    inline_max_query_length: PositiveInt = 64  # normalized chars, the rest is ignored
+
     # API specifics
     host: str = socket.gethostbyname("localhost")
     port: AllowedPorts = AllowedPorts.openssl
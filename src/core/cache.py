@@ -0,0 +1,474 @@
+import hashlib
+import json
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Protocol, Tuple
+
+from src.config import logger, settings
+from src.core.metrics import REGISTRY, Counter, Gauge
+
+CACHE_LOOKUPS = REGISTRY.register(
+    Counter(
+        "bot_cache_total",
+        "Two tier cache lookups per namespace (l1 / l2 hit or miss).",
+        ("namespace", "result"),
+    )
+)
+
+_MISSING = object()
+
+
+# --- L1: in process ---
+
+
+class LocalCache:
+    """
+    LRU with a per entry TTL and a byte budget. Sizes are the pickled size
+    when the value went to L2 anyway, otherwise sys.getsizeof.
+    """
+
+    def __init__(self, max_items: int, max_bytes: int, ttl: float) -> None:
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.evictions = 0
+        # key -> (expires_at, size, value)
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] < time.monotonic():
+                self._pop(key)
+                return _MISSING
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key: str, value: Any, size: int, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (expires_at, size, value)
+            self.bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_items or self.bytes > self.max_bytes
+            ):
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+
+    def clear(self, prefix: str = "") -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._pop(key)
+
+    def _pop(self, key: str) -> None:
+        self.bytes -= self._entries.pop(key)[1]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# --- L2: shared between workers ---
+
+
+class CacheBackend(Protocol):
+    """
+    What an L2 has to offer: bytes by key with a TTL, an atomic counter
+    (namespace versions) and fan-out of invalidation messages to every
+    process. An external KV (Redis: GET/SETEX/DEL/INCR/PUBLISH) fits as is.
+    """
+
+    def get(self, key: str) -> Optional[bytes]: ...
+
+    def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+    def incr(self, key: str) -> int: ...
+
+    def counter(self, key: str) -> int: ...
+
+    def publish(self, message: Dict[str, Any]) -> None: ...
+
+    def listen(self, callback: Callable[[Dict[str, Any]], None]) -> None: ...
+
+
+class MemoryBackend:
+    """
+    Process local stand-in for an external KV, for a single worker and for
+    trying the L2 code paths without any infrastructure.
+    """
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Tuple[float, bytes]] = {}
+        self._counters: Dict[str, int] = {}
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.time():
+            return None
+        return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._data[key] = (time.time() + ttl, value)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        for callback in self._listeners:
+            callback(message)
+
+    def listen(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        self._listeners.append(callback)
+
+
+_EXPIRY = struct.Struct(">d")
+
+
+class SharedMemoryBackend:
+    """
+    L2 for the workers of one host, kept in a tmpfs directory (/dev/shm) so
+    it lives in memory. One file per entry, replaced atomically; counters
+    take an flock; invalidations are appended to an event log that a thread
+    in every process tails.
+    """
+
+    MAX_EVENT_LOG = 1 << 20
+
+    def __init__(self, directory: str, poll_interval: float = 0.1) -> None:
+        self.directory = directory
+        self.poll_interval = poll_interval
+        os.makedirs(os.path.join(directory, "entries"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "counters"), exist_ok=True)
+        self.events_path = os.path.join(directory, "events")
+        self.lock_path = os.path.join(directory, "lock")
+        open(self.events_path, "ab").close()
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._tail: threading.Thread | None = None
+        self._writes = 0
+
+    def _path(self, key: str, kind: str = "entries") -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, kind, digest)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        if len(raw) < _EXPIRY.size or _EXPIRY.unpack_from(raw)[0] < time.time():
+            return None
+        return raw[_EXPIRY.size :]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        path = self._path(key)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(_EXPIRY.pack(time.time() + ttl) + value)
+        os.replace(tmp, path)
+        self._writes += 1
+        if self._writes % 1024 == 0:
+            self._sweep()
+
+    def _sweep(self) -> None:
+        """Remove expired entries, e.g. everything of an older namespace version."""
+        now = time.time()
+        entries = os.path.join(self.directory, "entries")
+        for name in os.listdir(entries):
+            path = os.path.join(entries, name)
+            try:
+                with open(path, "rb") as f:
+                    head = f.read(_EXPIRY.size)
+                if len(head) == _EXPIRY.size and _EXPIRY.unpack(head)[0] < now:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _locked(self, func: Callable[[], Any]) -> Any:
+        import fcntl
+
+        with open(self.lock_path, "a+b") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                return func()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def incr(self, key: str) -> int:
+        path = self._path(key, "counters")
+
+        def _incr() -> int:
+            try:
+                with open(path, "rb") as f:
+                    value = int(f.read() or 0) + 1
+            except FileNotFoundError:
+                value = 1
+            with open(path, "wb") as f:
+                f.write(str(value).encode())
+            return value
+
+        return self._locked(_incr)
+
+    def counter(self, key: str) -> int:
+        try:
+            with open(self._path(key, "counters"), "rb") as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        line = (json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8")
+
+        def _append() -> None:
+            if os.path.getsize(self.events_path) > self.MAX_EVENT_LOG:
+                # readers see the log shrink and drop their whole L1
+                open(self.events_path, "wb").close()
+            with open(self.events_path, "ab") as f:
+                f.write(line)
+
+        self._locked(_append)
+
+    def listen(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        self._listeners.append(callback)
+        if self._tail is None:
+            self._tail = threading.Thread(
+                target=self._follow, name="cache-invalidation", daemon=True
+            )
+            self._tail.start()
+
+    def _follow(self) -> None:
+        offset = os.path.getsize(self.events_path)
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                size = os.path.getsize(self.events_path)
+                if size < offset:
+                    offset = 0
+                    self._dispatch({"namespace": "*", "key": None})
+                if size == offset:
+                    continue
+                with open(self.events_path, "rb") as f:
+                    f.seek(offset)
+                    chunk = f.read(size - offset)
+                # a line still being written is picked up next round
+                complete = chunk.rfind(b"\n") + 1
+                offset += complete
+                for line in chunk[:complete].splitlines():
+                    self._dispatch(json.loads(line))
+            except Exception as e:
+                logger.warning("cache invalidation log: %s", e)
+
+    def _dispatch(self, message: Dict[str, Any]) -> None:
+        for callback in self._listeners:
+            callback(message)
+
+
+# --- Two tier cache ---
+
+
+class TwoTierCache:
+    """
+    Per namespace view on the process wide L1 and the L2. Keys are
+    versioned: "<namespace>:<schema>:v<version>:<key>". invalidate_all()
+    bumps the namespace version, so stale L2 entries are never read again
+    and simply expire; single keys are deleted. Either way every process
+    is told over pub/sub and drops its L1 copies.
+
+    shared=False keeps values out of L2 (e.g. they don't pickle), the
+    invalidation messages still go out.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        l1: LocalCache,
+        l2: Optional[CacheBackend],
+        schema: str = "1",
+        shared: bool = True,
+        ttl: Optional[float] = None,
+    ) -> None:
+        self.namespace = namespace
+        self.schema = schema
+        self.l1 = l1
+        self.l2 = l2
+        self.shared = shared and l2 is not None
+        self.ttl = settings.cache_ttl if ttl is None else ttl
+        self.version = l2.counter(self._version_key) if l2 is not None else 0
+
+    @property
+    def _version_key(self) -> str:
+        return f"{self.namespace}:version"
+
+    @property
+    def _prefix(self) -> str:
+        return f"{self.namespace}:"
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{self.schema}:v{self.version}:{key}"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        full_key = self._key(key)
+        value = self.l1.get(full_key)
+        if value is not _MISSING:
+            CACHE_LOOKUPS.inc(self.namespace, "l1_hit")
+            return value
+        if self.shared:
+            raw = self.l2.get(full_key)
+            if raw is not None:
+                try:
+                    value = pickle.loads(raw)
+                except Exception as e:
+                    logger.warning("cache %s: unreadable L2 entry: %s", full_key, e)
+                else:
+                    CACHE_LOOKUPS.inc(self.namespace, "l2_hit")
+                    self.l1.set(full_key, value, len(raw), self.ttl)
+                    return value
+        CACHE_LOOKUPS.inc(self.namespace, "miss")
+        return default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        full_key = self._key(key)
+        size = sys.getsizeof(value)
+        if self.shared:
+            raw = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            size = len(raw)
+            try:
+                self.l2.set(full_key, raw, ttl)
+            except Exception as e:
+                logger.warning("cache %s: L2 write failed: %s", full_key, e)
+        self.l1.set(full_key, value, size, ttl)
+
+    def get_or_load(
+        self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None
+    ) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, key: str) -> None:
+        full_key = self._key(key)
+        self.l1.delete(full_key)
+        if self.l2 is not None:
+            if self.shared:
+                self.l2.delete(full_key)
+            self.l2.publish(
+                {"origin": os.getpid(), "namespace": self.namespace, "key": full_key}
+            )
+
+    def invalidate_all(self) -> None:
+        self.l1.clear(self._prefix)
+        if self.l2 is None:
+            self.version += 1
+            return
+        self.version = self.l2.incr(self._version_key)
+        self.l2.publish(
+            {
+                "origin": os.getpid(),
+                "namespace": self.namespace,
+                "key": None,
+                "version": self.version,
+            }
+        )
+
+    def on_message(self, message: Dict[str, Any]) -> None:
+        if message.get("namespace") not in (self.namespace, "*"):
+            return
+        if message.get("origin") == os.getpid():
+            return
+        if message.get("key") is not None:
+            self.l1.delete(message["key"])
+            return
+        self.version = max(self.version, message.get("version", self.version))
+        self.l1.clear(self._prefix)
+
+
+# --- Registry ---
+
+_l1: LocalCache | None = None
+_l2: CacheBackend | None = None
+_caches: Dict[str, TwoTierCache] = {}
+_registry_lock = threading.Lock()
+
+
+def _build_l2() -> Optional[CacheBackend]:
+    if settings.cache_l2_backend == "memory":
+        return MemoryBackend()
+    if settings.cache_l2_backend == "shm":
+        try:
+            return SharedMemoryBackend(settings.cache_shm_dir)
+        except OSError as e:
+            logger.warning("shared cache at %s unavailable, L1 only: %s", settings.cache_shm_dir, e)
+    return None
+
+
+def _dispatch(message: Dict[str, Any]) -> None:
+    for cache in list(_caches.values()):
+        cache.on_message(message)
+
+
+def _l1_collect():
+    if _l1 is not None:
+        yield ("items",), len(_l1)
+        yield ("bytes",), _l1.bytes
+        yield ("evictions",), _l1.evictions
+
+
+REGISTRY.register(Gauge("bot_cache_l1", "In process cache size.", ("field",), _l1_collect))
+
+
+def get_cache(
+    namespace: str, schema: str = "1", shared: bool = True, ttl: Optional[float] = None
+) -> TwoTierCache:
+    """The cache for `namespace`; all namespaces share one L1 budget and L2."""
+    global _l1, _l2
+    with _registry_lock:
+        if _l1 is None:
+            _l1 = LocalCache(
+                settings.cache_l1_max_items, settings.cache_l1_max_bytes, settings.cache_ttl
+            )
+            _l2 = _build_l2()
+            if _l2 is not None:
+                _l2.listen(_dispatch)
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = _caches[namespace] = TwoTierCache(
+                namespace, _l1, _l2, schema=schema, shared=shared, ttl=ttl
+            )
+        return cache
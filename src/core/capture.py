@@ -0,0 +1,192 @@
+import hashlib
+import hmac
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, Tuple
+
+from src.bot.callbacks import ROUTES, decode_callback, encode_callback
+from src.config import logger, settings
+from src.workers import worker_index
+
+# frame: payload length (uint32) + capture time in ms (uint64), then the payload;
+# the payload is one update as JSON, deflated with a shared preset dictionary
+FRAME_HEADER = struct.Struct(">IQ")
+MAGIC = b"TGCAP1\n"
+
+# words every update repeats; as a preset dictionary they compress to a few
+# bytes even though each update is compressed on its own
+ZDICT = (
+    b'{"update_id": , "message": {"message_id": , "from": {"id": , "is_bot": false, '
+    b'"first_name": "", "language_code": "en"}, "chat": {"id": , "first_name": "", '
+    b'"type": "private"}, "date": , "text": "/start"}, "callback_query": {"id": "", '
+    b'"chat_instance": "", "data": "buy_product_version:buy_product:show_prices'
+    b'return_to_menu", "reply_markup": {"inline_keyboard": [[{"text": "", '
+    b'"callback_data": ""}]]}}, "entities": [{"offset": 0, "length": 6, '
+    b'"type": "bot_command"}]}'
+)
+
+_DROPPED_KEYS = frozenset({"last_name", "username", "phone_number", "vcard"})
+# kept but blanked, the bot expects a first name on every chat
+_REDACTED = {"first_name": "user"}
+# user typed: only the length survives, or the command of a /command
+_TEXT_KEYS = frozenset({"text", "caption", "query"})
+# hashed wherever they are (from, chat, contact, entities, ...) when ints
+_ID_KEYS = frozenset({"id", "user_id", "chat_id"})
+# pressed and sent buttons: the route survives, string args are blanked
+_CALLBACK_KEYS = frozenset({"data", "callback_data"})
+
+
+def _blank_text(text: str) -> str:
+    if text.startswith("/"):
+        return text.split(maxsplit=1)[0]  # "/start <payload>" -> "/start"
+    return "x" * len(text)
+
+
+def _blank_callback_args(data: str) -> str:
+    # string args are where user data rides (login_to_acount: the phone
+    # number, base64 is no protection); int args are catalog and order ids
+    try:
+        callback = decode_callback(data)
+    except ValueError:
+        return ""
+    kinds = ROUTES[callback.route][1]
+    args = [arg if kind is int else "" for kind, arg in zip(kinds, callback.args)]
+    return encode_callback(callback.route, *args)
+
+
+class _Anonymizer:
+    """
+    Replaces user and chat ids with a keyed hash so the same user maps to the
+    same fake id for the whole capture (per-chat order and affinity survive)
+    while the real id can't be recovered without the salt. Names and phone
+    numbers are removed, typed text and callback string args blanked.
+    """
+
+    def __init__(self, salt: bytes) -> None:
+        self.salt = salt
+
+    def fake_id(self, real_id: int) -> int:
+        digest = hmac.new(self.salt, str(real_id).encode(), hashlib.sha256).digest()
+        # positive and below 2**52 so it survives any JSON round trip
+        return int.from_bytes(digest[:7], "big") >> 4
+
+    def __call__(self, obj: Any) -> Any:
+        if isinstance(obj, list):
+            return [self(v) for v in obj]
+        if not isinstance(obj, dict):
+            return obj
+        out = {}
+        for key, value in obj.items():
+            if key in _DROPPED_KEYS:
+                continue
+            if key in _REDACTED:
+                out[key] = _REDACTED[key]
+            elif key in _ID_KEYS and isinstance(value, int) and not isinstance(value, bool):
+                out[key] = self.fake_id(value)
+            elif key in _TEXT_KEYS and isinstance(value, str):
+                out[key] = _blank_text(value)
+            elif key in _CALLBACK_KEYS and isinstance(value, str):
+                out[key] = _blank_callback_args(value)
+            else:
+                out[key] = self(value)
+        return out
+
+
+def encode_update(update: Dict[str, Any], captured_ms: int) -> bytes:
+    deflater = zlib.compressobj(9, zdict=ZDICT)
+    raw = json.dumps(update, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    payload = deflater.compress(raw) + deflater.flush()
+    return FRAME_HEADER.pack(len(payload), captured_ms) + payload
+
+
+def read_capture(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (captured_ms, update) in capture order; a torn last frame is ignored."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an update capture")
+        while True:
+            header = f.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            length, captured_ms = FRAME_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                logger.warning("capture %s ends with a partial frame", path)
+                return
+            inflater = zlib.decompressobj(zdict=ZDICT)
+            raw = inflater.decompress(payload) + inflater.flush()
+            yield captured_ms, json.loads(raw)
+
+
+class UpdateRecorder:
+    """
+    Opt-in (UPDATE_CAPTURE_FILE) recorder of raw webhook updates. record()
+    only queues; anonymising, compressing and the append happen on a daemon
+    thread. When the queue is full updates are dropped, never waited on.
+    """
+
+    def __init__(self, path: str, salt: str, max_queue: int = 10000) -> None:
+        self.path = path
+        self.anonymize = _Anonymizer(salt.encode("utf-8") or os.urandom(16))
+        self.dropped = 0
+        self.recorded = 0
+        self._queue: "queue.Queue[Tuple[int, Dict[str, Any]]]" = queue.Queue(
+            maxsize=max_queue
+        )
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as f:
+                f.write(MAGIC)
+        self._thread = threading.Thread(
+            target=self._worker, name="update-capture", daemon=True
+        )
+        self._thread.start()
+
+    def record(self, update: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait((time.time_ns() // 1_000_000, update))
+        except queue.Full:
+            self.dropped += 1
+
+    def _worker(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                frames = b"".join(
+                    encode_update(self.anonymize(update), ms) for ms, update in batch
+                )
+                with open(self.path, "ab") as f:
+                    f.write(frames)
+                self.recorded += len(batch)
+            except Exception as e:
+                logger.warning("capturing %s updates failed: %s", len(batch), e)
+
+
+_recorder: UpdateRecorder | None = None
+_recorder_pid: int | None = None
+
+
+def get_recorder() -> UpdateRecorder | None:
+    # built lazily (and again after a fork) since it owns a thread
+    global _recorder, _recorder_pid
+    if not settings.update_capture_file:
+        return None
+    if _recorder is None or _recorder_pid != os.getpid():
+        path = settings.update_capture_file
+        if settings.workers > 1 or _recorder_pid is not None:
+            # one file per worker / forked process; their appends would interleave
+            index = worker_index()
+            path = f"{path}.{index if index is not None else os.getpid()}"
+        _recorder = UpdateRecorder(path, settings.update_capture_salt)
+        _recorder_pid = os.getpid()
+        logger.info("capturing webhook updates to %s", path)
+    return _recorder
@@ -0,0 +1,56 @@
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Set, Type
+
+from src.config import logger
+
+Handler = Callable[[Any], Awaitable[None]]
+
+
+# --- Events ---
+
+
+@dataclass(frozen=True)
+class PaymentConfirmed:
+    order_id: int
+    user_id: int
+    paid_at: datetime
+
+
+# --- Bus ---
+
+
+class EventBus:
+    """
+    In-process publish/subscribe. publish() returns at once; each handler
+    runs as its own task so a slow or failing handler (a Telegram send)
+    never holds up the publisher (the payment callback) or the other ones.
+    """
+
+    def __init__(self) -> None:
+        self._handlers: Dict[Type, List[Handler]] = defaultdict(list)
+        # strong references, the loop only keeps weak ones to running tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    def subscribe(self, event_type: Type, handler: Handler) -> None:
+        self._handlers[event_type].append(handler)
+
+    def publish(self, event: Any) -> None:
+        for handler in self._handlers.get(type(event), ()):
+            task = asyncio.create_task(self._run(handler, event))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _run(handler: Handler, event: Any) -> None:
+        try:
+            await handler(event)
+        except Exception as e:
+            logger.error(f"{getattr(handler, '__name__', handler)} for {event} failed:{e}")
+
+    async def drain(self) -> None:
+        """Wait for the handlers still running (shutdown)."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
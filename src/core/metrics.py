@@ -0,0 +1,260 @@
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from src.config import logger
+
+# latency buckets in seconds, from a cached render up to a slow Telegram call
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        lines = self.header()
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    A settable gauge, or a callback gauge when `collect` is given: collect()
+    yields (label values, value) pairs and runs only when /metrics is scraped.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name,
+        documentation,
+        labelnames=(),
+        collect: Callable[[], Iterable[Tuple[LabelValues, float]]] | None = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._collect = collect
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        if self._collect is not None:
+            try:
+                items = list(self._collect())
+            except Exception as e:
+                logger.warning("metrics: collecting %s failed: %s", self.name, e)
+                items = []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        lines = self.header()
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    """
+    Fixed buckets; one preallocated count list per label set, so observe()
+    is a dict lookup, a bisect and three additions.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # per label set: [bucket counts..., +Inf count, sum]
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[idx] += 1
+            series[-1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        lines = self.header()
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            le = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+            plain = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{plain} {series[-1]}")
+            lines.append(f"{self.name}_count{plain} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_labels", "_started")
+
+    def __init__(self, histogram: Histogram, labels: LabelValues):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._histogram.observe(time.perf_counter() - self._started, *self._labels)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- Bot metrics ---
+
+WEBHOOK_SECONDS = REGISTRY.register(
+    Histogram(
+        "bot_webhook_seconds",
+        "Telegram webhook handling time, including the reply.",
+        ("update_type", "route", "outcome"),
+    )
+)
+RENDER_SECONDS = REGISTRY.register(
+    Histogram(
+        "bot_render_seconds",
+        "Time spent rendering a chat output template.",
+        ("template",),
+    )
+)
+TELEGRAM_API_SECONDS = REGISTRY.register(
+    Histogram(
+        "bot_telegram_api_seconds",
+        "Bot API call time per method.",
+        ("method", "outcome"),
+    )
+)
+DB_QUERY_SECONDS = REGISTRY.register(
+    Histogram(
+        "bot_db_query_seconds",
+        "Database statement time per statement kind.",
+        ("operation",),
+    )
+)
+TEMPLATE_CACHE = REGISTRY.register(
+    Counter(
+        "bot_template_cache_total",
+        "Chat output template cache lookups (hit rate = hit / total).",
+        ("result",),
+    )
+)
+EVENT_LOOP_LAG_SECONDS = REGISTRY.register(
+    Gauge(
+        "bot_event_loop_lag_seconds",
+        "How late the last event loop lag probe woke up.",
+    )
+)
+
+
+def register_db_pool_gauges(collect: Callable[[], Dict[str, float]]) -> None:
+    """Expose the numeric fields of a pool snapshot as bot_db_pool{field=...}."""
+
+    def _collect():
+        for key, value in collect().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield (key,), value
+
+    REGISTRY.register(
+        Gauge("bot_db_pool", "Database connection pool state.", ("field",), _collect)
+    )
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Sleep `interval` in a loop; any extra delay is time the loop was blocked."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.set(max(loop.time() - started - interval, 0.0))
@@ -0,0 +1,29 @@
+import re
+from typing import Optional
+
+# users.phone_number holds this form only: E.164, Iranian mobile numbers
+E164_IRAN_MOBILE = re.compile(r"^\+989\d{9}$")
+
+# Persian (U+06F0..) and Arabic-Indic (U+0660..) digits, as typed on a
+# Persian keyboard, to ASCII
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+_SEPARATORS = re.compile(r"[\s\-().\u200c\u200e\u200f]")  # and ZWNJ, LRM, RLM
+# national (09…), international (+989… / 00989…) and bare country code (989…)
+_IRAN_MOBILE = re.compile(r"^(?:\+98|0098|98|0)(9\d{9})$")
+
+
+def normalize_phone(raw: Optional[str]) -> Optional[str]:
+    """
+    The canonical key of an Iranian mobile number ("+989123456789"), None
+    when it isn't one. Call it once where the number comes in; everything
+    past that point compares canonical strings.
+    """
+    if not isinstance(raw, str):
+        return None
+    digits = _SEPARATORS.sub("", raw.translate(_DIGITS))
+    match = _IRAN_MOBILE.fullmatch(digits)
+    return f"+98{match.group(1)}" if match else None
+
+
+def is_canonical_phone(phone: Optional[str]) -> bool:
+    return isinstance(phone, str) and E164_IRAN_MOBILE.fullmatch(phone) is not None
@@ -1,14 +1,18 @@
+from __future__ import annotations
+
 import pyotp
 import jwt
 import time
 import secrets
 
-from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError, InvalidHash
-from typing import Any, Dict
+from functools import lru_cache
+from typing import Any, Dict, TYPE_CHECKING
 
 from src.config import settings
 
+if TYPE_CHECKING:
+    from argon2 import PasswordHasher
+
 
 class JWTError(ValueError):
     pass
@@ -17,6 +21,21 @@ class JWTError(ValueError):
 #! add error handling later
 
 
+@lru_cache(maxsize=1)
+def get_password_hasher() -> PasswordHasher:
+    """
+    Built on first use: argon2 is only needed by the admin auth endpoints,
+    so it stays out of the bot's startup path.
+    """
+    from argon2 import PasswordHasher
+
+    return PasswordHasher(
+        time_cost=3,  # iterations
+        memory_cost=65536,  # 64 MB
+        parallelism=2,
+    )
+
+
 def hash_password(ph: PasswordHasher, raw_password: str) -> str:
     if not isinstance(raw_password, str) or raw_password == "":
         raise ValueError("Invalid password.")
@@ -26,6 +45,8 @@ def hash_password(ph: PasswordHasher, raw_password: str) -> str:
 def verify_password(
     ph: PasswordHasher, raw_password: str, hashed_password: str
 ) -> bool:
+    from argon2.exceptions import VerifyMismatchError, InvalidHash
+
     try:
         return ph.verify(hashed_password, raw_password)
     except (VerifyMismatchError, InvalidHash):
@@ -0,0 +1,282 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import httpx
+
+from src.config import logger, settings
+
+SERVICE_NAME = "telegram-star-bot"
+
+# OTLP status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str | None
+    start_ns: int
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: int = STATUS_OK
+    status_message: str = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # internal
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status, "message": self.status_message},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_payload(spans: List[Span]) -> Dict[str, Any]:
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "src.core.tracing"},
+                        "spans": [s.to_otlp() for s in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+# --- Exporters ---
+
+
+class FileExporter:
+    """One OTLP/JSON document per line, readable by the collector's otlpjsonfile receiver."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(_otlp_payload(spans), separators=(",", ":")) + "\n")
+
+
+class OTLPHttpExporter:
+    """OTLP/HTTP with JSON encoding, e.g. http://localhost:4318/v1/traces"""
+
+    def __init__(self, endpoint: str) -> None:
+        self.endpoint = endpoint
+        self.client = httpx.Client(timeout=httpx.Timeout(5.0, connect=2.0))
+
+    def export(self, spans: List[Span]) -> None:
+        resp = self.client.post(self.endpoint, json=_otlp_payload(spans))
+        resp.raise_for_status()
+
+
+class BatchSpanProcessor:
+    """
+    Finished spans are queued and exported in batches from a daemon thread,
+    so the request path never waits on the file or the collector.
+    When the queue is full new spans are dropped, not blocked on.
+    """
+
+    def __init__(
+        self, exporter, max_queue: int = 10000, batch_size: int = 512, interval: float = 2.0
+    ) -> None:
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(
+            target=self._worker, name="span-exporter", daemon=True
+        )
+        self._thread.start()
+
+    def on_end(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self) -> List[Span]:
+        batch: List[Span] = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self) -> None:
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            try:
+                self.exporter.export(batch)
+            except Exception as e:
+                logger.warning("exporting %s spans failed: %s", len(batch), e)
+
+
+# --- Tracer ---
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+def _build_processor() -> BatchSpanProcessor | None:
+    if settings.tracing_exporter == "file":
+        return BatchSpanProcessor(FileExporter(settings.tracing_file))
+    if settings.tracing_exporter == "otlp":
+        return BatchSpanProcessor(OTLPHttpExporter(settings.tracing_otlp_endpoint))
+    return None
+
+
+_processor: BatchSpanProcessor | None = None
+_processor_pid: int | None = None
+
+
+def _get_processor() -> BatchSpanProcessor | None:
+    # built lazily (and again after a fork) since the exporter owns a thread
+    global _processor, _processor_pid
+    if settings.tracing_exporter == "none":
+        return None
+    if _processor is None or _processor_pid != os.getpid():
+        _processor = _build_processor()
+        _processor_pid = os.getpid()
+    return _processor
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """
+    Root span of a trace (one per Telegram update). Sampling is decided here
+    once; when a trace is not sampled the children below are no-ops.
+    """
+    processor = _get_processor()
+    if processor is None or random.random() >= settings.tracing_sample_ratio:
+        token = _current_span.set(None)
+        try:
+            yield None
+        finally:
+            _current_span.reset(token)
+        return
+
+    span = Span(
+        name=name,
+        trace_id=os.urandom(16).hex(),
+        span_id=os.urandom(8).hex(),
+        parent_span_id=None,
+        start_ns=time.time_ns(),
+        attributes=attributes,
+    )
+    with _activate(span, processor):
+        yield span
+
+
+@contextmanager
+def start_span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """Child span of the current one; a no-op outside of a sampled trace."""
+    parent = _current_span.get()
+    processor = _processor
+    if parent is None or processor is None:
+        yield None
+        return
+
+    span = Span(
+        name=name,
+        trace_id=parent.trace_id,
+        span_id=os.urandom(8).hex(),
+        parent_span_id=parent.span_id,
+        start_ns=time.time_ns(),
+        attributes=attributes,
+    )
+    with _activate(span, processor):
+        yield span
+
+
+@contextmanager
+def _activate(span: Span, processor: BatchSpanProcessor) -> Iterator[Span]:
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.status = STATUS_ERROR
+        span.status_message = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.end_ns = time.time_ns()
+        _current_span.reset(token)
+        processor.on_end(span)
+
+
+def traced(name: str | None = None) -> Callable:
+    """Wrap a sync or async function in a child span named after it."""
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__.removeprefix('src.')}.{func.__qualname__}"
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return await func(*args, **kwargs)
+                with start_span(span_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with start_span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
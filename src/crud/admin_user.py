@@ -5,8 +5,10 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from src.models import AdminUser
 from src.config import logger
+from src.core.tracing import traced
 
 
+@traced()
 def create_admin_user(
     db: Session,
     *,
@@ -32,6 +34,7 @@ def create_admin_user(
         raise
 
 
+@traced()
 def update_admin_user(
     db: Session, user_id: int, commit: bool = True, **fields: Any
 ) -> AdminUser | None:
@@ -58,6 +61,7 @@ def update_admin_user(
         raise
 
 
+@traced()
 def get_admin_user(db: Session, id: int) -> AdminUser:
     try:
         return db.get(AdminUser, id)
@@ -66,6 +70,7 @@ def get_admin_user(db: Session, id: int) -> AdminUser:
         raise
 
 
+@traced()
 def get_admin_user_by_phone(db: Session, phone_number: str) -> AdminUser | None:
     try:
         return (
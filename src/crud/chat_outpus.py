@@ -1,19 +1,28 @@
-from typing import Any
+from typing import Any, Dict
 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.exc import SQLAlchemyError
 
 from src.models import ChatOutput, Button, ButtonIndex, Placeholder
-from src.models.chat_outputs import PlaceHolderTypes
+from src.models.chat_outputs import BASE_LOCALE, PlaceHolderTypes
 
 from src.config import logger
+from src.core.tracing import traced
 
 
+@traced()
 def create_button(
-    db: Session, name: str, text: str, callback_data: str, commit: bool = True
+    db: Session,
+    name: str,
+    text: str,
+    callback_data: str,
+    locale: str = BASE_LOCALE,
+    commit: bool = True,
 ):
     try:
-        button = Button(name=name, text=text, callback_data=callback_data)
+        button = Button(
+            name=name, text=text, callback_data=callback_data, locale=locale
+        )
         db.add(button)
         db.flush()
         if commit:
@@ -26,6 +35,7 @@ def create_button(
         raise
 
 
+@traced()
 def create_button_index(
     db: Session, chat_output_id: int, button_id: int, number: int, commit: bool = True
 ):
@@ -45,6 +55,7 @@ def create_button_index(
         raise
 
 
+@traced()
 def create_placeholder(
     db: Session,
     chat_output_id: int,
@@ -65,9 +76,12 @@ def create_placeholder(
         logger.error(f"create_placeholder crud operation failed:{e}")
 
 
-def create_chat_output(db: Session, name: str, text: str, commit: bool = True):
+@traced()
+def create_chat_output(
+    db: Session, name: str, text: str, locale: str = BASE_LOCALE, commit: bool = True
+):
     try:
-        chat_output = ChatOutput(name=name, text=text)
+        chat_output = ChatOutput(name=name, text=text, locale=locale)
         db.add(chat_output)
         db.flush()
         if commit:
@@ -80,22 +94,52 @@ def create_chat_output(db: Session, name: str, text: str, commit: bool = True):
         raise
 
 
-def get_chat_output_by_name(db: Session, name: str):
+@traced()
+def get_chat_output_by_name(db: Session, name: str, locale: str = BASE_LOCALE):
     try:
-        return db.query(ChatOutput).filter(ChatOutput.name == name).first()
+        return (
+            db.query(ChatOutput)
+            .filter(ChatOutput.name == name, ChatOutput.locale == locale)
+            .first()
+        )
     except SQLAlchemyError as e:
         logger.error(f"get_chat_output_by_name crud operatioin failed:{e}")
         raise
 
 
-def get_button_by_name(db: Session, name: str):
+@traced()
+def get_chat_output_variants(db: Session, name: str) -> Dict[str, ChatOutput]:
+    """Every locale's variant of an output, {locale: output}, in one query."""
+    try:
+        outputs = (
+            db.query(ChatOutput)
+            .filter(ChatOutput.name == name)
+            .options(
+                selectinload(ChatOutput.placeholders),
+                selectinload(ChatOutput.button_indexes),
+            )
+            .all()
+        )
+        return {output.locale: output for output in outputs}
+    except SQLAlchemyError as e:
+        logger.error(f"get_chat_output_variants crud operatioin failed:{e}")
+        raise
+
+
+@traced()
+def get_button_by_name(db: Session, name: str, locale: str = BASE_LOCALE):
     try:
-        return db.query(Button).filter(Button.name == name).first()
+        return (
+            db.query(Button)
+            .filter(Button.name == name, Button.locale == locale)
+            .first()
+        )
     except SQLAlchemyError as e:
         logger.error(f"get_button_by_name crud operatioin failed:{e}")
         raise
 
 
+@traced()
 def get_placeholder_by_name(db: Session, name: str):
     try:
         return db.query(Placeholder).filter(Placeholder.name == name).first()
@@ -104,13 +148,20 @@ def get_placeholder_by_name(db: Session, name: str):
         raise
 
 
+@traced()
 def update_chat_output_by_name(
-    db: Session, name: str, commit: bool = True, **fields: Any
+    db: Session,
+    name: str,
+    locale: str = BASE_LOCALE,
+    commit: bool = True,
+    **fields: Any,
 ) -> ChatOutput:
     try:
-        output = db.query(ChatOutput).filter(ChatOutput.name == name).first()
+        output = get_chat_output_by_name(db=db, name=name, locale=locale)
         if output is None:
-            logger.info(f"update_chat_output_by_name: no output by this name: {name}")
+            logger.info(
+                f"update_chat_output_by_name: no output by this name: {name} ({locale})"
+            )
             return None
 
         for key, value in fields.items():
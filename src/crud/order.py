@@ -1,18 +1,23 @@
 from __future__ import annotations
 
+import hashlib
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from decimal import Decimal
 
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select, text, update
 
 from src.config import logger
-from src.models.order import Order, OrderItem, OrderStatus
-from src.models.products import ProductVersion
+from src.core.tracing import traced
+from src.db.routing import read_replica
+from src.db.dialect import dialect_insert
+from src.models.order import ORDER_TRANSITIONS, Order, OrderItem, OrderStatus
+from src.models.products import Product, ProductVersion
+from src.crud.reports import rollup_paid_order
 from typing import Sequence, Union, Any
-from src.services.pricing import get_version_price
+from src.services.pricing import get_version_prices
 
 
 # --- Small input DTOs (optional but clean) ---
@@ -24,6 +29,32 @@ class CreateOrderItemIn:
     quantity: int = 1
 
 
+@dataclass(frozen=True)
+class TransitionResult:
+    """
+    Outcome of transition_order. applied: this call (or, when replayed, an
+    earlier call with the same idempotency key) moved the order to the
+    requested status. Otherwise status/version are what the order holds now.
+    """
+
+    order_id: int
+    status: OrderStatus
+    version: int
+    applied: bool
+    replayed: bool = False
+    user_id: int | None = None
+    paid_at: datetime | None = None
+
+
+@dataclass(frozen=True)
+class OrderSummary:
+    id: int
+    status: OrderStatus
+    total_amount: Decimal | None
+    created_at: datetime
+    items: str  # "Premium Stars Pack version 1 ×2, ..."
+
+
 # --- Helpers ---
 
 
@@ -39,9 +70,66 @@ def _as_decimal(x) -> Decimal:
     return Decimal(str(x))
 
 
+def _load_versions(
+    db: Session, items: Sequence[CreateOrderItemIn]
+) -> dict[int, ProductVersion]:
+    if not items:
+        raise ValueError("items must not be empty")
+    pv_ids = [i.product_version_id for i in items]
+    stmt = (
+        select(ProductVersion)
+        .where(ProductVersion.id.in_(pv_ids))
+        .options(joinedload(ProductVersion.product))
+    )
+    versions_by_id = {v.id: v for v in db.execute(stmt).scalars().all()}
+    missing = [pv_id for pv_id in pv_ids if pv_id not in versions_by_id]
+    if missing:
+        raise ValueError(f"Unknown product_version_id(s): {missing}")
+    return versions_by_id
+
+
+def _add_items(
+    db: Session,
+    order: Order,
+    items: Sequence[CreateOrderItemIn],
+    versions_by_id: dict[int, ProductVersion],
+) -> None:
+    """Add the order lines, every one priced from the same quote, and set the total."""
+    prices = get_version_prices(versions_by_id.values(), db)
+    total = Decimal("0")
+    for req in items:
+        qty = req.quantity
+        if qty <= 0:
+            raise ValueError("quantity must be > 0")
+        unit_price = prices[req.product_version_id]
+        db.add(
+            OrderItem(
+                order_id=order.id,
+                product_version_id=req.product_version_id,
+                unit_price=unit_price,
+                quantity=qty,
+            )
+        )
+        total += unit_price * qty
+    order.total_amount = total
+
+
+def _dedupe_key(user_id: int, items: Sequence[CreateOrderItemIn]) -> str:
+    """Same user, same versions and quantities -> same key, in any item order."""
+    lines = ",".join(
+        f"{pv_id}x{qty}"
+        for pv_id, qty in sorted((i.product_version_id, i.quantity) for i in items)
+    )
+    key = f"{user_id}:{lines}"
+    if len(key) > 128:
+        key = f"{user_id}:{hashlib.sha256(lines.encode()).hexdigest()}"
+    return key
+
+
 # --- CRUD ---
 
 
+@traced()
 def create_order(
     db: Session,
     *,
@@ -75,6 +163,7 @@ def create_order(
         raise
 
 
+@traced()
 def create_order_item(
     db: Session,
     *,
@@ -121,6 +210,7 @@ def create_order_item(
         raise
 
 
+@traced()
 def create_order_with_items(
     db: Session,
     *,
@@ -138,18 +228,8 @@ def create_order_with_items(
       - computes total_amount
     """
     try:
-        if not items:
-            raise ValueError("items must not be empty")
-
-        # 1) Fetch all requested ProductVersions in one query
-        pv_ids = [i.product_version_id for i in items]
-        stmt = select(ProductVersion).where(ProductVersion.id.in_(pv_ids))
-        versions = db.execute(stmt).scalars().all()
-
-        versions_by_id = {v.id: v for v in versions}
-        missing = [pv_id for pv_id in pv_ids if pv_id not in versions_by_id]
-        if missing:
-            raise ValueError(f"Unknown product_version_id(s): {missing}")
+        # 1) Fetch all requested ProductVersions (and their products) in one query
+        versions_by_id = _load_versions(db, items)
 
         # 2) Create the order
         order = Order(
@@ -163,25 +243,7 @@ def create_order_with_items(
         db.flush()  # order.id available now
 
         # 3) Create items + compute total
-        total = Decimal("0")
-        for req in items:
-            pv = versions_by_id[req.product_version_id]
-            qty = req.quantity
-            if qty <= 0:
-                raise ValueError("quantity must be > 0")
-
-            unit_price = get_version_price(version=pv, db=db)
-            db.add(
-                OrderItem(
-                    order_id=order.id,
-                    product_version_id=pv.id,
-                    unit_price=unit_price,
-                    quantity=qty,
-                )
-            )
-            total += unit_price * qty
-
-        order.total_amount = total
+        _add_items(db, order, items, versions_by_id)
 
         if commit:
             db.commit()
@@ -195,6 +257,71 @@ def create_order_with_items(
         raise
 
 
+@traced()
+def get_or_create_pending_order(
+    db: Session,
+    *,
+    user_id: int,
+    items: Sequence[CreateOrderItemIn],
+    commit: bool = True,
+) -> tuple[Order, bool]:
+    """
+    The user's open order for exactly these items if there is one, a new one
+    otherwise; returns (order, reused). At most one open order per dedupe key
+    exists (partial unique index), and the insert is ON CONFLICT DO NOTHING:
+    of two presses racing here one inserts and the other waits for it and
+    then reuses that order. An open order is never expired here, it may be
+    in the middle of a payment; services.order_expiry expires those past
+    ORDER_PENDING_TTL.
+    """
+    try:
+        versions_by_id = _load_versions(db, items)
+        key = _dedupe_key(user_id, items)
+        now = _utcnow()
+        for _ in range(3):
+            open_order = db.scalars(
+                select(Order).where(
+                    Order.dedupe_key == key,
+                    Order.status == OrderStatus.WAITING_FOR_PAYMENT,
+                )
+            ).first()
+            if open_order is not None:
+                return open_order, True
+
+            stmt = (
+                dialect_insert(db, Order)
+                .values(
+                    user_id=user_id,
+                    status=OrderStatus.WAITING_FOR_PAYMENT,
+                    created_at=now,
+                    total_amount=Decimal("0"),
+                    dedupe_key=key,
+                )
+                .on_conflict_do_nothing(
+                    index_elements=[Order.dedupe_key],
+                    index_where=text("status = 'WAITING_FOR_PAYMENT'"),
+                )
+                .returning(Order)
+            )
+            order = db.scalars(stmt).first()
+            if order is None:
+                continue  # lost the race, the winner's order is open now
+
+            _add_items(db, order, items, versions_by_id)
+            if commit:
+                db.commit()
+                db.refresh(order)
+            else:
+                db.flush()  # the caller may read the lines back before committing
+            return order, False
+        raise RuntimeError(f"no open order for {key} after retrying")
+    except (SQLAlchemyError, ValueError, RuntimeError) as e:
+        db.rollback()
+        logger.error("get_or_create_pending_order failed: %s", e)
+        raise
+
+
+@traced()
 def delete_order(db: Session, order_id: Union[str, int]) -> bool:
     try:
         order = db.get(Order, int(order_id))
@@ -212,6 +339,7 @@ def delete_order(db: Session, order_id: Union[str, int]) -> bool:
         return False
 
 
+@traced()
 def update_order(db: Session, order_id: Union[str, int], **fields: Any) -> Order | None:
     try:
         order = db.get(Order, int(order_id))
@@ -221,6 +349,9 @@ def update_order(db: Session, order_id: Union[str, int], **fields: Any) -> Order
             return None
 
         for key, value in fields.items():
+            if key in ("status", "version", "last_transition_key"):
+                # a plain write here would race with concurrent transitions
+                raise ValueError(f"use transition_order to change '{key}'")
             if hasattr(order, key):
                 setattr(order, key, value)
             else:
@@ -236,6 +367,126 @@ def update_order(db: Session, order_id: Union[str, int], **fields: Any) -> Order
         raise
 
 
+def _sources(to_status: OrderStatus) -> list[OrderStatus]:
+    return [src for src, targets in ORDER_TRANSITIONS.items() if to_status in targets]
+
+
+@traced()
+def transition_order(
+    db: Session,
+    order_id: Union[str, int],
+    to_status: OrderStatus,
+    *,
+    idempotency_key: str | None = None,
+    expected_version: int | None = None,
+    commit: bool = True,
+) -> TransitionResult | None:
+    """
+    Move an order to `to_status` with one conditional UPDATE ... RETURNING:
+    the row only changes if its current status may go to `to_status` (and,
+    when given, its version still is `expected_version`), so of concurrent
+    confirm / cancel / expire calls exactly one wins and no lock is held
+    past the statement. A caller retrying with the same idempotency key
+    gets the earlier result back (replayed) instead of a conflict.
+    Returns None when the order doesn't exist.
+    """
+    try:
+        to_status = OrderStatus(to_status)
+        values: dict[str, Any] = {
+            "status": to_status,
+            "version": Order.version + 1,
+            "last_transition_key": idempotency_key,
+        }
+        now = _utcnow()
+        if to_status == OrderStatus.PAID:
+            values["paid_at"] = now
+        stmt = (
+            update(Order)
+            .where(Order.id == int(order_id), Order.status.in_(_sources(to_status)))
+            .values(**values)
+            .returning(Order.id, Order.status, Order.version, Order.user_id, Order.paid_at)
+            .execution_options(synchronize_session=False)
+        )
+        if expected_version is not None:
+            stmt = stmt.where(Order.version == expected_version)
+        row = db.execute(stmt).first()
+        if row is not None:
+            if to_status == OrderStatus.PAID:
+                # same transaction: counted once, and only if the payment sticks
+                rollup_paid_order(db, order_id=row.id, day=now.date())
+            if commit:
+                db.commit()
+            return TransitionResult(
+                order_id=row.id,
+                status=row.status,
+                version=row.version,
+                applied=True,
+                user_id=row.user_id,
+                paid_at=row.paid_at,
+            )
+
+        # lost the race, a retry, or not allowed from here: say which
+        row = db.execute(
+            select(
+                Order.id,
+                Order.status,
+                Order.version,
+                Order.user_id,
+                Order.paid_at,
+                Order.last_transition_key,
+            ).where(Order.id == int(order_id))
+        ).first()
+        if row is None:
+            logger.info("transition_order: no order with id=%s", order_id)
+            return None
+        replayed = (
+            idempotency_key is not None
+            and row.last_transition_key == idempotency_key
+            and row.status == to_status
+        )
+        return TransitionResult(
+            order_id=row.id,
+            status=row.status,
+            version=row.version,
+            applied=replayed,
+            replayed=replayed,
+            user_id=row.user_id,
+            paid_at=row.paid_at,
+        )
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("transition_order failed: %s", e)
+        raise
+
+
+@traced()
+def expire_orders(db: Session, *, created_before: datetime) -> list[int]:
+    """Expire every order still waiting for payment that was created before the cutoff."""
+    try:
+        stmt = (
+            update(Order)
+            .where(
+                Order.status == OrderStatus.WAITING_FOR_PAYMENT,
+                Order.created_at < created_before,
+            )
+            .values(
+                status=OrderStatus.EXPIRED,
+                version=Order.version + 1,
+                last_transition_key=None,
+            )
+            .returning(Order.id)
+            .execution_options(synchronize_session=False)
+        )
+        ids = list(db.execute(stmt).scalars())
+        db.commit()
+        return ids
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("expire_orders failed: %s", e)
+        raise
+
+
+@traced()
 def get_order(db: Session, order_id: Union[str, int]):
     try:
         order = db.get(Order, int(order_id))
@@ -244,3 +495,67 @@ def get_order(db: Session, order_id: Union[str, int]):
         db.rollback()
         logger.error(f"failed to fetch the order:{e}")
         raise
+
+
+@traced()
+def list_user_orders(
+    db: Session,
+    *,
+    user_id: int,
+    before_id: int | None = None,
+    limit: int = 5,
+) -> tuple[list[OrderSummary], int | None]:
+    """
+    A page of the user's orders, newest first, and the cursor of the next
+    (older) page, None on the last one. Keyset pagination on (user_id, id):
+    every page is an index range scan, however far back the user pages.
+    """
+    try:
+        page = (
+            select(Order.id, Order.status, Order.total_amount, Order.created_at)
+            .where(Order.user_id == user_id)
+            .order_by(Order.id.desc())
+            .limit(limit + 1)  # one extra row tells whether there is a next page
+        )
+        if before_id is not None:
+            page = page.where(Order.id < before_id)
+        with read_replica(db):
+            rows = db.execute(page).all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+
+            items: dict[int, list[str]] = {}
+            if rows:
+                item_rows = db.execute(
+                    select(
+                        OrderItem.order_id,
+                        Product.name,
+                        ProductVersion.version_name,
+                        OrderItem.quantity,
+                    )
+                    .join(ProductVersion, ProductVersion.id == OrderItem.product_version_id)
+                    .join(Product, Product.id == ProductVersion.product_id)
+                    .where(OrderItem.order_id.in_([row.id for row in rows]))
+                    .order_by(OrderItem.order_id, OrderItem.id)
+                )
+                for order_id, product_name, version_name, quantity in item_rows:
+                    label = f"{product_name} {version_name}"
+                    if quantity != 1:
+                        label += f" ×{quantity}"
+                    items.setdefault(order_id, []).append(label)
+
+        summaries = [
+            OrderSummary(
+                id=row.id,
+                status=row.status,
+                total_amount=row.total_amount,
+                created_at=row.created_at,
+                items=", ".join(items.get(row.id, [])),
+            )
+            for row in rows
+        ]
+        next_before = summaries[-1].id if has_more else None
+        return summaries, next_before
+    except SQLAlchemyError as e:
+        logger.error(f"list_user_orders failed:{e}")
+        raise
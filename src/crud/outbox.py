@@ -0,0 +1,201 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, aliased
+
+from src.config import logger
+from src.core.tracing import traced
+from src.models.outbox import OutboxMessage, OutboxStatus
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@traced()
+def enqueue_message(
+    db: Session,
+    *,
+    method: str,
+    payload: Dict[str, Any],
+    chat_id: Optional[int] = None,
+    commit: bool = False,
+) -> OutboxMessage:
+    """
+    Add a Bot API call to the session. Not committed by default: it is meant
+    to go out with the caller's own transaction.
+    """
+    try:
+        now = _utcnow()
+        message = OutboxMessage(
+            chat_id=chat_id,
+            method=method,
+            payload=payload,
+            status=OutboxStatus.PENDING,
+            attempts=0,
+            available_at=now,
+            created_at=now,
+        )
+        db.add(message)
+        if commit:
+            db.commit()
+        return message
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("enqueue_message failed: %s", e)
+        raise
+
+
+@traced()
+def claim_messages(
+    db: Session, *, limit: int, lease_seconds: float
+) -> List[Dict[str, Any]]:
+    """
+    Take up to `limit` due messages in one statement. Rows other workers are
+    claiming right now are skipped, not waited for (SKIP LOCKED), and rows
+    stuck in SENDING for longer than the lease (a worker died) are taken over.
+    Only a chat's oldest unsent message is due: a later one waits until the
+    earlier ones are sent or failed, whoever holds or retries them.
+    """
+    try:
+        now = _utcnow()
+        lease_expired = now - timedelta(seconds=lease_seconds)
+        earlier = aliased(OutboxMessage)
+        earlier_unsent = (
+            select(earlier.id)
+            .where(
+                earlier.chat_id == OutboxMessage.chat_id,
+                earlier.id < OutboxMessage.id,
+                earlier.status.in_([OutboxStatus.PENDING, OutboxStatus.SENDING]),
+            )
+            .exists()
+        )
+        due = (
+            select(OutboxMessage.id)
+            .where(
+                or_(
+                    (OutboxMessage.status == OutboxStatus.PENDING)
+                    & (OutboxMessage.available_at <= now),
+                    (OutboxMessage.status == OutboxStatus.SENDING)
+                    & (OutboxMessage.claimed_at < lease_expired),
+                ),
+                ~earlier_unsent,
+            )
+            .order_by(OutboxMessage.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(due.scalar_subquery()))
+            .values(
+                status=OutboxStatus.SENDING,
+                claimed_at=now,
+                attempts=OutboxMessage.attempts + 1,
+            )
+            .returning(
+                OutboxMessage.id,
+                OutboxMessage.chat_id,
+                OutboxMessage.method,
+                OutboxMessage.payload,
+                OutboxMessage.attempts,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        rows = [dict(row._mapping) for row in db.execute(stmt)]
+        db.commit()
+        return sorted(rows, key=lambda r: r["id"])
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("claim_messages failed: %s", e)
+        raise
+
+
+@traced()
+def mark_sent(db: Session, ids: Sequence[int]) -> None:
+    if not ids:
+        return
+    try:
+        db.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(ids))
+            .values(status=OutboxStatus.SENT, sent_at=_utcnow(), last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("mark_sent failed: %s", e)
+        raise
+
+
+@traced()
+def prune_sent(db: Session, *, sent_before: datetime, limit: int) -> int:
+    """
+    Delete up to `limit` messages sent before the cutoff, oldest first;
+    returns how many. Failed ones are kept for inspection.
+    """
+    try:
+        old = (
+            select(OutboxMessage.id)
+            .where(
+                OutboxMessage.status == OutboxStatus.SENT,
+                OutboxMessage.sent_at < sent_before,
+            )
+            .order_by(OutboxMessage.id)
+            .limit(limit)
+        )
+        result = db.execute(
+            delete(OutboxMessage)
+            .where(OutboxMessage.id.in_(old.scalar_subquery()))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("prune_sent failed: %s", e)
+        raise
+
+
+@traced()
+def reschedule_message(
+    db: Session, id: int, *, delay: float, error: str, refund_attempt: bool = False
+) -> None:
+    """Back to PENDING after `delay`; refund_attempt undoes the claim's attempt count."""
+    try:
+        db.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id == id)
+            .values(
+                status=OutboxStatus.PENDING,
+                available_at=_utcnow() + timedelta(seconds=delay),
+                claimed_at=None,
+                attempts=OutboxMessage.attempts - (1 if refund_attempt else 0),
+                last_error=error[:2000],
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("reschedule_message failed: %s", e)
+        raise
+
+
+@traced()
+def mark_failed(db: Session, id: int, *, error: str) -> None:
+    try:
+        db.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id == id)
+            .values(status=OutboxStatus.FAILED, last_error=error[:2000])
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("mark_failed failed: %s", e)
+        raise
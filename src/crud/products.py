@@ -3,27 +3,36 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
 from src.models import Product, ProductVersion
+from src.db.routing import read_replica
 from src.config import logger
+from src.core.tracing import traced
 
 
+@traced()
 def get_products(
     db: Session, display_in_bot: Optional[bool] = True
 ) -> List[Product] | None:
     try:
-        return db.query(Product).filter(Product.display_in_bot == display_in_bot).all()
+        with read_replica(db):
+            return (
+                db.query(Product).filter(Product.display_in_bot == display_in_bot).all()
+            )
     except SQLAlchemyError as e:
         logger.error(f"get_products at crud/products failed:{e}")
         raise e
 
 
+@traced()
 def get_product_by_id(db: Session, id: int) -> Product | None:
     try:
-        return db.get(Product, id)
+        with read_replica(db):
+            return db.get(Product, id)
     except SQLAlchemyError as e:
         logger.error(f"get_product_by_id failed:{e}")
         raise
 
 
+@traced()
 def get_product_version_by_id(db: Session, id: int) -> ProductVersion | None:
     try:
         return db.get(ProductVersion, id)
@@ -0,0 +1,116 @@
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Date, Integer, func, literal, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from src.config import logger
+from src.core.tracing import traced
+from src.db.routing import read_replica
+from src.db.dialect import dialect_insert
+from src.models import OrderItem, Product, ProductVersion, SalesDailyRollup
+
+
+@traced()
+def rollup_paid_order(db: Session, *, order_id: int, day: date) -> None:
+    """
+    Add a just-paid order to the daily rollups, one upsert for all its items.
+    Not committed: it belongs to the transaction of the PAID transition, so
+    an order is counted exactly once, together with its status change.
+    """
+    try:
+        per_version = (
+            select(
+                literal(day, Date),
+                OrderItem.product_version_id,
+                literal(1, Integer),
+                func.sum(OrderItem.quantity),
+                func.sum(OrderItem.unit_price * OrderItem.quantity),
+            )
+            .where(OrderItem.order_id == order_id)
+            .group_by(OrderItem.product_version_id)
+        )
+        stmt = dialect_insert(db, SalesDailyRollup).from_select(
+            ["day", "product_version_id", "orders_count", "items_count", "revenue"],
+            per_version,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SalesDailyRollup.day, SalesDailyRollup.product_version_id],
+            set_={
+                "orders_count": SalesDailyRollup.orders_count
+                + stmt.excluded.orders_count,
+                "items_count": SalesDailyRollup.items_count + stmt.excluded.items_count,
+                "revenue": SalesDailyRollup.revenue + stmt.excluded.revenue,
+            },
+        )
+        db.execute(stmt)
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("rollup_paid_order failed: %s", e)
+        raise
+
+
+@traced()
+def get_sales_report(
+    db: Session,
+    *,
+    start: date,
+    end: date,
+    product_version_id: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Paid sales per product version between start and end (inclusive), from the rollups."""
+    try:
+        stmt = (
+            select(
+                SalesDailyRollup.product_version_id,
+                Product.name.label("product_name"),
+                ProductVersion.version_name,
+                func.sum(SalesDailyRollup.orders_count).label("orders_count"),
+                func.sum(SalesDailyRollup.items_count).label("items_count"),
+                func.sum(SalesDailyRollup.revenue).label("revenue"),
+            )
+            .join(
+                ProductVersion,
+                ProductVersion.id == SalesDailyRollup.product_version_id,
+            )
+            .join(Product, Product.id == ProductVersion.product_id)
+            .where(SalesDailyRollup.day >= start, SalesDailyRollup.day <= end)
+            .group_by(
+                SalesDailyRollup.product_version_id,
+                Product.name,
+                ProductVersion.version_name,
+            )
+            .order_by(func.sum(SalesDailyRollup.revenue).desc())
+        )
+        if product_version_id is not None:
+            stmt = stmt.where(SalesDailyRollup.product_version_id == product_version_id)
+        with read_replica(db):
+            return [dict(row._mapping) for row in db.execute(stmt)]
+    except SQLAlchemyError as e:
+        logger.error(f"get_sales_report failed:{e}")
+        raise
+
+
+@traced()
+def get_daily_sales(db: Session, *, start: date, end: date) -> List[Dict[str, Any]]:
+    """
+    Items sold and revenue per day between start and end (inclusive). No
+    order count: the rollups count an order once per version it contains.
+    """
+    try:
+        stmt = (
+            select(
+                SalesDailyRollup.day,
+                func.sum(SalesDailyRollup.items_count).label("items_count"),
+                func.sum(SalesDailyRollup.revenue).label("revenue"),
+            )
+            .where(SalesDailyRollup.day >= start, SalesDailyRollup.day <= end)
+            .group_by(SalesDailyRollup.day)
+            .order_by(SalesDailyRollup.day)
+        )
+        with read_replica(db):
+            return [dict(row._mapping) for row in db.execute(stmt)]
+    except SQLAlchemyError as e:
+        logger.error(f"get_daily_sales failed:{e}")
+        raise
@@ -2,10 +2,13 @@ from typing import Optional, Any
 
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import select
+from sqlalchemy import select, update
+from sqlalchemy.orm.attributes import set_committed_value
 
 from src.models import User, Chat
 from src.config import logger
+from src.core.phone import is_canonical_phone
+from src.core.tracing import traced
 
 
 # --------------------
@@ -13,6 +16,7 @@ from src.config import logger
 # --------------------
 
 
+@traced()
 def create_user(db: Session, *, phone_number: Optional[str] = None) -> User:
     """
     Create a new User. Telegram chat(s) are created separately and linked via Chat.user_id.
@@ -29,6 +33,7 @@ def create_user(db: Session, *, phone_number: Optional[str] = None) -> User:
         raise
 
 
+@traced()
 def get_user_by_id(db: Session, user_id: int) -> User | None:
     try:
         return db.get(User, user_id)
@@ -37,14 +42,19 @@ def get_user_by_id(db: Session, user_id: int) -> User | None:
         raise
 
 
+@traced()
 def get_user_by_phone(db: Session, phone_number: str) -> User | None:
+    """`phone_number` must be canonical (src/core/phone.py), as stored."""
     try:
+        if not is_canonical_phone(phone_number):
+            raise ValueError(f"phone number is not normalized: {phone_number!r}")
         return db.query(User).filter(User.phone_number == phone_number).first()
     except SQLAlchemyError:
         logger.exception("failed to fetch user by phone_number=%s", phone_number)
         raise
 
 
+@traced()
 def get_user_by_chat_id(db: Session, chat_id: str) -> User | None:
     try:
         stmt = select(User).join(User.chats).where(Chat.chat_id == int(chat_id))
@@ -54,7 +64,10 @@ def get_user_by_chat_id(db: Session, chat_id: str) -> User | None:
         raise
 
 
-def update_user(db: Session, user_id: int, **fields: Any) -> User | None:
+@traced()
+def update_user(
+    db: Session, user_id: int, *, commit: bool = True, **fields: Any
+) -> User | None:
     try:
         user = db.get(User, user_id)
         if not user:
@@ -67,8 +80,11 @@ def update_user(db: Session, user_id: int, **fields: Any) -> User | None:
             else:
                 raise AttributeError(f"User has no attribute '{key}'")
 
-        db.commit()
-        db.refresh(user)
+        if commit:
+            db.commit()
+            db.refresh(user)
+        else:
+            db.flush()
         return user
 
     except SQLAlchemyError as e:
@@ -77,6 +93,7 @@ def update_user(db: Session, user_id: int, **fields: Any) -> User | None:
         raise
 
 
+@traced()
 def delete_user_by_id(db: Session, user_id: int) -> bool:
     """
     Deleting a user will also delete all related chats because of the
@@ -103,6 +120,7 @@ def delete_user_by_id(db: Session, user_id: int) -> bool:
 # --------------------
 
 
+@traced()
 def create_chat(
     db: Session,
     *,
@@ -135,6 +153,7 @@ def create_chat(
         raise
 
 
+@traced()
 def get_chat_by_chat_id(db: Session, chat_id: int) -> Chat | None:
     try:
         return db.query(Chat).filter(Chat.chat_id == chat_id).first()
@@ -143,6 +162,7 @@ def get_chat_by_chat_id(db: Session, chat_id: int) -> Chat | None:
         raise
 
 
+@traced()
 def get_chat_by_id(db: Session, chat_id_pk: int) -> Chat | None:
     try:
         return db.get(Chat, chat_id_pk)
@@ -151,6 +171,7 @@ def get_chat_by_id(db: Session, chat_id_pk: int) -> Chat | None:
         raise
 
 
+@traced()
 def update_chat(db: Session, chat_id_pk: int, **fields: Any) -> Chat | None:
     """
     Update a Chat by its primary key `id`.
@@ -177,6 +198,47 @@ def update_chat(db: Session, chat_id_pk: int, **fields: Any) -> Chat | None:
         raise
 
 
+@traced()
+def transition_chat_state(
+    db: Session,
+    chat: Chat,
+    *,
+    state: int,
+    counters: int,
+    commit: bool = True,
+    **fields: Any,
+) -> bool:
+    """
+    Move the chat to (state, counters) in one conditional UPDATE: only if it
+    still is in the state / counters it was read with. False when another
+    update for the chat got there first. `chat` is updated in place.
+    """
+    try:
+        result = db.execute(
+            update(Chat)
+            .where(
+                Chat.id == chat.id,
+                Chat.fsm_state == chat.fsm_state,
+                Chat.fsm_counters == chat.fsm_counters,
+            )
+            .values(fsm_state=state, fsm_counters=counters, **fields)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            return False
+        # the row already holds these, don't flush them a second time
+        for key, value in {"fsm_state": state, "fsm_counters": counters, **fields}.items():
+            set_committed_value(chat, key, value)
+        if commit:
+            db.commit()
+        return True
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("failed to transition chat state: %s", e)
+        raise
+
+
+@traced()
 def update_chat_by_chat_id(db: Session, chat_id: int, **fields: Any) -> Chat | None:
     """
     Update a Chat using Telegram's `chat_id`.
@@ -204,6 +266,7 @@ def update_chat_by_chat_id(db: Session, chat_id: int, **fields: Any) -> Chat | N
         raise
 
 
+@traced()
 def delete_chat_by_id(db: Session, chat_id_pk: int) -> bool:
     try:
         chat = db.get(Chat, chat_id_pk)
@@ -221,6 +284,7 @@ def delete_chat_by_id(db: Session, chat_id_pk: int) -> bool:
         return False
 
 
+@traced()
 def delete_chat_by_chat_id(db: Session, chat_id: int) -> bool:
     try:
         chat = db.query(Chat).filter(Chat.chat_id == chat_id).first()
@@ -0,0 +1,179 @@
+# src/db/inspector.py
+import contextvars
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.config import logger, settings
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# frames in these directories are plumbing, the call site is the caller above them
+_SKIP_DIRS = tuple(
+    os.path.join(PROJECT_ROOT, "src", d) + os.sep for d in ("db", "core")
+)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+# expanded IN lists / VALUES rows of bound params: (%(id_1_1)s, %(id_1_2)s) or (?, ?)
+_PARAM_LIST_RE = re.compile(r"\((?:\s*(?:%\(\w+\)s|\?|:\w+|\$\d+)\s*,?)+\)")
+
+
+@lru_cache(maxsize=2048)
+def normalize_statement(statement: str) -> str:
+    """Statement shape: literals and bound parameter lists collapsed."""
+    shape = _WHITESPACE_RE.sub(" ", statement).strip()
+    shape = _PARAM_LIST_RE.sub("(...)", shape)
+    shape = _STRING_RE.sub("?", shape)
+    return _NUMBER_RE.sub("?", shape)
+
+
+def _call_site() -> str:
+    """First frame of project code outside src/db and src/core."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(PROJECT_ROOT)
+            and not filename.startswith(_SKIP_DIRS)
+            and "site-packages" not in filename
+        ):
+            rel = os.path.relpath(filename, PROJECT_ROOT)
+            return f"{rel}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return "<unknown>"
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+    # first call site seen for each shape that repeated
+    repeat_sites: Dict[str, str] = field(default_factory=dict)
+
+
+_current_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar(
+    "query_stats", default=None
+)
+
+
+class QueryInspector:
+    """
+    Counts statements per unit of work (one Telegram update), flags units with
+    too many statements or a repeated statement shape (N+1) and logs slow
+    statements with their call site. Everything can be changed at runtime;
+    while disabled the engine hooks return after one attribute check.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = settings.query_inspector_enabled
+        self.max_queries = settings.query_inspector_max_queries
+        self.max_repeats = settings.query_inspector_max_repeats
+        self.slow_ms = settings.query_inspector_slow_ms
+
+    def configure(self, **options: Any) -> Dict[str, Any]:
+        for key, value in options.items():
+            if value is None:
+                continue
+            if not hasattr(self, key):
+                raise AttributeError(f"QueryInspector has no option '{key}'")
+            setattr(self, key, value)
+        logger.info("query inspector configured: %s", self.options())
+        return self.options()
+
+    def options(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_queries": self.max_queries,
+            "max_repeats": self.max_repeats,
+            "slow_ms": self.slow_ms,
+        }
+
+    # --- engine hooks ---
+
+    def before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        if self.enabled:
+            conn.info["inspector_started_at"] = time.perf_counter()
+
+    def after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        started = conn.info.pop("inspector_started_at", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        shape = normalize_statement(statement)
+
+        if elapsed * 1000 >= self.slow_ms:
+            logger.warning(
+                "slow query %.1fms at %s: %s", elapsed * 1000, _call_site(), shape
+            )
+
+        stats = _current_stats.get()
+        if stats is None:
+            return
+        stats.count += 1
+        stats.seconds += elapsed
+        stats.shapes[shape] += 1
+        if stats.shapes[shape] == 2:
+            stats.repeat_sites[shape] = _call_site()
+
+    # --- per update ---
+
+    @contextmanager
+    def track(self, labels: Dict[str, Any]) -> Iterator[Optional[QueryStats]]:
+        """
+        Collect statements run inside the block; `labels` is read on exit
+        so the caller can fill it in while handling the update.
+        """
+        if not self.enabled:
+            yield None
+            return
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        try:
+            yield stats
+        finally:
+            _current_stats.reset(token)
+            self.report(stats, labels)
+
+    def report(self, stats: QueryStats, labels: Dict[str, Any]) -> None:
+        repeated = {
+            shape: n for shape, n in stats.shapes.items() if n > self.max_repeats
+        }
+        if stats.count <= self.max_queries and not repeated:
+            logger.debug(
+                "%s: %d queries in %.1fms", labels, stats.count, stats.seconds * 1000
+            )
+            return
+        logger.warning(
+            "%s: %d queries in %.1fms (limit %d)%s",
+            labels,
+            stats.count,
+            stats.seconds * 1000,
+            self.max_queries,
+            "".join(
+                f"\n  x{n} at {stats.repeat_sites.get(shape)}: {shape}"
+                for shape, n in sorted(repeated.items(), key=lambda i: -i[1])
+            ),
+        )
+
+
+QUERY_INSPECTOR = QueryInspector()
+
+
+def install_query_inspector(engine: Engine) -> None:
+    event.listen(engine, "before_cursor_execute", QUERY_INSPECTOR.before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", QUERY_INSPECTOR.after_cursor_execute)
@@ -0,0 +1,119 @@
+# src/db/pool.py
+import time
+import threading
+from dataclasses import dataclass, asdict
+from typing import Any, Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from src.config import logger
+
+
+@dataclass
+class PoolStats:
+    """
+    Counters collected by InstrumentedQueuePool. Gauges (checked out,
+    overflow, ...) are read live from the pool in snapshot().
+    """
+
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    idle_pings: int = 0
+    idle_ping_failures: int = 0
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that measures how long callers wait for a connection.
+    The wait is the only thing the standard pool events cannot see.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.stats.timeouts += 1
+            logger.warning(
+                "db pool exhausted: waited %.3fs (%s)", self._timeout, self.status()
+            )
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.stats.checkouts += 1
+                self.stats.wait_seconds_total += waited
+                if waited > self.stats.wait_seconds_max:
+                    self.stats.wait_seconds_max = waited
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        new_pool = super().recreate()
+        new_pool.stats = self.stats
+        return new_pool
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            counters = asdict(self.stats)
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            **counters,
+        }
+
+
+def install_idle_pre_ping(engine: Engine, interval: int) -> None:
+    """
+    Ping a connection on checkout only if it sat idle in the pool for longer
+    than `interval` seconds, instead of pool_pre_ping's round trip on every
+    checkout. A failed ping raises DisconnectionError, which makes the pool
+    discard the connection and hand out a fresh one.
+    """
+
+    @event.listens_for(engine, "checkin")
+    def _mark_idle(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < interval:
+            return
+
+        stats = getattr(engine.pool, "stats", None)
+        if stats is not None:
+            stats.idle_pings += 1
+        cursor = None
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SELECT 1")
+        except Exception as e:
+            if stats is not None:
+                stats.idle_ping_failures += 1
+            logger.info("db idle pre-ping failed, recycling connection: %s", e)
+            raise exc.DisconnectionError() from e
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+
+def pool_snapshot(engine: Engine) -> Dict[str, Any]:
+    pool = engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        return pool.snapshot()
+    return {"status": pool.status()}
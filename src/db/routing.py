@@ -0,0 +1,120 @@
+# src/db/routing.py
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import Delete, Insert, Update, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from src.config import logger
+
+# caught-up replicas report 0 even when no transaction was replayed lately
+REPLICA_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+
+class ReplicaSet:
+    """
+    Read replica engines with a cached replication lag per replica.
+    pick() round-robins over replicas whose lag is under max_lag and returns
+    None when none qualify, so the caller falls back to the primary.
+    """
+
+    def __init__(
+        self, engines: List[Engine], max_lag: float, check_interval: float
+    ) -> None:
+        self.engines = engines
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lag: Dict[int, Optional[float]] = {}
+        self._checked_at: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._rr = itertools.count()
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def _measure_lag(self, engine: Engine) -> Optional[float]:
+        try:
+            with engine.connect() as conn:
+                lag = conn.execute(REPLICA_LAG_SQL).scalar()
+            return float(lag or 0)
+        except Exception as e:
+            logger.warning("replica %s unavailable: %s", engine.url.host, e)
+            return None
+
+    def lag(self, idx: int) -> Optional[float]:
+        now = time.monotonic()
+        with self._lock:
+            fresh = now - self._checked_at.get(idx, float("-inf")) < self.check_interval
+            if fresh:
+                return self._lag.get(idx)
+            # claim the check so concurrent callers keep using the cached value
+            self._checked_at[idx] = now
+        lag = self._measure_lag(self.engines[idx])
+        with self._lock:
+            self._lag[idx] = lag
+        return lag
+
+    def pick(self) -> Engine | None:
+        if not self.engines:
+            return None
+        start = next(self._rr)
+        for offset in range(len(self.engines)):
+            idx = (start + offset) % len(self.engines)
+            lag = self.lag(idx)
+            if lag is not None and lag <= self.max_lag:
+                return self.engines[idx]
+        return None
+
+
+class RoutingSession(Session):
+    """
+    Sends reads made inside read_replica() to a replica and everything else
+    to the primary. Once the session writes (flush or DML statement) it is
+    pinned to the primary for the rest of its life, i.e. for the rest of the
+    request, so a request always reads its own writes.
+    """
+
+    def __init__(self, *args, replicas: Optional[ReplicaSet] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        primary = super().get_bind(mapper=mapper, clause=clause, **kw)
+
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self.info["pinned_to_primary"] = True
+            return primary
+
+        if (
+            not self.replicas
+            or not self.info.get("use_replica")
+            or self.info.get("pinned_to_primary")
+        ):
+            return primary
+
+        return self.replicas.pick() or primary
+
+
+@contextmanager
+def read_replica(db: Session) -> Iterator[Session]:
+    """
+    Mark the reads in this block as safe to serve from a replica.
+    A no-op for sessions that are not RoutingSession or have no replicas.
+    """
+    previous = db.info.get("use_replica", False)
+    db.info["use_replica"] = True
+    try:
+        yield db
+    finally:
+        db.info["use_replica"] = previous
@@ -1,125 +1,298 @@
 # src/db/seed.py
+import hashlib
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, text
 from sqlalchemy.orm import Session
-from src.models import Product, ProductVersion
+
+from src.models import (
+    Button,
+    ButtonIndex,
+    ChatOutput,
+    Placeholder,
+    Product,
+    ProductVersion,
+    SeedState,
+)
+from src.models.chat_outputs import BASE_LOCALE, PlaceHolderTypes
+from src.db.seed_data import SEED_PRODUCTS
+from src.db.dialect import dialect_insert
 from src.config import logger
-from typing import Dict
-from src.crud import chat_outpus
+
+# seeds run from every worker on startup, the advisory lock makes them
+# take turns and the stored content hash lets all but the first skip
+SEED_ADVISORY_LOCK_KEY = 0x5EED
+
+
+# --- Helpers ---
+
+
+def _content_hash(seed_data: Any) -> str:
+    raw = json.dumps(seed_data, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _seed_is_current(db: Session, name: str, content_hash: str) -> bool:
+    stored = db.execute(
+        select(SeedState.content_hash).where(SeedState.name == name)
+    ).scalar_one_or_none()
+    return stored == content_hash
+
+
+def _lock_seeding(db: Session) -> None:
+    """Held until the end of the transaction (commit / rollback)."""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:key)"), {"key": SEED_ADVISORY_LOCK_KEY}
+        )
+
+
+def _mark_seeded(db: Session, name: str, content_hash: str) -> None:
+    now = datetime.now(timezone.utc)
+    stmt = dialect_insert(db, SeedState).values(
+        name=name, content_hash=content_hash, updated_at=now
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[SeedState.name],
+            set_={"content_hash": content_hash, "updated_at": now},
+        )
+    )
 
 
-def seed_initial_products(db: Session) -> None:
+def _upsert_returning_ids(
+    db: Session,
+    model,
+    rows: List[Dict[str, Any]],
+    key: str,
+    conflict: Tuple[str, ...] = (),
+) -> Dict[str, int]:
+    """
+    Insert rows that don't exist yet and return {key: id} for all of them in a
+    single round trip. The no-op DO UPDATE (key = key) is what makes postgres
+    return ids of the rows that already existed; their content is untouched so
+    edits made in the DB survive reseeding. `conflict` names the unique
+    columns when there are more than `key` (key stays unique within `rows`).
+    """
+    if not rows:
+        return {}
+    column = getattr(model, key)
+    stmt = dialect_insert(db, model).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[getattr(model, name) for name in conflict or (key,)],
+        set_={key: getattr(stmt.excluded, key)},
+    ).returning(model.id, column)
+    return {row_key: row_id for row_id, row_key in db.execute(stmt).all()}
+
+
+def _insert_ignore(db: Session, model, rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        return
+    db.execute(dialect_insert(db, model).values(rows).on_conflict_do_nothing())
+
+
+# --- Seeds ---
+
+
+def seed_initial_products(db: Session, seed_data: List[Dict] = SEED_PRODUCTS) -> None:
     """
     Seeds the database with dummy Product + ProductVersion data for testing.
     Will NOT insert anything if products already exist.
     """
-    # avoid accidental duplicates
-    existing_count = db.query(Product).count()
-    if existing_count > 0:
-        logger.info("Seed skipped: products already exist.")
-        return
+    try:
+        content_hash = _content_hash(seed_data)
+        if _seed_is_current(db, "products", content_hash):
+            logger.info("Seed skipped: products unchanged.")
+            return
 
-    logger.info("Seeding dummy product data...")
-
-    # ------------------------
-    # Example dummy data block
-    # ------------------------
-    dummy_data = [
-        {
-            "name": "Premium Stars Pack",
-            "display_in_bot": True,
-            "versions": [
-                {"code": "v1", "price": 15000, "version_name": "version 1"},
-                {"code": "v2", "price": 30000, "version_name": "version 2"},
-            ],
-        },
-        {
-            "name": "Telegram Premium Upgrade",
-            "display_in_bot": True,
-            "versions": [
-                {"code": "1_month", "price": 120000, "version_name": "one month"},
-                {"code": "12_months", "price": 1100000, "version_name": "12 month"},
-            ],
-        },
-        {
-            "name": "Special Offer Bundle",
-            "display_in_bot": False,
-            "versions": [
-                {"code": "std", "price": 9999, "version_name": "special"},
-                {"code": "plus", "price": 15999, "version_name": "super special"},
+        _lock_seeding(db)
+        # another worker may have finished while we waited for the lock
+        if _seed_is_current(db, "products", content_hash):
+            db.rollback()
+            logger.info("Seed skipped: products unchanged.")
+            return
+
+        # products have no natural key to conflict on, so keep the old
+        # "only seed an empty catalog" rule
+        existing_count = db.execute(select(func.count()).select_from(Product)).scalar()
+        if existing_count == 0:
+            logger.info("Seeding dummy product data...")
+            stmt = (
+                dialect_insert(db, Product)
+                .values(
+                    [
+                        {"name": p["name"], "display_in_bot": p["display_in_bot"]}
+                        for p in seed_data
+                    ]
+                )
+                .returning(Product.id, Product.name)
+            )
+            product_ids = {name: id_ for id_, name in db.execute(stmt).all()}
+
+            _insert_ignore(
+                db,
+                ProductVersion,
+                [
+                    {
+                        "product_id": product_ids[p["name"]],
+                        "code": v["code"],
+                        "price": v["price"],
+                        "version_name": v["version_name"],
+                    }
+                    for p in seed_data
+                    for v in p["versions"]
+                ],
+            )
+        else:
+            logger.info("Seed skipped: products already exist.")
+
+        _mark_seeded(db, "products", content_hash)
+        db.commit()
+        logger.info("Dummy product data seeded successfully.")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"seed_initial_products failed:{e}")
+        raise
+
+
+def _seed_locale(
+    db: Session,
+    seed_data: Dict,
+    locale: str,
+    button_texts: Dict[str, str],
+    output_texts: Dict[str, str],
+    fallback_button_ids: Dict[str, int],
+) -> Dict[str, int]:
+    """
+    One locale's buttons and outputs with the given texts; placeholders,
+    keyboard layout and callback data always come from seed_data. A button
+    without a variant in this locale is taken from `fallback_button_ids`.
+    Returns {button name: id} of the buttons this locale's keyboards use.
+    """
+    known_buttons = {b.get("name") for b in seed_data.get("buttons")}
+    known_outputs = {o.get("name") for o in seed_data.get("chat_outputs")}
+    unknown = (set(button_texts) - known_buttons) | (set(output_texts) - known_outputs)
+    if unknown:
+        raise ValueError(f"Seeder {locale} texts reference unknown names: {unknown}")
+
+    # 1) buttons
+    button_ids = dict(fallback_button_ids)
+    button_ids.update(
+        _upsert_returning_ids(
+            db,
+            Button,
+            [
+                {
+                    "name": button.get("name"),
+                    "locale": locale,
+                    "text": button_texts[button.get("name")],
+                    "callback_data": button.get("callback_data"),
+                }
+                for button in seed_data.get("buttons")
+                if button.get("name") in button_texts
             ],
-        },
+            key="name",
+            conflict=("name", "locale"),
+        )
+    )
+
+    # 2) chat outputs
+    chat_outputs = [
+        chat_output
+        for chat_output in seed_data.get("chat_outputs")
+        if chat_output.get("name") in output_texts
     ]
+    chat_output_ids = _upsert_returning_ids(
+        db,
+        ChatOutput,
+        [
+            {
+                "name": chat_output.get("name"),
+                "locale": locale,
+                "text": output_texts[chat_output.get("name")],
+            }
+            for chat_output in chat_outputs
+        ],
+        key="name",
+        conflict=("name", "locale"),
+    )
 
-    # Insert products and their versions
-    for p in dummy_data:
-        product = Product(
-            name=p["name"],
-            display_in_bot=p["display_in_bot"],
-        )
-        db.add(product)
-        db.flush()  # get product.id before adding versions
-
-        for v in p["versions"]:
-            version = ProductVersion(
-                product_id=product.id,
-                code=v["code"],
-                price=v["price"],
-                version_name=v["version_name"],
+    # 3) placeholders + button indexes of every output, one insert each
+    placeholders: List[Dict[str, Any]] = []
+    button_indexes: List[Dict[str, Any]] = []
+    for chat_output in chat_outputs:
+        chat_output_id = chat_output_ids[chat_output.get("name")]
+        for placeholder in chat_output.get("placeholders"):
+            placeholders.append(
+                {
+                    "chat_output_id": chat_output_id,
+                    "name": placeholder.get("name"),
+                    "type": PlaceHolderTypes(placeholder.get("type")),
+                }
             )
-            db.add(version)
-
-    db.commit()
-    logger.info("Dummy product data seeded successfully.")
+        for button in chat_output.get("buttons"):
+            button_id = button_ids.get(button.get("button_name"))
+            if button_id is None:
+                raise ValueError(
+                    f"Seeder references unknown button: {button['button_name']}"
+                )
+            button_indexes.append(
+                {
+                    "chat_output_id": chat_output_id,
+                    "button_id": button_id,
+                    "number": button.get("number"),
+                }
+            )
+    _insert_ignore(db, Placeholder, placeholders)
+    _insert_ignore(db, ButtonIndex, button_indexes)
+    return button_ids
 
 
-def seed_initial_chat_outputs(db: Session, seed_data: Dict) -> None:
+def seed_initial_chat_outputs(
+    db: Session, seed_data: Dict, translations: Optional[Dict] = None
+) -> None:
+    """
+    seed_data is the base (BASE_LOCALE) set; translations maps a locale to
+    {"buttons": {name: text}, "chat_outputs": {name: text}}.
+    """
     try:
-        buttons = seed_data.get("buttons")
-        for button in buttons:
-            name = button.get("name")
-            button_exists = chat_outpus.get_button_by_name(db=db, name=name)
-            if button_exists is None:
-                chat_outpus.create_button(
-                    db=db,
-                    name=name,
-                    text=button.get("text"),
-                    callback_data=button.get("callback_data"),
-                    commit=False,
-                )
-        chat_outputs = seed_data.get("chat_outputs")
-        for chat_output in chat_outputs:
-            name = chat_output.get("name")
-            chat_output_exists = chat_outpus.get_chat_output_by_name(db=db, name=name)
-            if chat_output_exists is not None:
-                continue
-            chat_output_data = chat_outpus.create_chat_output(
-                db=db, name=name, text=chat_output.get("text"), commit=False
+        content_hash = _content_hash([seed_data, translations or {}])
+        if _seed_is_current(db, "chat_outputs", content_hash):
+            logger.info("Seed skipped: chat outputs unchanged.")
+            return
+
+        _lock_seeding(db)
+        if _seed_is_current(db, "chat_outputs", content_hash):
+            db.rollback()
+            logger.info("Seed skipped: chat outputs unchanged.")
+            return
+
+        base_button_ids = _seed_locale(
+            db,
+            seed_data,
+            BASE_LOCALE,
+            button_texts={b.get("name"): b.get("text") for b in seed_data.get("buttons")},
+            output_texts={
+                o.get("name"): o.get("text") for o in seed_data.get("chat_outputs")
+            },
+            fallback_button_ids={},
+        )
+        for locale, texts in (translations or {}).items():
+            _seed_locale(
+                db,
+                seed_data,
+                locale,
+                button_texts=texts.get("buttons", {}),
+                output_texts=texts.get("chat_outputs", {}),
+                fallback_button_ids=base_button_ids,
             )
-            placeholders = chat_output.get("placeholders")
-            for placeholder in placeholders:
-                chat_outpus.create_placeholder(
-                    db=db,
-                    chat_output_id=chat_output_data.id,
-                    name=placeholder.get("name"),
-                    type=placeholder.get("type"),
-                    commit=False,
-                )
-            buttons = chat_output.get("buttons")
-            for button in buttons:
-                button_data = chat_outpus.get_button_by_name(
-                    db=db, name=button.get("name")
-                )
-                if button_data is None:
-                    raise ValueError(
-                        f"Seeder references unknown button: {button['name']}"
-                    )
-                chat_outpus.create_button_index(
-                    db=db,
-                    chat_output_id=chat_output_data.id,
-                    button_id=button_data.id,
-                    number=button.get("number"),
-                    commit=False,
-                )
+
+        _mark_seeded(db, "chat_outputs", content_hash)
         db.commit()
+        logger.info("Chat outputs seeded successfully.")
 
     except Exception as e:
+        db.rollback()
         logger.error(f"seed_initial_chat_outputs failed:{e}")
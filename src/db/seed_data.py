@@ -1,3 +1,30 @@
+SEED_PRODUCTS = [
+    {
+        "name": "Premium Stars Pack",
+        "display_in_bot": True,
+        "versions": [
+            {"code": "v1", "price": 15000, "version_name": "version 1"},
+            {"code": "v2", "price": 30000, "version_name": "version 2"},
+        ],
+    },
+    {
+        "name": "Telegram Premium Upgrade",
+        "display_in_bot": True,
+        "versions": [
+            {"code": "1_month", "price": 120000, "version_name": "one month"},
+            {"code": "12_months", "price": 1100000, "version_name": "12 month"},
+        ],
+    },
+    {
+        "name": "Special Offer Bundle",
+        "display_in_bot": False,
+        "versions": [
+            {"code": "std", "price": 9999, "version_name": "special"},
+            {"code": "plus", "price": 15999, "version_name": "super special"},
+        ],
+    },
+]
+
 SEED_TELEGRAM_OUTPUTS = {
     "buttons": [
         # ===== shared auth buttons =====
@@ -38,6 +65,32 @@ SEED_TELEGRAM_OUTPUTS = {
             "text": "🆘 Support",
             "callback_data": "support",
         },
+        {
+            "name": "btn_my_orders",
+            "text": "🧾 My orders",
+            "callback_data": "my_orders",
+        },
+        {
+            "name": "btn_language",
+            "text": "🌐 Language / زبان",
+            "callback_data": "choose_language",
+        },
+        # ===== cart =====
+        {
+            "name": "btn_cart",
+            "text": "🛒 My cart",
+            "callback_data": "cart",
+        },
+        {
+            "name": "btn_cart_checkout",
+            "text": "✅ Checkout",
+            "callback_data": "cart_checkout",
+        },
+        {
+            "name": "btn_cart_clear",
+            "text": "🗑 Empty the cart",
+            "callback_data": "cart_clear",
+        },
         # ===== payment flow =====
         # IMPORTANT: this will become a URL button at runtime via map_url/url_map
         # so callback_data is a safe dummy; it won't be used when url is present.
@@ -256,6 +309,51 @@ Please enter the code.
                 {"button_name": "btn_show_prices", "number": 100},
                 {"button_name": "btn_show_terms", "number": 101},
                 {"button_name": "btn_support", "number": 102},
+                {"button_name": "btn_my_orders", "number": 103},
+                {"button_name": "btn_cart", "number": 104},
+                {"button_name": "btn_language", "number": 105},
+            ],
+        },
+        {
+            "name": "choose_language",
+            "text": "🌐 *Choose your language:*",
+            "placeholders": [],
+            "buttons": [
+                # appended after the dynamic one-per-locale buttons
+                {"button_name": "btn_return_to_menu", "number": 100},
+            ],
+        },
+        {
+            "name": "cart",
+            "text": """
+🛒 *Your cart*
+
+{cart_block}
+
+💰 Total: {total}
+""",
+            "placeholders": [
+                {"name": "cart_block", "type": "outline"},
+                {"name": "total", "type": "inline"},
+            ],
+            "buttons": [
+                # appended after the dynamic ➖ / ➕ rows
+                {"button_name": "btn_cart_checkout", "number": 100},
+                {"button_name": "btn_cart_clear", "number": 101},
+                {"button_name": "btn_return_to_menu", "number": 102},
+            ],
+        },
+        {
+            "name": "my_orders",
+            "text": """
+🧾 *Your orders*
+
+{orders_block}
+""",
+            "placeholders": [{"name": "orders_block", "type": "outline"}],
+            "buttons": [
+                # appended after the dynamic paging buttons
+                {"button_name": "btn_return_to_menu", "number": 100},
             ],
         },
         {
@@ -305,6 +403,29 @@ Please enter the code.
                 {"button_name": "btn_return_to_menu", "number": 3},
             ],
         },
+        {
+            "name": "cart_checkout",
+            "text": """
+🛒 **Your order:**
+
+{cart_block}
+
+💰 Total: {total}
+
+━━━━━━━━━━━━━━━━━━━━
+💳 Please choose your payment method:
+""",
+            "placeholders": [
+                {"name": "cart_block", "type": "outline"},
+                {"name": "total", "type": "inline"},
+                {"name": "order_id", "type": "inline"},
+            ],
+            "buttons": [
+                {"button_name": "btn_pay_invoice", "number": 1},
+                {"button_name": "btn_cancel_order", "number": 2},
+                {"button_name": "btn_return_to_menu", "number": 3},
+            ],
+        },
         {
             "name": "payment_gateway",
             "text": """
@@ -518,3 +639,212 @@ In order to receive help, pick one of the options below:
         },
     ],
 }
+
+# Locale variants of SEED_TELEGRAM_OUTPUTS: only the text is translated, the
+# placeholders, keyboard layout and callback data come from the base (English)
+# definition. Outputs / buttons left out here fall back (see src/bot/i18n.py).
+SEED_TELEGRAM_OUTPUT_TRANSLATIONS = {
+    "fa": {
+        "buttons": {
+            "btn_send_validation_code": "📱 ارسال کد تایید به شماره موبایل",
+            "btn_edit_phone_number": "📝 ویرایش شماره موبایل",
+            "btn_return_to_menu": "🔁 بازگشت به منو",
+            "btn_login_to_account": "🚪 ورود",
+            "btn_show_prices": "💰 مشاهده قیمت‌ها",
+            "btn_show_terms": "📜 مشاهده قوانین و مقررات",
+            "btn_support": "🆘 پشتیبانی",
+            "btn_my_orders": "🧾 سفارش‌های من",
+            "btn_language": "🌐 زبان / Language",
+            "btn_cart": "🛒 سبد خرید من",
+            "btn_cart_checkout": "✅ تکمیل خرید",
+            "btn_cart_clear": "🗑 خالی کردن سبد",
+            "btn_pay_invoice": "💳 پرداخت فاکتور",
+            "btn_i_paid": "✅ پرداخت کردم",
+            "btn_cancel_order": "❌ لغو سفارش",
+            "btn_read_the_terms": "✅ قوانین را خواندم",
+            "btn_accepted_terms": "✅ موافقم و می‌پذیرم",
+            "btn_show_terms_for_acceptance": "📜 مشاهده قوانین و مقررات",
+            "btn_contact_support": "📞 تماس با پشتیبانی",
+            "btn_common_questions": "❓ سوالات متداول",
+            "btn_return_to_support": "📞 بازگشت به پشتیبانی",
+        },
+        "chat_outputs": {
+            "unsupported_command": "❌ دستور پشتیبانی نمی‌شود.",
+            "phone_number_input": """
+🌟 **به ربات تست خوش آمدید!**
+
+📱 **برای شروع، لطفا شماره موبایل خود را وارد کنید:**
+• شماره را به شکل `09123456789` وارد کنید
+• شماره باید متعلق به خود شما باشد
+• این شماره برای احراز هویت و پرداخت مستقیم استفاده می‌شود
+
+💡 **توجه داشته باشید:**
+• شماره شما امن و محرمانه می‌ماند
+• فقط برای احراز هویت و پرداخت استفاده می‌شود
+• هر زمان بخواهید می‌توانید آن را تغییر دهید
+
+🔐 **امنیت:**
+• تمام اطلاعات شما رمزنگاری شده ذخیره می‌شود
+• هیچ اطلاعاتی در اختیار شخص ثالث قرار نمی‌گیرد
+""",
+            "phone_number_verification_needed": """
+❌ **شماره موبایل شما ({phone_number}) هنوز تایید نشده است**
+📱 برای ادامه، لطفا شماره خود را تایید کنید.
+""",
+            "authentication_failed": "*احراز هویت ناموفق بود*",
+            "max_attempt_reached": "❌ *۳ بار ناموفق. لغو شد*",
+            "invalid_phone_number": "❌ *شماره موبایل نامعتبر است*",
+            "invalid_otp": "❌ *کد تایید نامعتبر است*",
+            "chat_verification_needed": """
+باید مطمئن شویم این گفتگو متعلق به صاحب این شماره است:
+`{phone_number}`
+""",
+            "login_to_acount": """
+⚠️ **کاربری با این شماره ({phone_number}) از قبل وجود دارد.**
+می‌خواهید وارد این حساب شوید یا شماره خود را ویرایش کنید؟
+""",
+            "already_logged_in": """
+❌ **شما از قبل وارد شده‌اید**
+شما با حساب شماره `{phone_number}` وارد شده‌اید
+""",
+            "phone_numebr_verification": """
+✅ **کد تایید به شماره موبایل شما ارسال شد.**
+لطفا کد را وارد کنید.
+
+💳 **نکات مهم درباره حساب بانکی:**
+• حسابی که با آن پرداخت می‌کنید باید متعلق به صاحب این شماره باشد
+• سیستم بررسی می‌کند که شماره موبایل و شماره حساب متعلق به یک نفر باشند
+• در غیر این صورت پرداخت شما انجام نمی‌شود
+• اگر حساب متعلق به شخص دیگری است، لطفا از حساب دیگری استفاده کنید
+""",
+            "phone_number_verified": """
+✅ **شماره موبایل با موفقیت تایید شد!**
+🌟 در حال نمایش محصولات...
+""",
+            "loading_prices_message": "💰 لطفا کمی صبر کنید تا به‌روزترین قیمت‌ها دریافت شود",
+            "get_prices": """
+📊 **قیمت‌های فعلی:**
+
+{prices_block}
+""",
+            "return_to_menu": """
+🌟 *به ربات تست خوش آمدید!*
+
+━━━━━━━━━━━━━━━━━━━━
+
+💡 یکی از محصولات زیر را انتخاب کنید:
+
+{products_block}
+
+━━━━━━━━━━━━━━━━━━━━
+""",
+            "choose_language": "🌐 *زبان خود را انتخاب کنید:*",
+            "cart": """
+🛒 *سبد خرید شما*
+
+{cart_block}
+
+💰 جمع کل: {total}
+""",
+            "my_orders": """
+🧾 *سفارش‌های شما*
+
+{orders_block}
+""",
+            "buy_product": """
+🎉 *خرید {product_name}!*
+
+**لیست قیمت‌ها** 📋
+
+{prices_block}
+
+💡 *برای انتخاب محصول مورد نظر، دکمه مربوط را بزنید.*
+""",
+            "buy_product_version": """
+🛒 **محصول انتخاب‌شده:**
+📦 {product_name} — **{product_version_name}**
+
+💰 قیمت: {price}
+
+━━━━━━━━━━━━━━━━━━━━
+💳 لطفا روش پرداخت را انتخاب کنید:
+""",
+            "cart_checkout": """
+🛒 **سفارش شما:**
+
+{cart_block}
+
+💰 جمع کل: {total}
+
+━━━━━━━━━━━━━━━━━━━━
+💳 لطفا روش پرداخت را انتخاب کنید:
+""",
+            "payment_gateway": """
+💻 **پرداخت از طریق درگاه (درگاه تست)**
+
+📦 محصول: {product_name}
+💰 مبلغ: {amount}
+
+━━━━━━━━━━━━━━━━━━━━
+
+📝 **راهنما:**
+1️⃣ دکمه **«پرداخت فاکتور»** را بزنید
+2️⃣ جزئیات فاکتور را بررسی کنید
+3️⃣ در صفحه فاکتور **پرداخت آنلاین** را بزنید
+4️⃣ به درگاه پرداخت منتقل می‌شوید
+5️⃣ اطلاعات کارت بانکی خود را وارد کنید
+6️⃣ پس از پرداخت موفق، اینجا دکمه **«پرداخت کردم»** را بزنید
+
+🆔 شناسه فاکتور: `{order_id}`
+
+━━━━━━━━━━━━━━━━━━━━
+""",
+            "payment_confirmed": """
+✅ **پرداخت تایید شد**
+
+متشکریم. پرداخت شما با موفقیت تایید شد.
+سفارش شما **پرداخت‌شده** ثبت شد و پردازش خواهد شد.
+
+━━━━━━━━━━━━━━━━━━━━
+🆔 شناسه سفارش: `{order_id}`
+
+اگر کار دیگری دارید، می‌توانید به منوی اصلی برگردید.
+""",
+            "payment_not_confirmed": """
+⏳ **پرداختی یافت نشد**
+
+هنوز پرداخت موفقی برای این سفارش پیدا نکردیم.
+ممکن است:
+• پرداخت هنوز در حال پردازش باشد
+• پرداخت ناموفق بوده یا لغو شده باشد
+• پرداخت را کامل نکرده باشید
+
+━━━━━━━━━━━━━━━━━━━━
+🆔 شناسه سفارش: `{order_id}`
+
+لطفا پرداخت را کامل کنید و دوباره **«پرداخت کردم»** را بزنید.
+""",
+            "terms_and_conditions": """
+**قوانین و مقررات**
+
+با استفاده از ربات تست، موظف به رعایت قوانین ما هستید.
+اگر با قوانین موافقید، دکمه *«موافقم و می‌پذیرم»* را بزنید.
+""",
+            "support": """
+🆘 **بخش پشتیبانی ربات تست**
+
+━━━━━━━━━━━━━━━━━━━━
+
+برای دریافت راهنمایی، یکی از گزینه‌های زیر را انتخاب کنید:
+
+📞 *تماس با پشتیبانی* – اطلاعات تماس.
+❓ *سوالات متداول* – پاسخ‌های رایج.
+🔁 *بازگشت به منو* – بازگشت به منوی اصلی.
+
+━━━━━━━━━━━━━━━━━━━━
+
+💡 **توجه:** برای پاسخ سریع‌تر، ابتدا سوالات متداول را ببینید.
+""",
+        },
+    },
+}
@@ -1,12 +1,66 @@
 # src/db/session.py
-from sqlalchemy import create_engine
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 from src.config import settings
+from src.db.pool import InstrumentedQueuePool, install_idle_pre_ping
+from src.db.routing import ReplicaSet, RoutingSession
+from src.db.inspector import install_query_inspector
+from src.core.metrics import DB_QUERY_SECONDS
+
+
+def _engine_kwargs(url: str) -> Dict[str, Any]:
+    engine_kwargs = dict(pool_pre_ping=settings.db_pool_pre_ping)
+
+    if url.startswith("sqlite"):
+        engine_kwargs["connect_args"] = {"check_same_thread": False}
+    else:
+        engine_kwargs.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_recycle=settings.db_pool_recycle,
+            pool_timeout=settings.db_pool_timeout,
+            pool_use_lifo=True,  # lets surplus idle connections age out via recycle
+        )
+    return engine_kwargs
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started_at"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_started_at", None)
+    if started is not None:
+        operation = statement.lstrip()[:6].upper()
+        DB_QUERY_SECONDS.observe(time.perf_counter() - started, operation)
+
+
+def _create_engine(url: str) -> Engine:
+    new_engine = create_engine(url, **_engine_kwargs(url))
+    if not settings.db_pool_pre_ping and settings.db_pool_pre_ping_interval:
+        install_idle_pre_ping(new_engine, interval=settings.db_pool_pre_ping_interval)
+    event.listen(new_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(new_engine, "after_cursor_execute", _after_cursor_execute)
+    install_query_inspector(new_engine)
+    return new_engine
 
-engine_kwargs = dict(pool_pre_ping=True)
 
-if settings.db_url.startswith("sqlite"):
-    engine_kwargs["connect_args"] = {"check_same_thread": False}
+engine = _create_engine(settings.db_url)
+replicas = ReplicaSet(
+    engines=[_create_engine(url) for url in settings.db_replica_urls],
+    max_lag=settings.db_replica_max_lag_seconds,
+    check_interval=settings.db_replica_lag_check_interval,
+)
 
-engine = create_engine(settings.db_url, **engine_kwargs)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+SessionLocal = sessionmaker(
+    class_=RoutingSession,
+    bind=engine,
+    replicas=replicas,
+    autoflush=False,
+    autocommit=False,
+)
@@ -6,6 +6,9 @@ from src.models.products import Product, ProductVersion
 from src.models.user import User
 from src.models.chat_outputs import ChatOutput, Placeholder, Button, ButtonIndex
 from src.models.admin_user import AdminUser
+from src.models.seed_state import SeedState
+from src.models.outbox import OutboxMessage, OutboxStatus
+from src.models.reports import SalesDailyRollup
 
 
 # Alembic needs Base.metadata to see models
@@ -23,4 +26,8 @@ __all__ = [
     "Button",
     "ButtonIndex",
     "AdminUser",
+    "SeedState",
+    "OutboxMessage",
+    "OutboxStatus",
+    "SalesDailyRollup",
 ]
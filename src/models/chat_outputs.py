@@ -9,6 +9,10 @@ from sqlalchemy import (
 from src.db.base import Base
 from enum import Enum
 
+# the language SEED_TELEGRAM_OUTPUTS is written in: every output and button
+# has a variant in it, the other locales may cover only part of them
+BASE_LOCALE = "en"
+
 
 class PlaceHolderTypes(str, Enum):
     INLINE = "inline"
@@ -18,7 +22,10 @@ class PlaceHolderTypes(str, Enum):
 class ChatOutput(Base):
     __tablename__ = "chat_outputs"
     id: Mapped[int] = mapped_column(primary_key=True)
-    name: Mapped[str] = mapped_column(String(70), nullable=False, unique=True)
+    name: Mapped[str] = mapped_column(String(70), nullable=False)
+    locale: Mapped[str] = mapped_column(
+        String(16), nullable=False, server_default=BASE_LOCALE
+    )
     text: Mapped[str] = mapped_column(String(5000), nullable=False)
     placeholders: Mapped[list["Placeholder"]] = relationship(
         back_populates="chat_output", cascade="all,delete-orphan"
@@ -26,7 +33,9 @@ class ChatOutput(Base):
     button_indexes: Mapped[list["ButtonIndex"]] = relationship(
         back_populates="chat_output", cascade="all,delete-orphan"
     )
-    __table_args__ = (UniqueConstraint("name", name="uq_chat_output_name"),)
+    __table_args__ = (
+        UniqueConstraint("name", "locale", name="uq_chat_output_name_locale"),
+    )
 
 
 class Placeholder(Base):
@@ -39,6 +48,7 @@ class Placeholder(Base):
     type: Mapped[PlaceHolderTypes] = mapped_column(
         SAEnum(PlaceHolderTypes), nullable=False
     )
+    chat_output: Mapped["ChatOutput"] = relationship(back_populates="placeholders")
 
     __table_args__ = (
         UniqueConstraint("chat_output_id", "name", name="uq_placeholder_per_output"),
@@ -68,11 +78,14 @@ class ButtonIndex(Base):
 class Button(Base):
     __tablename__ = "buttons"
     id: Mapped[int] = mapped_column(primary_key=True)
-    name: Mapped[str] = mapped_column(String(100), nullable=False, unique=True)
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    locale: Mapped[str] = mapped_column(
+        String(16), nullable=False, server_default=BASE_LOCALE
+    )
     text: Mapped[str] = mapped_column(String(600), nullable=False)
     callback_data: Mapped[str] = mapped_column(String(500), nullable=False)
     button_indexes: Mapped[list["ButtonIndex"]] = relationship(
         "ButtonIndex",
         back_populates="button",
     )
-    __table_args__ = (UniqueConstraint("name", name="uq_button_name"),)
+    __table_args__ = (UniqueConstraint("name", "locale", name="uq_button_name_locale"),)
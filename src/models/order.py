@@ -1,5 +1,14 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import ForeignKey, DateTime, Numeric, Integer, Enum as SAEnum
+from sqlalchemy import (
+    ForeignKey,
+    DateTime,
+    Index,
+    Numeric,
+    Integer,
+    String,
+    Enum as SAEnum,
+    text,
+)
 from src.db.base import Base
 from datetime import datetime
 from decimal import Decimal
@@ -11,11 +20,21 @@ class OrderStatus(str, Enum):
     PAID = "paid"
     WAITING_FOR_PAYMENT = "waiting_for_payment"
     EXPIRED = "expired"
+    CANCELLED = "cancelled"
+
+
+# the only moves an order can make, see crud.order.transition_order
+ORDER_TRANSITIONS = {
+    OrderStatus.WAITING_FOR_PAYMENT: frozenset(
+        {OrderStatus.PAID, OrderStatus.EXPIRED, OrderStatus.CANCELLED}
+    ),
+}
 
 
 class Order(Base):
     __tablename__ = "orders"
     id: Mapped[int] = mapped_column(primary_key=True)
+    # indexed by ix_orders_user_id_id below
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     total_amount: Mapped[Decimal] = mapped_column(Numeric(18, 8), nullable=True)
@@ -23,19 +42,49 @@ class Order(Base):
         SAEnum(OrderStatus), nullable=False, default=OrderStatus.WAITING_FOR_PAYMENT
     )
     paid_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    # bumped by every status transition (optimistic concurrency)
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default=text("0")
+    )
+    # idempotency key of the transition that set the current status
+    last_transition_key: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    # user + items, see crud.order.get_or_create_pending_order
+    dedupe_key: Mapped[str | None] = mapped_column(String(128), nullable=True)
     items: Mapped[list["OrderItem"]] = relationship(
         back_populates="order", cascade="all, delete-orphan"
     )
 
+    # open orders per user are the hot path (buy / pay / confirm), keep them
+    # in a small partial index instead of scanning the whole order history
+    __table_args__ = (
+        Index(
+            "ix_orders_user_id_waiting_for_payment",
+            "user_id",
+            "created_at",
+            postgresql_where=text("status = 'WAITING_FOR_PAYMENT'"),
+            sqlite_where=text("status = 'WAITING_FOR_PAYMENT'"),
+        ),
+        # "my orders" pages: WHERE user_id = ? AND id < ? ORDER BY id DESC
+        Index("ix_orders_user_id_id", "user_id", "id"),
+        # at most one open order per user and items: repeated buy presses reuse it
+        Index(
+            "ux_orders_dedupe_key_waiting_for_payment",
+            "dedupe_key",
+            unique=True,
+            postgresql_where=text("status = 'WAITING_FOR_PAYMENT'"),
+            sqlite_where=text("status = 'WAITING_FOR_PAYMENT'"),
+        ),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
     id: Mapped[int] = mapped_column(primary_key=True)
     order_id: Mapped[int] = mapped_column(
-        ForeignKey("orders.id", ondelete="CASCADE"), nullable=False
+        ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True
     )
     product_version_id: Mapped[int] = mapped_column(
-        ForeignKey("product_versions.id"), nullable=False
+        ForeignKey("product_versions.id"), nullable=False, index=True
     )
     unit_price: Mapped[Decimal] = mapped_column(Numeric(18, 8), nullable=False)
     quantity: Mapped[Decimal] = mapped_column(
@@ -0,0 +1,64 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    Enum as SAEnum,
+    Index,
+    Integer,
+    JSON,
+    String,
+    Text,
+    text,
+)
+from src.db.base import Base
+from datetime import datetime
+from enum import Enum
+
+
+class OutboxStatus(str, Enum):
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class OutboxMessage(Base):
+    """
+    A Bot API call (sendMessage, editMessageText...) written in the same
+    transaction as the state change it reports; the outbox dispatcher sends it.
+    """
+
+    __tablename__ = "outbox_messages"
+
+    id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    chat_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    method: Mapped[str] = mapped_column(String(64), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+    status: Mapped[OutboxStatus] = mapped_column(
+        SAEnum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    available_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    claimed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    # the dispatcher only ever looks at unsent rows, sent ones pile up
+    __table_args__ = (
+        Index(
+            "ix_outbox_messages_unsent",
+            "status",
+            "available_at",
+            postgresql_where=text("status IN ('PENDING', 'SENDING')"),
+            sqlite_where=text("status IN ('PENDING', 'SENDING')"),
+        ),
+        # "has this chat an earlier unsent message", asked per claimed row
+        Index(
+            "ix_outbox_messages_unsent_chat_id",
+            "chat_id",
+            "id",
+            postgresql_where=text("status IN ('PENDING', 'SENDING')"),
+            sqlite_where=text("status IN ('PENDING', 'SENDING')"),
+        ),
+    )
@@ -38,6 +38,7 @@ class ProductVersion(Base):
     product_id: Mapped[int] = mapped_column(
         ForeignKey("products.id", ondelete="CASCADE"),
         nullable=False,
+        index=True,
     )
     code: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
     price: Mapped[Decimal] = mapped_column(Numeric(18, 8), nullable=False)
@@ -0,0 +1,28 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Date, ForeignKey, Integer, Numeric
+from src.db.base import Base
+from datetime import date
+from decimal import Decimal
+
+
+class SalesDailyRollup(Base):
+    """
+    Paid sales per day and product version, kept up to date by the PAID
+    transition (crud.reports.rollup_paid_order) so reports never scan
+    orders / order_items.
+    """
+
+    __tablename__ = "sales_daily_rollups"
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    product_version_id: Mapped[int] = mapped_column(
+        ForeignKey("product_versions.id"), primary_key=True
+    )
+    orders_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    items_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    revenue: Mapped[Decimal] = mapped_column(
+        Numeric(18, 8), nullable=False, default=0, server_default="0"
+    )
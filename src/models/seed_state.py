@@ -0,0 +1,14 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import DateTime, String
+from src.db.base import Base
+from datetime import datetime
+
+
+class SeedState(Base):
+    """Content hash of the last applied seed, one row per seed (products, chat outputs...)"""
+
+    __tablename__ = "seed_state"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
@@ -1,12 +1,34 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, Boolean, String, UniqueConstraint, DateTime, ForeignKey
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    JSON,
+    SmallInteger,
+    String,
+    UniqueConstraint,
+)
 from src.db.base import Base
 from datetime import datetime
+from enum import IntEnum
+
+
+class ChatState(IntEnum):
+    """Where a chat is in the conversation; stored as a small integer, never renumber."""
+
+    NEW = 0  # terms not accepted yet
+    MENU = 1
+    WAITING_FOR_PHONE_NUMBER = 2
+    WAITING_FOR_OTP = 3
 
 
 class User(Base):
     __tablename__ = "users"
     id: Mapped[int] = mapped_column(primary_key=True)
+    # E.164, normalized by src/core/phone.py before it gets here
     phone_number: Mapped[str] = mapped_column(String(13), nullable=True, unique=True)
     phone_number_validated: Mapped[bool] = mapped_column(
         Boolean, nullable=False, server_default="false"
@@ -18,7 +40,12 @@ class User(Base):
         back_populates="user", cascade="all, delete-orphan"
     )
 
-    __table_args__ = (UniqueConstraint("phone_number", name="uq_users_phone_number"),)
+    __table_args__ = (
+        UniqueConstraint("phone_number", name="uq_users_phone_number"),
+        # exact lookups by the canonical number (login, duplicate detection);
+        # the unique constraint's btree is still what enforces uniqueness
+        Index("ix_users_phone_number_hash", "phone_number", postgresql_using="hash"),
+    )
 
 
 class Chat(Base):
@@ -26,23 +53,34 @@ class Chat(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(
-        ForeignKey("users.id", ondelete="CASCADE"),
+        ForeignKey("users.id", ondelete="CASCADE"), index=True
     )
-    chat_id: Mapped[int] = mapped_column(Integer, unique=True, nullable=False)
+    # telegram chat ids do not fit in 32 bits
+    chat_id: Mapped[int] = mapped_column(BigInteger, unique=True, nullable=False)
     chat_verified: Mapped[bool] = mapped_column(
         Boolean, nullable=False, server_default="false"
     )
     first_name: Mapped[str] = mapped_column(String(255), nullable=False)
     username: Mapped[str | None] = mapped_column(String(255))
-    accepted_terms: Mapped[bool] = mapped_column(
-        Boolean, nullable=False, server_default="false"
+    # conversation state, only changed through src/bot/fsm.py
+    fsm_state: Mapped[int] = mapped_column(
+        SmallInteger, nullable=False, default=ChatState.NEW, server_default="0"
+    )
+    # small counters (input attempts) packed 4 bits each, see bot.fsm.COUNTERS
+    fsm_counters: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
     )
-    pending_action: Mapped[str | None] = mapped_column(String, nullable=True)
-    phone_input_attempt: Mapped[int] = mapped_column(Integer, server_default="0")
-    otp_input_attempt: Mapped[int] = mapped_column(Integer, server_default="0")
     last_message_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # product version id -> quantity, written lazily by services.cart
+    cart: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    # picked by the user; None follows Telegram's language_code
+    locale: Mapped[str | None] = mapped_column(String(16), nullable=True)
     user: Mapped["User"] = relationship(back_populates="chats")
 
+    @property
+    def accepted_terms(self) -> bool:
+        return self.fsm_state != ChatState.NEW
+
 
 def __repr__(self):
     return f"<Chat {self.chat_id} {self.username}>"
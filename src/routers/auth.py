@@ -37,7 +37,7 @@ async def register(
         if password_valid is not True:
             return {"ok": False, "error": "password is weak"}
 
-        ph = request.app.state.ph  # global password hasher instance
+        ph = security.get_password_hasher()  # global password hasher instance
         hashed_password = security.hash_password(ph=ph, raw_password=payload.password)
         totp_secret = security.generate_user_totp_secret()
         new_admin_user = admin_db.create_admin_user(
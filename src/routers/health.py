@@ -1,10 +1,52 @@
+from typing import Optional
+
 from fastapi.responses import RedirectResponse
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from pydantic import BaseModel, PositiveInt
+
+from src.core import security
+from src.db.inspector import QUERY_INSPECTOR
+from src.db.pool import pool_snapshot
+from src.db.session import engine
 
 router = APIRouter()
 
 
+def require_admin(authorization: str = Header("")) -> dict:
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    try:
+        return security.decode_jwt(token)
+    except security.JWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+
+
+class QueryInspectorOptions(BaseModel):
+    enabled: Optional[bool] = None
+    max_queries: Optional[PositiveInt] = None
+    max_repeats: Optional[PositiveInt] = None
+    slow_ms: Optional[float] = None
+
+
 @router.get(path="/", response_class=RedirectResponse, include_in_schema=False)
 async def redirect_index():
     """Redirect root to read-only docs."""
     return "/redoc"
+
+
+@router.get(path="/db-pool")
+async def db_pool():
+    """Connection pool gauges (checked out, overflow) and wait time counters."""
+    return pool_snapshot(engine)
+
+
+@router.get(path="/query-inspector", dependencies=[Depends(require_admin)])
+async def get_query_inspector():
+    return QUERY_INSPECTOR.options()
+
+
+@router.post(path="/query-inspector", dependencies=[Depends(require_admin)])
+async def configure_query_inspector(options: QueryInspectorOptions):
+    """Switch the slow query log / N+1 detector of this worker on or off."""
+    return QUERY_INSPECTOR.configure(**options.model_dump())
@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.core.metrics import REGISTRY, register_db_pool_gauges
+from src.db.pool import pool_snapshot
+from src.db.session import engine
+
+router = APIRouter()
+
+register_db_pool_gauges(lambda: pool_snapshot(engine))
+
+
+@router.get(path="", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of the bot metrics."""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,9 +1,12 @@
-from fastapi import HTTPException, Depends, Form, status
-from fastapi.responses import RedirectResponse, HTMLResponse
+from anyio import from_thread
+from fastapi import HTTPException, Depends, Form, Request, status
+from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.routing import APIRouter
 
 from src.config import logger
-from src.crud.order import update_order
+from src.core.events import PaymentConfirmed
+from src.crud.order import transition_order
+from src.models.order import OrderStatus
 from src.db import get_db
 
 from sqlalchemy.orm import Session
@@ -27,16 +30,42 @@ async def payment_page(order_id: int):
     """
 
 
+# sync: transition_order is blocking DB I/O, FastAPI runs this in its threadpool
 @router.post("/confirm-payment", response_class=HTMLResponse)
-async def confirm_payment(order_id: int = Form(...), db: Session = Depends(get_db)):
-    order = update_order(db=db, order_id=order_id, status="paid")
-    if order.status != "paid":
-        logger.error(f"order payment failed:{order_id}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    if order.status == "paid":
-        logger.info(f"order payment succeded:{order_id}")
-        return {"ok": True}
-    return RedirectResponse(url="/success", status_code=303)
+def confirm_payment(
+    request: Request, order_id: int = Form(...), db: Session = Depends(get_db)
+):
+    # the gateway may call back more than once for one payment: same key,
+    # so a retry is a replay and not a second transition
+    result = transition_order(
+        db=db,
+        order_id=order_id,
+        to_status=OrderStatus.PAID,
+        idempotency_key=f"pay:{order_id}",
+    )
+    if result is None:
+        logger.error(f"order payment failed, no order:{order_id}")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    if not result.applied:
+        # cancelled or expired in the meantime
+        logger.error(f"order payment failed, order is {result.status.value}:{order_id}")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT)
+    logger.info(f"order payment succeded:{order_id}")
+    if not result.replayed:
+        # the buyer gets payment_confirmed right away instead of polling "I paid"
+        events = getattr(request.app.state, "events", None)
+        if events is not None:
+            # the bus starts its handlers as tasks, that has to be on the loop
+            from_thread.run_sync(
+                events.publish,
+                PaymentConfirmed(
+                    order_id=result.order_id,
+                    user_id=result.user_id,
+                    paid_at=result.paid_at,
+                ),
+            )
+    # a replayed callback (gateway retry) lands here the same way
+    return RedirectResponse("/payment/success", status_code=status.HTTP_303_SEE_OTHER)
 
 
 @router.get("/success", response_class=HTMLResponse)
@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from src.config import logger
+from src.crud import reports
+from src.db import get_db
+from src.routers.health import require_admin
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+def _period(start: Optional[date], end: Optional[date]) -> tuple[date, date]:
+    end = end or date.today()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="start must not be after end",
+        )
+    return start, end
+
+
+@router.get(path="/sales")
+def sales(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    product_version_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """Paid orders, items and revenue per product version (last 30 days by default)."""
+    try:
+        start, end = _period(start, end)
+        rows = reports.get_sales_report(
+            db=db, start=start, end=end, product_version_id=product_version_id
+        )
+        return {"start": start, "end": end, "rows": rows}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"sales report failed:{e}")
+        raise
+
+
+@router.get(path="/sales/daily")
+def daily_sales(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_db),
+):
+    """Items and revenue per day (last 30 days by default)."""
+    try:
+        start, end = _period(start, end)
+        return {
+            "start": start,
+            "end": end,
+            "rows": reports.get_daily_sales(db=db, start=start, end=end),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"daily sales report failed:{e}")
+        raise
@@ -1,15 +1,26 @@
 import secrets
+import time
 from http import HTTPStatus
 from json.decoder import JSONDecodeError
 
+from typing import Dict
+
 from fastapi import HTTPException, Depends
 from fastapi.requests import Request
+from fastapi.responses import Response
 from fastapi.routing import APIRouter
 
 from src.config import settings, logger
 from src.bot.processor import serialize_message, serialize_callback_query
+from src.bot.callbacks import callback_route
 from src.bot.dispathcer import dispatch_response
+from src.bot.outbox import enqueue_reply
+from src.services.search import inline_search
 from src.db import get_db
+from src.db.inspector import QUERY_INSPECTOR
+from src.core.metrics import WEBHOOK_SECONDS
+from src.core.tracing import current_span, start_trace
+from src.core.capture import get_recorder
 
 from sqlalchemy.orm import Session
 
@@ -35,6 +46,28 @@ def verify_secret_token(request: Request) -> bool:
 @router.post(settings.endpoint)
 async def telegram_webhook(request: Request, db: Session = Depends(get_db)):
     """Main webhook: receives updates, routes them, replies with sendMessage."""
+    forwarder = getattr(request.app.state, "forwarder", None)
+    if forwarder is not None:
+        # multi-process mode, the worker owning this chat handles it
+        return await forwarder.forward(request)
+
+    started = time.perf_counter()
+    labels = {"update_type": "unknown", "route": "none", "outcome": "error"}
+    with start_trace("telegram.update") as span, QUERY_INSPECTOR.track(labels):
+        try:
+            return await _handle_update(request=request, db=db, labels=labels)
+        finally:
+            WEBHOOK_SECONDS.observe(
+                time.perf_counter() - started,
+                labels["update_type"],
+                labels["route"],
+                labels["outcome"],
+            )
+            if span is not None:
+                span.attributes.update(labels)
+
+
+async def _handle_update(request: Request, db: Session, labels: Dict[str, str]):
     try:
 
         logger.debug(
@@ -53,6 +86,10 @@ async def telegram_webhook(request: Request, db: Session = Depends(get_db)):
                 detail=HTTPStatus.BAD_REQUEST.phrase,
             )
 
+        span = current_span()
+        if span is not None:
+            span.set_attribute("update_id", update.get("update_id"))
+
         # 2) verify webhook secret (if enabled)
         if not verify_secret_token(request):
             logger.error("Forbidden: secret token mismatch")
@@ -61,6 +98,10 @@ async def telegram_webhook(request: Request, db: Session = Depends(get_db)):
                 detail=HTTPStatus.FORBIDDEN.phrase,
             )
 
+        recorder = get_recorder()
+        if recorder is not None:
+            recorder.record(update)
+
         # 3) pick a supported message container
         message = (
             update.get("message")
@@ -69,10 +110,12 @@ async def telegram_webhook(request: Request, db: Session = Depends(get_db)):
         )
 
         callback_query = update.get("callback_query")
+        outputs = request.app.state.outputs
 
         # 4) route + build reply for message update
         if message is not None:
-            outputs = request.app.state.outputs
+            labels["update_type"] = "message"
+            labels["route"] = "/start" if message.get("text") == "/start" else "text"
             try:
                 response_params = serialize_message(
                     payload=message, db=db, outputs=outputs
@@ -80,11 +123,12 @@ async def telegram_webhook(request: Request, db: Session = Depends(get_db)):
             except Exception as e:
                 logger.error("Serialize_message/route failed: %s", e)
                 return {"ok": False, "error": "serializing message failed"}
-            resp = await dispatch_response(
-                request=request, db=db, payload=response_params
-            )
+            resp = await _reply(request=request, db=db, payload=response_params)
+            labels["outcome"] = "ok"
             return resp
         if callback_query is not None:
+            labels["update_type"] = "callback_query"
+            labels["route"] = callback_route(callback_query.get("data"))
             try:
                 response_params = serialize_callback_query(
                     payload=callback_query, db=db, outputs=outputs
@@ -92,14 +136,37 @@ async def telegram_webhook(request: Request, db: Session = Depends(get_db)):
             except Exception as e:
                 logger.error("seraializing_callback_query failed: %s", e)
                 return {"ok": False, "error": "serializing callback failed"}
-            resp = await dispatch_response(
-                request=request, db=db, payload=response_params
-            )
+            resp = await _reply(request=request, db=db, payload=response_params)
+            labels["outcome"] = "ok"
             return resp
+        inline_query = update.get("inline_query")
+        if inline_query is not None and inline_search.ready:
+            # answered in the webhook response itself: no Bot API call, no db
+            labels["update_type"] = "inline_query"
+            labels["route"] = "inline_query"
+            body = inline_search.answer(inline_query["id"], inline_query.get("query"))
+            labels["outcome"] = "ok"
+            return Response(content=body, media_type="application/json")
 
         if message is None and callback_query is None:
             logger.info("Unsupported update type: %s", update.keys())
+            labels["outcome"] = "ignored"
             return {"ok": True, "ignored": True}  # 200 OK, no retry
     except Exception as e:
         logger.exception("Unhandled error in telegram_webhook: %s", e)
         return {"ok": False, "error": "internal error"}
+
+
+async def _reply(request: Request, db: Session, payload: Dict):
+    """
+    With the outbox on, the reply is committed together with whatever the
+    handler changed and sent in the background; otherwise the changes are
+    committed and the reply is sent right away.
+    """
+    outbox = getattr(request.app.state, "outbox", None)
+    if outbox is not None and enqueue_reply(db, payload):
+        db.commit()
+        outbox.wake()
+        return {"ok": True, "queued": True}
+    db.commit()
+    return await dispatch_response(request=request, db=db, payload=payload)
@@ -0,0 +1,157 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from src.config import logger, settings
+from src.core.metrics import REGISTRY, Gauge
+from src.db import SessionLocal
+from src.models import Chat
+
+# product version id -> quantity, in the order the lines were added
+Cart = Dict[int, int]
+
+
+class CartFull(ValueError):
+    pass
+
+
+def _as_json(cart: Cart) -> Optional[Dict[str, int]]:
+    # JSON object keys are strings; an empty cart is stored as NULL
+    return {str(k): v for k, v in cart.items()} or None
+
+
+class CartStore:
+    """
+    Carts live in this process and are written to chats.cart only every
+    CART_FLUSH_INTERVAL seconds (and on shutdown), so adding items costs no
+    database write. A chat's updates always reach the same worker (see
+    src/workers.py), so no other process holds a copy of its cart. A cart
+    not in memory is loaded from chats.cart, which also brings carts back
+    after a restart; whatever changed since the last flush is lost then.
+    """
+
+    def __init__(self) -> None:
+        # chat pk -> cart, least recently used first
+        self._carts: "OrderedDict[int, Cart]" = OrderedDict()
+        self._dirty: Set[int] = set()
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+
+    # --- reads / edits ---
+
+    def get(self, chat: Chat) -> Cart:
+        with self._lock:
+            cart = self._carts.get(chat.id)
+            if cart is None:
+                cart = {int(k): int(v) for k, v in (chat.cart or {}).items()}
+                self._carts[chat.id] = cart
+            self._carts.move_to_end(chat.id)
+            return dict(cart)
+
+    def add(self, chat: Chat, product_version_id: int, quantity: int = 1) -> Cart:
+        cart = self.get(chat)
+        if product_version_id not in cart and len(cart) >= settings.cart_max_lines:
+            raise CartFull(f"a cart holds at most {settings.cart_max_lines} products")
+        cart[product_version_id] = min(
+            cart.get(product_version_id, 0) + quantity, settings.cart_max_quantity
+        )
+        return self._put(chat.id, cart)
+
+    def remove(self, chat: Chat, product_version_id: int, quantity: int = 1) -> Cart:
+        cart = self.get(chat)
+        left = cart.get(product_version_id, 0) - quantity
+        if left > 0:
+            cart[product_version_id] = left
+        else:
+            cart.pop(product_version_id, None)
+        return self._put(chat.id, cart)
+
+    def discard(self, chat: Chat, product_version_ids: Iterable[int]) -> Cart:
+        """Drop these lines whatever their quantity."""
+        cart = self.get(chat)
+        for product_version_id in product_version_ids:
+            cart.pop(product_version_id, None)
+        return self._put(chat.id, cart)
+
+    def clear(self, chat: Chat) -> None:
+        self._put(chat.id, {})
+
+    def _put(self, chat_pk: int, cart: Cart) -> Cart:
+        with self._lock:
+            self._carts[chat_pk] = cart
+            self._carts.move_to_end(chat_pk)
+            self._dirty.add(chat_pk)
+        return dict(cart)
+
+    # --- lazy flush ---
+
+    def flush(self, db: Optional[Session] = None) -> int:
+        """Write every changed cart in one executemany UPDATE; returns how many."""
+        with self._lock:
+            batch = [
+                {"id": chat_pk, "cart": _as_json(self._carts[chat_pk])}
+                for chat_pk in self._dirty
+                if chat_pk in self._carts
+            ]
+            self._dirty.clear()
+        if batch:
+            own_session = db is None
+            db = db or SessionLocal()
+            try:
+                db.execute(update(Chat), batch)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                # keep them dirty for the next flush
+                with self._lock:
+                    self._dirty.update(row["id"] for row in batch)
+                logger.error(f"cart flush failed:{e}")
+                raise
+            finally:
+                if own_session:
+                    db.close()
+        self._evict()
+        return len(batch)
+
+    def _evict(self) -> None:
+        """Drop the least recently used carts that are already stored."""
+        with self._lock:
+            excess = len(self._carts) - settings.cart_max_cached
+            for chat_pk in list(self._carts):
+                if excess <= 0:
+                    break
+                if chat_pk not in self._dirty:
+                    del self._carts[chat_pk]
+                    excess -= 1
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="cart-flusher")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await asyncio.to_thread(self.flush)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.cart_flush_interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception:
+                pass  # logged by flush, retried on the next round
+
+    def cached(self) -> List[tuple]:
+        with self._lock:
+            return [((), float(len(self._carts)))]
+
+
+carts = CartStore()
+
+REGISTRY.register(
+    Gauge("bot_carts_cached", "Carts held in memory by this process.", collect=carts.cached)
+)
@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from src.config import logger, settings
+from src.crud.order import expire_orders
+from src.db import SessionLocal
+from src.services.order_status import forget_order_status
+
+
+class OrderExpirer:
+    """
+    Expires the orders left waiting for payment longer than
+    ORDER_PENDING_TTL, every ORDER_EXPIRY_INTERVAL seconds. The buy path
+    only ever reuses an open order; this is what lets the user's next buy
+    press start a fresh one, at the current price.
+    """
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+
+    def expire(self, db: Optional[Session] = None) -> List[int]:
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            cutoff = datetime.now(timezone.utc) - timedelta(
+                seconds=settings.order_pending_ttl
+            )
+            ids = expire_orders(db, created_before=cutoff)
+        finally:
+            if own_session:
+                db.close()
+        for order_id in ids:
+            forget_order_status(order_id)
+        if ids:
+            logger.info("Expired %s unpaid orders", len(ids))
+        return ids
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="order-expirer")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.expire)
+            except Exception:
+                pass  # logged by expire_orders, retried on the next round
+            await asyncio.sleep(settings.order_expiry_interval)
+
+
+order_expirer = OrderExpirer()
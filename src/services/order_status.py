@@ -0,0 +1,35 @@
+from typing import Union
+
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.core.cache import get_cache
+from src.crud.order import get_order
+from src.db.routing import read_replica
+from src.models.order import OrderStatus
+
+# order id -> status, so "I paid" presses don't each read the order;
+# settled orders don't change anymore and are kept longer
+_order_status = get_cache("order_status")
+SETTLED = frozenset({OrderStatus.PAID, OrderStatus.EXPIRED, OrderStatus.CANCELLED})
+
+
+def remember_order_status(order_id: Union[int, str], status: OrderStatus) -> None:
+    ttl = settings.cache_ttl if status in SETTLED else settings.cache_order_status_ttl
+    _order_status.set(str(order_id), OrderStatus(status), ttl=ttl)
+
+
+def forget_order_status(order_id: Union[int, str]) -> None:
+    _order_status.invalidate(str(order_id))
+
+
+def get_order_status(db: Session, order_id: Union[int, str]) -> OrderStatus | None:
+    status = _order_status.get(str(order_id))
+    if status is not None:
+        return status
+    with read_replica(db):
+        order = get_order(db=db, order_id=order_id)
+    if order is None:
+        return None
+    remember_order_status(order_id, order.status)
+    return order.status
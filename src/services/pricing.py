@@ -1,10 +1,26 @@
 from sqlalchemy.orm import Session
 from decimal import Decimal
+from typing import Dict, Iterable, Optional
 from src.models import ProductVersion, MarketFeed
 from src.models.products import PricingStrategy
+from src.config import settings
+from src.core.cache import get_cache
 
+# market prices move, so these expire quickly; shared by all workers
+_market_prices = get_cache("market_prices", ttl=settings.cache_market_price_ttl)
 
-def get_version_price(version: ProductVersion, db: Session) -> Decimal:
+
+def get_market_price(db: Session, symbol: str) -> Decimal:
+    def _load() -> Decimal:
+        feed = db.query(MarketFeed).filter(MarketFeed.market_symbol == symbol).one()
+        return feed.price
+
+    return _market_prices.get_or_load(symbol, _load)
+
+
+def get_version_price(
+    version: ProductVersion, db: Session, market_price: Optional[Decimal] = None
+) -> Decimal:
     product = version.product
 
     if product.pricing_strategy == PricingStrategy.FIXED:
@@ -13,8 +29,11 @@ def get_version_price(version: ProductVersion, db: Session) -> Decimal:
     if product.market_symbol is None:
         raise ValueError("market_symbol is required for MARKET pricing strategies")
 
-    feed = db.query(MarketFeed).filter(MarketFeed.symbol == product.market_symbol).one()
-    market_price_per_unit: Decimal = feed.price
+    market_price_per_unit: Decimal = (
+        market_price
+        if market_price is not None
+        else get_market_price(db, product.market_symbol)
+    )
     base_price: Decimal = market_price_per_unit * Decimal(version.units)
 
     if product.pricing_strategy == PricingStrategy.MARKET:
@@ -26,3 +45,25 @@ def get_version_price(version: ProductVersion, db: Session) -> Decimal:
         return base_price * multiplier
 
     raise ValueError(f"Unsupported pricing strategy: {product.pricing_strategy}")
+
+
+def get_version_prices(versions: Iterable[ProductVersion], db: Session) -> Dict[int, Decimal]:
+    """
+    Prices of several versions at once (a cart): each market symbol is looked
+    up once, so every line of an order is priced from the same quote.
+    """
+    quotes: Dict[str, Decimal] = {}
+    prices: Dict[int, Decimal] = {}
+    for version in versions:
+        product = version.product
+        symbol = product.market_symbol
+        if (
+            product.pricing_strategy != PricingStrategy.FIXED
+            and symbol is not None
+            and symbol not in quotes
+        ):
+            quotes[symbol] = get_market_price(db, symbol)
+        prices[version.id] = get_version_price(
+            version, db, market_price=quotes.get(symbol)
+        )
+    return prices
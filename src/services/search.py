@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+
+from src.bot.chat_output import EMOJI_PAIRINGS
+from src.config import logger, settings
+from src.core.metrics import REGISTRY, Counter, Gauge
+from src.db import SessionLocal
+from src.db.routing import read_replica
+from src.models import Product
+from src.services.pricing import get_version_prices
+
+MAX_RESULTS = 50  # answerInlineQuery takes at most this many
+_PREFIX_LEN = 16  # longer terms are looked up by their first 16 chars, then checked
+_MIN_SIMILARITY = 0.5  # share of the query's trigrams a fuzzy match must have
+_WORD = re.compile(r"\w+")
+
+INLINE_ANSWERS = Counter(
+    "bot_inline_answers_total",
+    "Inline queries answered, by where the results came from.",
+    ("source",),  # cache, index
+)
+REGISTRY.register(INLINE_ANSWERS)
+
+
+def normalize_query(text: Optional[str]) -> str:
+    """Casefolded words joined by single spaces: the cache and index key."""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return " ".join(_WORD.findall(text))[: settings.inline_max_query_length]
+
+
+def _trigrams(word: str) -> FrozenSet[str]:
+    padded = f"  {word} "
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+@dataclass(frozen=True)
+class _Entry:
+    words: Tuple[str, ...]
+    result: Dict[str, Any]  # InlineQueryResultArticle
+
+
+def _price_str(price: Decimal) -> str:
+    return f"{price.quantize(Decimal('1')):,} T"
+
+
+def _article(product: Product, version: Any, price: Decimal) -> Dict[str, Any]:
+    emoji = EMOJI_PAIRINGS.get(product.name, "🛒")
+    result: Dict[str, Any] = {
+        "type": "article",
+        "id": f"pv{version.id}",
+        "title": f"{emoji} {product.name} — {version.version_name}",
+        "description": f"💰 {_price_str(price)}",
+        "input_message_content": {
+            "message_text": (
+                f"{emoji} *{product.name}*\n"
+                f"➜ *{version.version_name}*\n"
+                f"💰 price: {_price_str(price)}"
+            ),
+            "parse_mode": "Markdown",
+        },
+    }
+    if settings.bots_name:
+        result["reply_markup"] = {
+            "inline_keyboard": [
+                [{"text": "🛒 Buy", "url": f"https://t.me/{settings.bots_name}"}]
+            ]
+        }
+    return result
+
+
+class CatalogIndex:
+    """
+    Immutable: a catalog change builds a new one. Entries are in catalog
+    order; `prefixes` maps every word prefix (up to _PREFIX_LEN chars) to
+    the entries having it, `trigrams` is for queries with typos or infixes.
+    """
+
+    def __init__(self, entries: List[_Entry], fingerprint: str) -> None:
+        self.entries = entries
+        self.fingerprint = fingerprint
+        prefixes: Dict[str, set] = defaultdict(set)
+        trigrams: Dict[str, set] = defaultdict(set)
+        for n, entry in enumerate(entries):
+            for word in entry.words:
+                for size in range(1, min(len(word), _PREFIX_LEN) + 1):
+                    prefixes[word[:size]].add(n)
+                for gram in _trigrams(word):
+                    trigrams[gram].add(n)
+        self.prefixes = {k: frozenset(v) for k, v in prefixes.items()}
+        self.trigrams = {k: frozenset(v) for k, v in trigrams.items()}
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        if not query:
+            return [e.result for e in self.entries[:MAX_RESULTS]]
+        terms = query.split()
+        hits = self._prefix_match(terms)
+        if not hits:
+            hits = self._fuzzy_match(terms)
+        return [self.entries[n].result for n in hits[:MAX_RESULTS]]
+
+    def _prefix_match(self, terms: List[str]) -> List[int]:
+        # every term must start one of the entry's words
+        found: Optional[FrozenSet[int]] = None
+        for term in terms:
+            ids = self.prefixes.get(term[:_PREFIX_LEN], frozenset())
+            if len(term) > _PREFIX_LEN:
+                ids = frozenset(
+                    n for n in ids if any(w.startswith(term) for w in self.entries[n].words)
+                )
+            found = ids if found is None else found & ids
+            if not found:
+                return []
+        return sorted(found)
+
+    def _fuzzy_match(self, terms: List[str]) -> List[int]:
+        grams = frozenset().union(*(_trigrams(t) for t in terms))
+        scores: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for n in self.trigrams.get(gram, ()):
+                scores[n] += 1
+        needed = len(grams) * _MIN_SIMILARITY
+        ranked = [n for n, score in scores.items() if score >= needed]
+        ranked.sort(key=lambda n: (-scores[n], n))
+        return ranked
+
+
+def build_index(db: Session) -> CatalogIndex:
+    stmt = (
+        select(Product)
+        .where(Product.display_in_bot.is_(True))
+        .options(joinedload(Product.versions))
+        .order_by(Product.id)
+    )
+    with read_replica(db):
+        products = db.execute(stmt).unique().scalars().all()
+        versions = [v for p in products for v in sorted(p.versions, key=lambda v: v.id)]
+        prices = get_version_prices(versions, db)
+
+    entries: List[_Entry] = []
+    digest = hashlib.blake2b(digest_size=16)
+    for version in versions:
+        product = version.product
+        price = prices[version.id]
+        words = tuple(
+            dict.fromkeys(normalize_query(f"{product.name} {version.version_name}").split())
+        )
+        entries.append(_Entry(words=words, result=_article(product, version, price)))
+        digest.update(
+            f"{version.id}\0{product.name}\0{version.version_name}\0{price}\n".encode()
+        )
+    return CatalogIndex(entries, digest.hexdigest())
+
+
+class InlineSearch:
+    """
+    Answers inline queries from memory only: the catalog index plus the
+    serialized results per normalized query. The index is rebuilt off the
+    event loop every INLINE_INDEX_REFRESH seconds, and swapped in (dropping
+    the answers) only when the catalog or a price actually changed.
+    """
+
+    def __init__(self) -> None:
+        self._index: Optional[CatalogIndex] = None
+        # normalized query -> results JSON, least recently used first
+        self._answers: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._index is not None
+
+    def answer(self, inline_query_id: str, query: Optional[str]) -> str:
+        """answerInlineQuery as a webhook reply body (JSON)."""
+        key = normalize_query(query)
+        with self._lock:
+            index = self._index
+            results = self._answers.get(key)
+            if results is not None:
+                self._answers.move_to_end(key)
+        if results is None:
+            results = json.dumps(index.search(key), ensure_ascii=False)
+            with self._lock:
+                # not if a rebuild swapped the index in the meantime
+                if self._index is index:
+                    self._answers[key] = results
+                    if len(self._answers) > settings.inline_cache_max_queries:
+                        self._answers.popitem(last=False)
+            INLINE_ANSWERS.inc("index")
+        else:
+            INLINE_ANSWERS.inc("cache")
+        return (
+            '{"method":"answerInlineQuery",'
+            f'"inline_query_id":{json.dumps(inline_query_id)},'
+            f'"cache_time":{settings.inline_cache_time},'
+            f'"results":{results}}}'
+        )
+
+    def refresh(self, db: Optional[Session] = None) -> bool:
+        """Rebuild the index; True when the catalog had changed."""
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            index = build_index(db)
+        except Exception as e:
+            logger.error(f"inline index build failed:{e}")
+            raise
+        finally:
+            if own_session:
+                db.close()
+        if self._index is not None and self._index.fingerprint == index.fingerprint:
+            return False
+        with self._lock:
+            self._index = index
+            self._answers.clear()
+        logger.info("Inline search index built: %s entries", len(index.entries))
+        return True
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.refresh)
+        self._task = asyncio.create_task(self._run(), name="inline-index")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.inline_index_refresh)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception:
+                pass  # logged by refresh, the old index keeps serving
+
+    def cached(self) -> List[tuple]:
+        with self._lock:
+            return [((), float(len(self._answers)))]
+
+
+inline_search = InlineSearch()
+
+REGISTRY.register(
+    Gauge(
+        "bot_inline_answers_cached",
+        "Inline query answers held in memory by this process.",
+        collect=inline_search.cached,
+    )
+)
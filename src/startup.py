@@ -0,0 +1,119 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from src.config import logger
+
+
+@dataclass
+class StartupStep:
+    """
+    One node of the startup graph. `run` receives the results of the steps
+    finished so far and starts as soon as every step in `after` is done.
+    A failing required step aborts startup, an optional one is only logged.
+    """
+
+    name: str
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]
+    after: Tuple[str, ...] = ()
+    required: bool = True
+
+
+@dataclass
+class StepTiming:
+    step: str
+    after: List[str]
+    started_ms: float
+    duration_ms: float
+    ok: bool
+    error: str | None = None
+
+
+@dataclass
+class StartupReport:
+    total_ms: float = 0.0
+    steps: List[StepTiming] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _topological_order(steps: Sequence[StartupStep]) -> List[StartupStep]:
+    by_name = {s.name: s for s in steps}
+    order: List[StartupStep] = []
+    state: Dict[str, str] = {}
+
+    def visit(step: StartupStep) -> None:
+        if state.get(step.name) == "done":
+            return
+        if state.get(step.name) == "visiting":
+            raise ValueError(f"startup steps have a cycle through '{step.name}'")
+        state[step.name] = "visiting"
+        for dep in step.after:
+            if dep not in by_name:
+                raise ValueError(f"startup step '{step.name}' needs unknown '{dep}'")
+            visit(by_name[dep])
+        state[step.name] = "done"
+        order.append(step)
+
+    for step in steps:
+        visit(step)
+    return order
+
+
+async def run_startup(
+    steps: Sequence[StartupStep],
+) -> Tuple[Dict[str, Any], StartupReport]:
+    """
+    Run the steps concurrently, each one waiting only on its own dependencies.
+    Returns the results by step name and a per step timing report.
+    """
+    report = StartupReport()
+    results: Dict[str, Any] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+    t0 = time.perf_counter()
+
+    async def _run(step: StartupStep) -> Any:
+        if step.after:
+            await asyncio.gather(*(tasks[dep] for dep in step.after))
+        started = time.perf_counter()
+        timing = StepTiming(
+            step=step.name,
+            after=list(step.after),
+            started_ms=round((started - t0) * 1000, 2),
+            duration_ms=0.0,
+            ok=True,
+        )
+        try:
+            results[step.name] = await step.run(results)
+        except Exception as e:
+            timing.ok = False
+            timing.error = str(e)
+            if step.required:
+                raise
+            logger.error("startup step %s failed: %s", step.name, e)
+            results[step.name] = None
+        finally:
+            timing.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            report.steps.append(timing)
+        return results[step.name]
+
+    # every task exists before any of them runs, so lookups by name are safe
+    for step in _topological_order(steps):
+        tasks[step.name] = asyncio.create_task(_run(step), name=f"startup:{step.name}")
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+    finally:
+        report.total_ms = round((time.perf_counter() - t0) * 1000, 2)
+        report.steps.sort(key=lambda t: t.started_ms)
+        logger.info("startup report: %s", json.dumps(report.as_dict()))
+
+    return results, report
@@ -1,19 +1,31 @@
 import re
-from pyngrok import ngrok
-from pyngrok.conf import get_default
-from pyngrok.exception import PyngrokError
 from src.config import settings, logger
 
-# Set up pyngrok configuration
-get_default().config_path = "ngrok.yaml"
+_ngrok_configured = False
 
-# Authenticate ngrok if token exists
-if settings.ngrok_token:
-    ngrok.set_auth_token(settings.ngrok_token)
-else:
-    logger.warning(
-        "No NGROK_TOKEN found. You can still use ngrok, but tunnels may expire quickly."
-    )
+
+def _get_ngrok():
+    """
+    Import and configure pyngrok on first use. Deployments with a fixed
+    WEBHOOK never pay for the import or the config.
+    """
+    global _ngrok_configured
+    from pyngrok import ngrok
+    from pyngrok.conf import get_default
+
+    if not _ngrok_configured:
+        # Set up pyngrok configuration
+        get_default().config_path = "ngrok.yaml"
+
+        # Authenticate ngrok if token exists
+        if settings.ngrok_token:
+            ngrok.set_auth_token(settings.ngrok_token)
+        else:
+            logger.warning(
+                "No NGROK_TOKEN found. You can still use ngrok, but tunnels may expire quickly."
+            )
+        _ngrok_configured = True
+    return ngrok
 
 
 def start_ngrok_tunnel() -> str | None:
@@ -21,9 +33,11 @@ def start_ngrok_tunnel() -> str | None:
     Starts an ngrok HTTP tunnel and returns the public HTTPS URL.
     If an error occurs, returns None instead of crashing the app.
     """
+    from pyngrok.exception import PyngrokError
+
     try:
         # Create a new tunnel to your FastAPI server
-        endpoint = ngrok.connect(settings.port.value, "http")
+        endpoint = _get_ngrok().connect(settings.port.value, "http")
         public_url = endpoint.public_url
 
         # Always prefer https even if pyngrok returns http
@@ -45,7 +59,7 @@ def stop_ngrok_tunnel() -> None:
     Safe to call even if no tunnels exist.
     """
     try:
-        ngrok.kill()  # uses default config when None is passed
+        _get_ngrok().kill()  # uses default config when None is passed
         logger.info("🛑 Ngrok tunnel stopped.")
     except Exception as err:
         logger.warning(f"⚠ Failed to stop ngrok tunnel: {err}")
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import zlib
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi.requests import Request
+from fastapi.responses import JSONResponse, Response
+
+from src.config import logger, settings
+
+# set in the environment of every worker process
+WORKER_INDEX_ENV = "WORKER_INDEX"
+WORKER_READY_PATH = "/health/db-pool"
+
+
+def worker_index() -> Optional[int]:
+    """This process's index when it is a sharded worker, None otherwise."""
+    value = os.getenv(WORKER_INDEX_ENV)
+    return int(value) if value is not None else None
+
+
+def worker_ports() -> List[int]:
+    base = settings.worker_base_port or settings.port.value + 1
+    return [base + i for i in range(settings.workers)]
+
+
+def chat_id_of(update: Dict[str, Any]) -> Optional[int]:
+    message = (
+        update.get("message")
+        or update.get("edited_message")
+        or update.get("channel_post")
+    )
+    if message is not None:
+        return (message.get("chat") or {}).get("id")
+    callback_query = update.get("callback_query")
+    if callback_query is not None:
+        # the chat the button sits in, so its presses land on the same worker
+        # as its messages; inline-message buttons carry no message
+        chat_id = ((callback_query.get("message") or {}).get("chat") or {}).get("id")
+        if chat_id is not None:
+            return chat_id
+        return (callback_query.get("from") or {}).get("id")
+    inline_query = update.get("inline_query")
+    if inline_query is not None:
+        return (inline_query.get("from") or {}).get("id")
+    return None
+
+
+def shard_for(chat_id: Optional[int], shards: int) -> int:
+    """Stable across processes and restarts (unlike hash(), which is salted)."""
+    if chat_id is None:
+        return 0
+    return zlib.crc32(str(chat_id).encode()) % shards
+
+
+class WorkerPool:
+    """
+    N copies of the app (uvicorn main:app) on loopback ports, restarted when
+    one dies. Workers skip the webhook / ngrok steps, those stay with the
+    dispatcher in this process.
+    """
+
+    def __init__(self, ports: List[int]) -> None:
+        self.ports = ports
+        self.procs: List[Optional[subprocess.Popen]] = [None] * len(ports)
+        self._monitor: asyncio.Task | None = None
+        self._stopping = False
+
+    def _spawn(self, index: int) -> subprocess.Popen:
+        env = {**os.environ, WORKER_INDEX_ENV: str(index)}
+        proc = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "main:app",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(self.ports[index]),
+                "--no-access-log",
+            ],
+            env=env,
+        )
+        logger.info("worker %s started (pid %s, port %s)", index, proc.pid, self.ports[index])
+        return proc
+
+    async def start(self, timeout: float = 60.0) -> None:
+        for i in range(len(self.ports)):
+            self.procs[i] = self._spawn(i)
+        await self._wait_ready(timeout)
+        self._monitor = asyncio.create_task(self._watch())
+
+    async def _wait_ready(self, timeout: float) -> None:
+        deadline = asyncio.get_running_loop().time() + timeout
+        async with httpx.AsyncClient(timeout=2.0) as client:
+            for i, port in enumerate(self.ports):
+                while True:
+                    if self.procs[i].poll() is not None:
+                        raise RuntimeError(f"worker {i} exited during startup")
+                    try:
+                        resp = await client.get(f"http://127.0.0.1:{port}{WORKER_READY_PATH}")
+                        if resp.is_success:
+                            break
+                    except httpx.TransportError:
+                        pass
+                    if asyncio.get_running_loop().time() > deadline:
+                        raise RuntimeError(f"worker {i} not ready after {timeout}s")
+                    await asyncio.sleep(0.2)
+
+    async def _watch(self) -> None:
+        while not self._stopping:
+            await asyncio.sleep(1.0)
+            for i, proc in enumerate(self.procs):
+                if proc is not None and proc.poll() is not None and not self._stopping:
+                    logger.error("worker %s exited with %s, restarting", i, proc.returncode)
+                    self.procs[i] = self._spawn(i)
+
+    async def stop(self, grace: float = 10.0) -> None:
+        self._stopping = True
+        if self._monitor is not None:
+            self._monitor.cancel()
+        for proc in self.procs:
+            if proc is not None and proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+        for i, proc in enumerate(self.procs):
+            if proc is None:
+                continue
+            try:
+                await asyncio.to_thread(proc.wait, grace)
+            except subprocess.TimeoutExpired:
+                logger.warning("worker %s did not stop in %ss, killing it", i, grace)
+                proc.kill()
+
+
+class UpdateForwarder:
+    """
+    Sends each webhook update to the worker that owns its chat, so per-chat
+    caches stay in one process. Updates of one chat are forwarded one at a
+    time, in arrival order; different chats go out concurrently.
+    """
+
+    def __init__(self, ports: List[int]) -> None:
+        self.bases = [f"http://127.0.0.1:{port}" for port in ports]
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100 * len(ports)),
+            timeout=httpx.Timeout(30.0, connect=2.0),
+        )
+        # chat id -> [lock, holders + waiters]
+        self._chat_locks: Dict[int, list] = {}
+
+    async def forward(self, request: Request) -> Response:
+        body = await request.body()
+        try:
+            chat_id = chat_id_of(json.loads(body))
+        except (ValueError, AttributeError):
+            chat_id = None  # the worker answers the bad request
+        # same path on the worker, it runs the same app
+        url = self.bases[shard_for(chat_id, len(self.bases))] + request.url.path
+        headers = {"content-type": "application/json"}
+        secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token")
+        if secret is not None:
+            headers["X-Telegram-Bot-Api-Secret-Token"] = secret
+
+        entry = self._chat_locks.setdefault(chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                resp = await self.http.post(url, content=body, headers=headers)
+        except httpx.TransportError as e:
+            # non-2xx makes Telegram redeliver the update later
+            logger.error("forwarding update to %s failed: %s", url, e)
+            return JSONResponse(status_code=503, content={"ok": False})
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._chat_locks.pop(chat_id, None)
+        return Response(
+            content=resp.content,
+            status_code=resp.status_code,
+            media_type=resp.headers.get("content-type"),
+        )
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
@@ -0,0 +1,93 @@
+import os
+
+# src.config needs these at import; a real .env (or ENV_FILE) still wins
+os.environ.setdefault("BOT_TOKEN", "123456:test")
+os.environ.setdefault("DB_URL", "sqlite://")
+os.environ.setdefault("JWT_SECRET", "test")
+os.environ.setdefault("WEBHOOK", "https://example.com")
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from src.bot.chat_output import TelegrambotOutputs
+from src.config import settings
+from src.db.seed import seed_initial_chat_outputs, seed_initial_products
+from src.db.seed_data import SEED_TELEGRAM_OUTPUTS
+from src.models import Base, Chat, User
+from src.models.user import ChatState
+
+
+@pytest.fixture(scope="session")
+def engine():
+    if settings.db_url.startswith("postgresql"):
+        engine = create_engine(settings.db_url)
+    else:
+        engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+
+        # pysqlite's own transaction handling breaks SAVEPOINT, the test
+        # sessions' commits need real ones inside the rolled back BEGIN
+        @event.listens_for(engine, "connect")
+        def _no_pysqlite_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def _begin(connection):
+            connection.exec_driver_sql("BEGIN")
+
+        Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    connection = engine.connect()
+    outer = connection.begin()
+    # commits inside the CRUD functions only release a savepoint
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield session
+    finally:
+        session.close()
+        outer.rollback()
+        connection.close()
+
+
+CHAT_ID = 9_000_000_101
+PHONE = "+989121234567"
+
+
+@pytest.fixture
+def outputs() -> TelegrambotOutputs:
+    return TelegrambotOutputs()
+
+
+@pytest.fixture
+def catalog(db) -> None:
+    """Products and chat outputs, as on startup."""
+    seed_initial_products(db)
+    seed_initial_chat_outputs(db, seed_data=SEED_TELEGRAM_OUTPUTS)
+
+
+@pytest.fixture
+def chat(db, catalog) -> Chat:
+    """A chat past the terms, with a verified phone number."""
+    user = User(phone_number=PHONE, phone_number_validated=True)
+    db.add(user)
+    db.flush()
+    chat = Chat(
+        user_id=user.id,
+        chat_id=CHAT_ID,
+        first_name="flow",
+        chat_verified=True,
+        fsm_state=ChatState.MENU,
+    )
+    db.add(chat)
+    db.commit()
+    return chat
@@ -0,0 +1,139 @@
+"""
+Bot flows end to end below the webhook: a handler runs against the test
+database and `db.commit()` stands in for the webhook's commit with the reply.
+"""
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from src.bot import TgChat, chat_flow
+from src.config import settings
+from src.crud import user as user_crud
+from src.models import Chat, Order, Product, ProductVersion, User
+from src.models.order import OrderStatus
+from src.models.user import ChatState
+from src.services.order_expiry import order_expirer
+from tests.conftest import PHONE
+
+
+def _version(db) -> ProductVersion:
+    return db.query(ProductVersion).order_by(ProductVersion.id).first()
+
+
+def test_buy_product_version_twice_reuses_the_open_order(db, outputs, chat):
+    version = _version(db)
+
+    first = chat_flow.buy_product_version(outputs, db, chat, version.id)
+    db.commit()
+    second = chat_flow.buy_product_version(outputs, db, chat, version.id)
+    db.commit()
+
+    orders = db.query(Order).filter(Order.user_id == chat.user_id).all()
+    assert len(orders) == 1
+    assert orders[0].status == OrderStatus.WAITING_FOR_PAYMENT
+    # the second press answers with the same order (pay buttons, price)
+    assert first == second
+    assert str(orders[0].id) in str(first)
+
+
+def test_cancel_order_cancels_and_shows_the_menu(db, outputs, chat):
+    chat_flow.buy_product_version(outputs, db, chat, _version(db).id)
+    db.commit()
+    order = db.query(Order).filter(Order.user_id == chat.user_id).one()
+
+    reply = chat_flow.cancel_order(outputs, db, chat, order.id)
+
+    db.refresh(order)
+    assert order.status == OrderStatus.CANCELLED
+    assert reply["chat_id"] == chat.chat_id and reply.get("reply_markup")
+
+
+def test_expired_order_is_not_reused(db, outputs, chat, monkeypatch):
+    version = _version(db)
+    chat_flow.buy_product_version(outputs, db, chat, version.id)
+    db.commit()
+    first = db.query(Order).filter(Order.user_id == chat.user_id).one()
+
+    monkeypatch.setattr(settings, "order_pending_ttl", 0)
+    assert order_expirer.expire(db) == [first.id]
+    chat_flow.buy_product_version(outputs, db, chat, version.id)
+    db.commit()
+
+    orders = db.query(Order).filter(Order.user_id == chat.user_id).order_by(Order.id).all()
+    assert [o.status for o in orders] == [OrderStatus.EXPIRED, OrderStatus.WAITING_FOR_PAYMENT]
+
+
+def test_fsm_transition_is_left_to_the_webhook_commit(db, outputs, chat):
+    chat_flow.edit_phone_number(outputs, db, chat)
+    assert chat.fsm_state == ChatState.WAITING_FOR_PHONE_NUMBER
+
+    db.rollback()
+
+    assert db.get(Chat, chat.id).fsm_state == ChatState.MENU
+
+
+def test_taken_phone_number_leaves_the_chat_waiting(db, outputs, chat, monkeypatch):
+    newcomer = User()
+    db.add(newcomer)
+    db.flush()
+    waiting = Chat(
+        user_id=newcomer.id,
+        chat_id=chat.chat_id + 1,
+        first_name="late",
+        fsm_state=ChatState.WAITING_FOR_PHONE_NUMBER,
+    )
+    db.add(waiting)
+    db.commit()
+    # the number is claimed between the lookup and the write
+    monkeypatch.setattr(user_crud, "get_user_by_phone", lambda db, phone_number: None)
+
+    with pytest.raises(IntegrityError):
+        chat_flow.phone_number_input(outputs, db, PHONE, waiting)
+
+    assert db.get(Chat, waiting.id).fsm_state == ChatState.WAITING_FOR_PHONE_NUMBER
+    assert db.get(User, newcomer.id).phone_number is None
+
+
+def test_new_chat_is_shown_the_terms(db, outputs, catalog):
+    data = TgChat(id=9_000_000_201, type="private", first_name="new")
+
+    reply = chat_flow.chat_first_level_authentication(outputs, db, data=data)
+
+    assert reply["chat_id"] == data.id and reply.get("reply_markup")
+
+
+@pytest.mark.parametrize("validated", [False, True])
+def test_unverified_chat_with_a_number_gets_a_reply(db, outputs, chat, validated):
+    chat.chat_verified = False
+    chat.user.phone_number_validated = validated
+    db.commit()
+
+    reply = chat_flow.chat_second_lvl_authentication(outputs, db, chat)
+
+    assert reply["chat_id"] == chat.chat_id and PHONE in str(reply)
+
+
+def test_buy_product_lists_its_versions(db, outputs, chat):
+    product = db.query(Product).order_by(Product.id).first()
+
+    reply = chat_flow.buy_product(outputs, db, chat, product.id)
+
+    assert reply["chat_id"] == chat.chat_id and reply.get("reply_markup")
+
+
+def test_login_to_own_number_is_already_logged_in(db, outputs, chat):
+    reply = chat_flow.login(outputs, db, chat, PHONE)
+
+    assert reply["chat_id"] == chat.chat_id and PHONE in str(reply)
+
+
+def test_payment_gateway_names_the_ordered_product(db, outputs, chat):
+    version = _version(db)
+    chat_flow.buy_product_version(outputs, db, chat, version.id)
+    db.commit()
+    order = db.query(Order).filter(Order.user_id == chat.user_id).one()
+
+    reply = chat_flow.payment_gateway(outputs, db, chat, order.id)
+
+    assert reply["chat_id"] == chat.chat_id
+    assert version.product.name in reply["text"]
@@ -0,0 +1,49 @@
+"""The gateway's payment callback, through FastAPI like in production."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.bot import chat_flow
+from src.core.events import EventBus, PaymentConfirmed
+from src.db import get_db
+from src.models import Order, ProductVersion
+from src.models.order import OrderStatus
+from src.routers import payment
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(payment.router, prefix="/payment")
+    app.dependency_overrides[get_db] = lambda: db
+    app.state.events = EventBus()
+    with TestClient(app) as client:
+        yield client
+
+
+def test_confirm_payment_redirects_and_replays(db, outputs, chat, client):
+    confirmed = []
+
+    async def on_paid(event):
+        confirmed.append(event.order_id)
+
+    client.app.state.events.subscribe(PaymentConfirmed, on_paid)
+    version = db.query(ProductVersion).order_by(ProductVersion.id).first()
+    chat_flow.buy_product_version(outputs, db, chat, version.id)
+    db.commit()
+    order = db.query(Order).filter(Order.user_id == chat.user_id).one()
+
+    # the gateway retries: the second call is a replay, answered the same way
+    for _ in range(2):
+        resp = client.post(
+            "/payment/confirm-payment",
+            data={"order_id": order.id},
+            follow_redirects=False,
+        )
+        assert resp.status_code == 303
+        assert resp.headers["location"] == "/payment/success"
+
+    db.refresh(order)
+    assert order.status == OrderStatus.PAID
+    assert confirmed == [order.id]
@@ -0,0 +1,57 @@
+"""Callback routes dispatched through process_callback_query, as the webhook does."""
+
+import pytest
+
+from src.bot.callbacks import encode_callback
+from src.bot.processor import process_callback_query
+from src.models import Chat, User
+from src.models.user import ChatState
+
+from tests.conftest import CHAT_ID
+
+# routes whose handler only renders an output
+RENDER_ROUTES = [
+    "show_terms_for_acceptance",
+    "read_the_terms",
+    "show_prices",
+    "return_to_menu",
+    "show_terms",
+    "support",
+    "contact_support",
+    "return_to_support",
+    "common_questions",
+]
+
+
+def _press(db, outputs, route: str, message_id: int):
+    return process_callback_query(
+        query_id="1",
+        chat_id=CHAT_ID,
+        query_data=encode_callback(route),
+        message_id=message_id,
+        db=db,
+        outputs=outputs,
+    )
+
+
+@pytest.mark.parametrize("last_message", [True, False])
+@pytest.mark.parametrize("route", RENDER_ROUTES)
+def test_render_route_replies(db, outputs, chat, route, last_message):
+    chat.last_message_id = 10
+    db.commit()
+    reply = _press(db, outputs, route, message_id=10 if last_message else 5)
+    assert isinstance(reply, dict) and reply
+
+
+def test_accepting_the_terms_shows_the_menu(db, outputs, catalog):
+    user = User()
+    db.add(user)
+    db.flush()
+    chat = Chat(user_id=user.id, chat_id=CHAT_ID, first_name="new")
+    db.add(chat)
+    db.commit()
+
+    reply = _press(db, outputs, "accepted_terms", message_id=1)
+
+    assert chat.fsm_state == ChatState.MENU
+    assert reply["chat_id"] == CHAT_ID and reply.get("reply_markup")
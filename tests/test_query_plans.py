@@ -0,0 +1,131 @@
+"""
+The hot CRUD lookups must be index lookups. Each query is run through the
+real CRUD function, its SQL captured and EXPLAINed: EXPLAIN QUERY PLAN on
+SQLite (the schema built from the models), or EXPLAIN on Postgres when
+DB_URL points at one (a migrated database; everything runs in a
+transaction that is rolled back). A sequential scan of any table fails.
+"""
+
+import re
+from decimal import Decimal
+from typing import Callable, Dict, List, Tuple
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.crud.order import (
+    CreateOrderItemIn,
+    get_or_create_pending_order,
+    list_user_orders,
+)
+from src.crud.user import get_chat_by_chat_id, get_user_by_phone
+from src.models import Chat, Order, Product, ProductVersion, User
+from src.models.order import OrderStatus
+
+PHONE = "+989123456789"
+CHAT_ID = 9_000_000_001
+
+_SQLITE_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(\S+)")
+_PG_SEQ_SCAN = re.compile(r"Seq Scan on (\S+)")
+
+
+@pytest.fixture
+def rows(db) -> Dict[str, int]:
+    user = User(phone_number=PHONE, phone_number_validated=True)
+    db.add(user)
+    db.flush()
+    db.add(Chat(user_id=user.id, chat_id=CHAT_ID, first_name="plan"))
+    product = Product(name="Plan test", display_in_bot=True)
+    db.add(product)
+    db.flush()
+    version = ProductVersion(
+        product_id=product.id,
+        code="plan-test-1m",
+        version_name="1 month",
+        price=Decimal("100"),
+    )
+    db.add(version)
+    db.flush()
+    order, _ = get_or_create_pending_order(
+        db,
+        user_id=user.id,
+        items=[CreateOrderItemIn(product_version_id=version.id)],
+        commit=False,
+    )
+    db.flush()
+    ids = {"user": user.id, "product": product.id, "version": version.id, "order": order.id}
+    db.expunge_all()  # the relationship loads below must hit the database
+    return ids
+
+
+def _capture(db: Session, run: Callable[[], object]) -> List[Tuple[str, object]]:
+    statements: List[Tuple[str, object]] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    connection = db.connection()
+    event.listen(connection, "before_cursor_execute", record)
+    try:
+        run()
+    finally:
+        event.remove(connection, "before_cursor_execute", record)
+    return statements
+
+
+def _scanned_tables(db: Session, statement: str, parameters) -> Tuple[List[str], str]:
+    connection = db.connection()
+    if connection.dialect.name == "postgresql":
+        # with seq scans priced out only a table without a usable index gets one
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        plan = "\n".join(
+            row[0]
+            for row in connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+        )
+        return _PG_SEQ_SCAN.findall(plan), plan
+    details = [
+        row[-1]
+        for row in connection.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}", parameters
+        )
+    ]
+    scans = [m.group(1) for m in map(_SQLITE_SCAN.match, details) if m]
+    return scans, "\n".join(details)
+
+
+HOT_QUERIES: Dict[str, Callable[[Session, Dict[str, int]], object]] = {
+    "get_chat_by_chat_id": lambda db, ids: get_chat_by_chat_id(db, CHAT_ID),
+    "get_user_by_phone": lambda db, ids: get_user_by_phone(db, PHONE),
+    "orders_by_user": lambda db, ids: list_user_orders(db, user_id=ids["user"]),
+    "orders_by_user_next_page": lambda db, ids: list_user_orders(
+        db, user_id=ids["user"], before_id=ids["order"] + 1
+    ),
+    "pending_order_by_dedupe_key": lambda db, ids: get_or_create_pending_order(
+        db,
+        user_id=ids["user"],
+        items=[CreateOrderItemIn(product_version_id=ids["version"])],
+        commit=False,
+    ),
+    "order_items_by_order_id": lambda db, ids: db.get(Order, ids["order"]).items,
+    "product_versions_by_product_id": lambda db, ids: db.get(
+        Product, ids["product"]
+    ).versions,
+}
+
+
+@pytest.mark.parametrize("name", list(HOT_QUERIES))
+def test_hot_query_uses_an_index(db, rows, name):
+    statements = _capture(db, lambda: HOT_QUERIES[name](db, rows))
+    assert statements, f"{name} ran no query"
+    for statement, parameters in statements:
+        scans, plan = _scanned_tables(db, statement, parameters)
+        assert not scans, f"{name} scans {scans}:\n{statement}\n{plan}"
+
+
+def test_pending_order_is_found(db, rows):
+    # the dedupe lookup above must be the path that finds the open order
+    order, reused = HOT_QUERIES["pending_order_by_dedupe_key"](db, rows)
+    assert reused and order.id == rows["order"]
+    assert order.status == OrderStatus.WAITING_FOR_PAYMENT
@@ -0,0 +1,13 @@
+"""Sharding updates across workers."""
+
+from src.workers import chat_id_of
+
+
+def test_callback_query_is_sharded_by_its_chat():
+    update = {"callback_query": {"from": {"id": 1}, "message": {"chat": {"id": -100}}}}
+    assert chat_id_of(update) == -100
+
+
+def test_callback_query_without_a_message_falls_back_to_the_presser():
+    update = {"callback_query": {"from": {"id": 1}, "inline_message_id": "abc"}}
+    assert chat_id_of(update) == 1